@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+"""Benchmark the model conversion at several model sizes, and save the results as JSON.
+
+Each measurement runs in a fresh subprocess, so that its peak RSS is its own. The synthetic models are generated once
+with `create_parametric_model` and kept in `--model-dir`, since generating large models with OpenStudio is slow.
+
+Usage:
+    python benchmarks/benchmark_conversion.py --scales small medium -o results.json
+    python benchmarks/benchmark_conversion.py --compare baseline.json -o results.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+# num_stories, spaces_per_story, windows_per_wall, shading
+SCALES = {
+    "small": (1, 4, 1, False),
+    "medium": (4, 16, 2, False),
+    "large": (10, 25, 3, True),
+    "xlarge": (20, 50, 3, True),
+}
+DEFAULT_SCALES = ["small", "medium", "large"]
+DEFAULT_MODEL_DIR = Path(tempfile.gettempdir()) / "effibemviewer-benchmark-models"
+METRICS = ("seconds", "peak_rss_mb", "output_bytes")
+
+
+def _max_rss_mb(rusage: resource.struct_rusage) -> float:
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+    return rusage.ru_maxrss / (1024**2 if sys.platform == "darwin" else 1024)
+
+
+def get_model(scale: str, model_dir: Path) -> Path:
+    """Get the OSM file of a benchmark scale, generating it on first use."""
+    num_stories, spaces_per_story, windows_per_wall, shading = SCALES[scale]
+    osm_path = (
+        model_dir / f"{scale}-{num_stories}x{spaces_per_story}x{windows_per_wall}{'-shading' if shading else ''}.osm"
+    )
+    if not osm_path.is_file():
+        from effibemviewer import create_parametric_model
+
+        print(f"Generating the {scale} model...", file=sys.stderr)
+        model_dir.mkdir(parents=True, exist_ok=True)
+        model = create_parametric_model(num_stories, spaces_per_story, windows_per_wall, shading)
+        model.save(str(osm_path), True)
+    return osm_path
+
+
+def run_worker(function: str, osm_path: Path, repeat: int) -> dict:
+    """Time a conversion function on a model, in this process. Called in a subprocess by `measure_function`."""
+    import openstudio
+
+    from effibemviewer import model_to_gltf_html, model_to_gltf_json
+
+    model = openstudio.model.Model.load(str(osm_path)).get()
+    baseline_rss_mb = _max_rss_mb(resource.getrusage(resource.RUSAGE_SELF))
+    converters: dict[str, Callable] = {
+        "model_to_gltf_json": model_to_gltf_json,
+        "model_to_gltf_html": model_to_gltf_html,
+    }
+    convert = converters[function]
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = convert(model)
+        times.append(time.perf_counter() - start)
+    if isinstance(output, dict):
+        output = json.dumps(output, separators=(",", ":"))
+
+    return {
+        "seconds": min(times),
+        "mean_seconds": statistics.mean(times),
+        "peak_rss_mb": _max_rss_mb(resource.getrusage(resource.RUSAGE_SELF)),
+        "baseline_rss_mb": baseline_rss_mb,
+        "output_bytes": len(output.encode()),
+        "surfaces": len(model.getSurfaces()) + len(model.getSubSurfaces()) + len(model.getShadingSurfaces()),
+    }
+
+
+def measure_function(function: str, osm_path: Path, repeat: int) -> dict:
+    """Time a conversion function in a fresh subprocess, see `run_worker`."""
+    result = subprocess.run(
+        [sys.executable, __file__, "--worker", function, str(osm_path), "--repeat", str(repeat)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def measure_cli(osm_path: Path, repeat: int) -> dict:
+    """Time the CLI end-to-end (process startup, model loading, conversion and writing the HTML)."""
+    times = []
+    peak_rss_mb = 0.0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output = Path(tmp_dir) / "viewer.html"
+        cmd = [sys.executable, "-m", "effibemviewer", "-m", str(osm_path), "-o", str(output), "--no-cache"]
+        for _ in range(repeat):
+            start = time.perf_counter()
+            process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            _, status, rusage = os.wait4(process.pid, 0)
+            times.append(time.perf_counter() - start)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            if process.returncode != 0:
+                raise RuntimeError(
+                    f"CLI failed on {osm_path}: {process.stderr.read().decode() if process.stderr else ''}"
+                )
+            peak_rss_mb = max(peak_rss_mb, _max_rss_mb(rusage))
+        output_bytes = output.stat().st_size + sum(
+            (Path(tmp_dir) / name).stat().st_size for name in ("effibemviewer.js", "effibemviewer.css")
+        )
+    return {
+        "seconds": min(times),
+        "mean_seconds": statistics.mean(times),
+        "peak_rss_mb": peak_rss_mb,
+        "output_bytes": output_bytes,
+    }
+
+
+def run_benchmarks(scales: list[str], model_dir: Path, repeat: int) -> dict:
+    """Run all the benchmarks at the given scales."""
+    import openstudio
+
+    from effibemviewer import __version__
+
+    results: dict = {
+        "effibemviewer_version": __version__,
+        "openstudio_version": openstudio.openStudioLongVersion(),
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "repeat": repeat,
+        "scales": {},
+    }
+    for scale in scales:
+        osm_path = get_model(scale, model_dir)
+        scale_results: dict = {
+            "model": dict(zip(("num_stories", "spaces_per_story", "windows_per_wall", "shading"), SCALES[scale])),
+            "osm_bytes": osm_path.stat().st_size,
+        }
+        for function in ("model_to_gltf_json", "model_to_gltf_html"):
+            scale_results[function] = measure_function(function, osm_path, repeat)
+            print(_format_result(scale, function, scale_results[function]), file=sys.stderr)
+        scale_results["model"]["surfaces"] = scale_results["model_to_gltf_json"].pop("surfaces")
+        scale_results["model_to_gltf_html"].pop("surfaces")
+        scale_results["cli"] = measure_cli(osm_path, repeat)
+        print(_format_result(scale, "cli", scale_results["cli"]), file=sys.stderr)
+        results["scales"][scale] = scale_results
+    return results
+
+
+def _format_result(scale: str, name: str, result: dict) -> str:
+    return (
+        f"{scale:>7} {name:<20} {result['seconds']:8.3f}s {result['peak_rss_mb']:8.1f} MB peak RSS"
+        f" {result['output_bytes'] / 1e6:9.2f} MB output"
+    )
+
+
+def compare(baseline: dict, results: dict) -> list[str]:
+    """Compare results with a baseline, and return one line per metric: the ratio of the new value to the baseline."""
+    lines = []
+    for scale, scale_results in results["scales"].items():
+        baseline_scale = baseline.get("scales", {}).get(scale)
+        if baseline_scale is None:
+            continue
+        for name in ("model_to_gltf_json", "model_to_gltf_html", "cli"):
+            for metric in METRICS:
+                old = baseline_scale.get(name, {}).get(metric)
+                new = scale_results[name][metric]
+                if old:
+                    lines.append(f"{scale:>7} {name:<20} {metric:<13} {old:12.3f} -> {new:12.3f} ({new / old:6.2f}x)")
+    return lines
+
+
+def main():
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=DEFAULT_SCALES, help="Model sizes")
+    parser.add_argument("-o", "--output", type=Path, help="Write the results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="Compare the results with a previous results JSON file")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, the best one is kept")
+    parser.add_argument(
+        "--model-dir", type=Path, default=DEFAULT_MODEL_DIR, help=f"Generated models directory ({DEFAULT_MODEL_DIR})"
+    )
+    parser.add_argument("--worker", nargs=2, metavar=("FUNCTION", "OSM"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker[0], Path(args.worker[1]), args.repeat)))
+        return
+
+    results = run_benchmarks(args.scales, args.model_dir, args.repeat)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+        print(f"Results written to {args.output}", file=sys.stderr)
+    if args.compare:
+        print("\n".join(compare(json.loads(args.compare.read_text()), results)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""Benchmark the geometry diagnostics computed with NumPy, and save the results as JSON.
+
+Two measurements:
+
+- The NumPy evaluation on synthetic arrays of box-shaped spaces with four windows each, at `--surfaces` surfaces.
+  Building or even loading models of 50k surfaces takes OpenStudio several minutes, so the arrays are generated
+  directly. One wall in every hundred spaces is flipped, and the diagnostics must report exactly those.
+- `compute_geometry_diagnostics` end to end (reading the vertices from the model, then the NumPy evaluation) on the
+  models of `benchmark_conversion.py`, or on `--model`, against the OpenStudio checks called one surface and one
+  space at a time. Both must agree.
+
+Usage:
+    python benchmarks/benchmark_diagnostics.py --surfaces 10000 50000 --scales small medium -o results.json
+    python benchmarks/benchmark_diagnostics.py --surfaces --scales --model big.osm
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+
+from benchmark_conversion import DEFAULT_MODEL_DIR, SCALES, get_model
+
+DEFAULT_SURFACES = [10000, 50000]
+FLIPPED_EVERY = 100
+SURFACES_PER_SPACE = 10
+
+
+def box_arrays(num_spaces: int, seed: int = 0):
+    """Generate the `_diagnose` arrays of box-shaped spaces on a grid, with one window per wall.
+
+    Returns:
+        tuple: The space of each surface, the vertex counts, the vertices, and the expected diagnostics
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    w, d, h = rng.uniform(3, 20, num_spaces), rng.uniform(3, 20, num_spaces), rng.uniform(2.5, 4, num_spaces)
+    zero = np.zeros(num_spaces)
+
+    def face(*corners):
+        return np.stack([np.stack(corner, axis=1) for corner in corners], axis=1)
+
+    boxes = np.stack(
+        [
+            face((w, d, zero), (w, zero, zero), (zero, zero, zero), (zero, d, zero)),
+            face((w, zero, h), (w, d, h), (zero, d, h), (zero, zero, h)),
+            face((w, zero, h), (zero, zero, h), (zero, zero, zero), (w, zero, zero)),
+            face((w, d, h), (w, zero, h), (w, zero, zero), (w, d, zero)),
+            face((zero, d, h), (w, d, h), (w, d, zero), (zero, d, zero)),
+            face((zero, zero, h), (zero, d, h), (zero, d, zero), (zero, zero, zero)),
+        ],
+        axis=1,
+    )
+    side = int(np.ceil(np.sqrt(num_spaces)))
+    grid = np.arange(num_spaces)
+    boxes += np.stack([grid % side * 25.0, grid // side * 25.0, zero], axis=1)[:, None, None, :]
+    flipped = grid[::FLIPPED_EVERY]
+    boxes[flipped, 2] = boxes[flipped, 2, ::-1]
+    walls = boxes[:, 2:]
+    windows = walls.mean(axis=2, keepdims=True) + 0.5 * (walls - walls.mean(axis=2, keepdims=True))
+
+    surface_spaces = np.concatenate([np.repeat(grid, 6), np.full(num_spaces * 4, -1)])
+    vertices = np.concatenate([boxes.reshape(-1, 3), windows.reshape(-1, 3)])
+    counts = np.full(num_spaces * SURFACES_PER_SPACE, 4)
+    expected = np.ones((num_spaces * SURFACES_PER_SPACE, 4), dtype=bool)
+    expected[flipped * 6 + 2, 1] = False
+    return surface_spaces, counts, vertices, expected
+
+
+def run_synthetic(num_surfaces: int) -> dict:
+    """Time the NumPy evaluation on synthetic arrays of about num_surfaces surfaces."""
+    import numpy as np
+
+    from effibemviewer.diagnostics import _diagnose
+
+    surface_spaces, counts, vertices, expected = box_arrays(max(1, num_surfaces // SURFACES_PER_SPACE))
+    start = time.perf_counter()
+    valid, values = _diagnose(surface_spaces, counts, vertices)
+    seconds = time.perf_counter() - start
+    return {
+        "surfaces": len(counts),
+        "seconds": seconds,
+        "mismatches": int(np.any(values != expected[valid], axis=1).sum()),
+    }
+
+
+def openstudio_diagnostics(model) -> dict:
+    """The diagnostics computed by OpenStudio, one surface and one space at a time."""
+    from effibemviewer.diagnostics import DIAGNOSTIC_KEYS
+
+    diagnostics = {
+        str(surface.handle()).strip("{}"): dict(zip(DIAGNOSTIC_KEYS, (surface.isConvex(), True, True, True)))
+        for surface in model.getPlanarSurfaces()
+    }
+    for space in model.getSpaces():
+        incorrect = {str(s.handle()).strip("{}") for s in space.findSurfacesWithIncorrectOrientation()}
+        space_convex, space_enclosed = space.isConvex(), space.isEnclosedVolume()
+        for surface in space.surfaces():
+            handle = str(surface.handle()).strip("{}")
+            diagnostics[handle].update(
+                correctlyOriented=handle not in incorrect, spaceConvex=space_convex, spaceEnclosed=space_enclosed
+            )
+    return diagnostics
+
+
+def run_model(osm_path: Path) -> dict:
+    """Time `compute_geometry_diagnostics` and the OpenStudio checks on a model, and compare their results."""
+    import openstudio
+
+    from effibemviewer.diagnostics import compute_geometry_diagnostics
+
+    model = openstudio.model.Model.load(str(osm_path))
+    if not model.is_initialized():
+        raise ValueError(f"Failed to load model from {osm_path}")
+    model = model.get()
+
+    start = time.perf_counter()
+    diagnostics = compute_geometry_diagnostics(model)
+    numpy_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    expected = openstudio_diagnostics(model)
+    openstudio_seconds = time.perf_counter() - start
+    return {
+        "surfaces": len(expected),
+        "numpy_seconds": numpy_seconds,
+        "openstudio_seconds": openstudio_seconds,
+        "mismatches": sum(diagnostics.get(handle) != values for handle, values in expected.items()),
+    }
+
+
+def run_benchmarks(surfaces: list[int], scales: list[str], model: Path | None, model_dir: Path) -> dict:
+    """Run the synthetic benchmarks at the given sizes, and the model benchmarks at the given scales and model."""
+    import numpy as np
+    import openstudio
+
+    from effibemviewer import __version__
+
+    results: dict = {
+        "effibemviewer_version": __version__,
+        "openstudio_version": openstudio.openStudioLongVersion(),
+        "numpy_version": np.__version__,
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "synthetic": [],
+        "models": {},
+    }
+    for num_surfaces in surfaces:
+        result = run_synthetic(num_surfaces)
+        results["synthetic"].append(result)
+        print(
+            f"synthetic {result['surfaces']:>8} surfaces {result['seconds']:8.3f}s"
+            f" {result['mismatches']} mismatches",
+            file=sys.stderr,
+        )
+    osm_paths = {scale: get_model(scale, model_dir) for scale in scales}
+    if model is not None:
+        osm_paths[model.name] = model
+    for name, osm_path in osm_paths.items():
+        result = run_model(osm_path)
+        results["models"][name] = result
+        print(
+            f"{name:>9} {result['surfaces']:>8} surfaces {result['numpy_seconds']:8.3f}s NumPy"
+            f" {result['openstudio_seconds']:8.3f}s OpenStudio {result['mismatches']} mismatches",
+            file=sys.stderr,
+        )
+    return results
+
+
+def main():
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--surfaces", nargs="*", type=int, default=DEFAULT_SURFACES, help="Synthetic sizes, in surfaces"
+    )
+    parser.add_argument(
+        "--scales", nargs="*", choices=list(SCALES), default=["small", "medium"], help="Generated model sizes"
+    )
+    parser.add_argument("--model", type=Path, help="Also benchmark this OSM file")
+    parser.add_argument("-o", "--output", type=Path, help="Write the results to this JSON file")
+    parser.add_argument(
+        "--model-dir", type=Path, default=DEFAULT_MODEL_DIR, help=f"Generated models directory ({DEFAULT_MODEL_DIR})"
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.surfaces, args.scales, args.model, args.model_dir)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+"""Load test the async conversion API behind a local stand-in web server, and save the results as JSON.
+
+The stand-in server is a minimal asyncio HTTP server: `GET /viewer` converts a model to the viewer HTML with
+`async_osm_to_gltf_html` on a `ConversionPool`, and `GET /health` answers immediately. The load generator sends
+`--requests` viewer requests, `--concurrency` at a time, while polling `/health`: its latency shows how long
+the event loop is blocked by the conversions. With `--pool none`, the server converts on the event loop itself, as a
+synchronous app would.
+
+Usage:
+    python benchmarks/load_test.py --scale medium --requests 32 --concurrency 8
+    python benchmarks/load_test.py --pool thread --workers 4 -o results.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from benchmark_conversion import DEFAULT_MODEL_DIR, SCALES, get_model
+
+POOL_KINDS = ("process", "thread", "none")
+HEALTH_INTERVAL = 0.02
+
+
+class StandInServer:
+    """A minimal HTTP/1.1 server (one request per connection) standing in for an ASGI app serving viewers."""
+
+    def __init__(self, osm_path: Path, pool_kind: str, workers: int, max_concurrency: int | None):
+        """Initialize the server of osm_path, converting on a pool of the given kind."""
+        from effibemviewer import ConversionPool
+
+        self.osm_path = osm_path
+        self.pool = None if pool_kind == "none" else ConversionPool(pool_kind, workers, max_concurrency)
+        self.server: asyncio.Server | None = None
+
+    async def start(self, host: str = "127.0.0.1") -> int:
+        """Start the workers and the server on a free port, and return the port."""
+        from effibemviewer import warm_up_env
+
+        if self.pool is None:
+            warm_up_env()
+        else:
+            await self.pool.start()
+        self.server = await asyncio.start_server(self._handle, host, 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """Stop the server and the workers."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.pool is not None:
+            self.pool.close()
+
+    async def _viewer_html(self) -> str:
+        from effibemviewer import async_osm_to_gltf_html
+        from effibemviewer.gltf import gltf_json_to_html, osm_to_gltf_json
+
+        if self.pool is None:
+            return gltf_json_to_html(osm_to_gltf_json(self.osm_path))
+        return await async_osm_to_gltf_html(self.osm_path, pool=self.pool)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()).strip():
+                pass
+            path = request_line.split()[1].decode() if request_line else ""
+            if path == "/health":
+                status, body = "200 OK", b"ok"
+            elif path == "/viewer":
+                try:
+                    status, body = "200 OK", (await self._viewer_html()).encode()
+                except ValueError as e:
+                    status, body = "500 Internal Server Error", str(e).encode()
+            else:
+                status, body = "404 Not Found", b""
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+async def _get(port: int, path: str) -> tuple[int, int]:
+    """Send a GET request to the stand-in server, and return the status code and the body size."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), len(body)
+
+
+def _latency_stats(latencies: list[float]) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "mean_seconds": statistics.mean(ordered),
+        "p50_seconds": ordered[len(ordered) // 2],
+        "p95_seconds": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max_seconds": ordered[-1],
+    }
+
+
+async def run_load_test(server: StandInServer, requests: int, concurrency: int) -> dict:
+    """Send the viewer requests to the server while polling its health check, and measure their latencies."""
+    port = await server.start()
+    latencies: list[float] = []
+    health_latencies: list[float] = []
+    failures = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    done = asyncio.Event()
+
+    async def viewer_request():
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            status, _ = await _get(port, "/viewer")
+            latencies.append(time.perf_counter() - start)
+            failures += status != 200
+
+    async def poll_health():
+        while not done.is_set():
+            start = time.perf_counter()
+            await _get(port, "/health")
+            health_latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(HEALTH_INTERVAL)
+
+    health = asyncio.create_task(poll_health())
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(viewer_request() for _ in range(requests)))
+    finally:
+        elapsed = time.perf_counter() - start
+        done.set()
+        await health
+        await server.close()
+
+    return {
+        "seconds": elapsed,
+        "requests_per_second": requests / elapsed,
+        "failures": failures,
+        "viewer": _latency_stats(latencies),
+        "health": _latency_stats(health_latencies),
+    }
+
+
+def _format_results(results: dict) -> str:
+    viewer, health = results["viewer"], results["health"]
+    return (
+        f"{results['requests_per_second']:.2f} requests/s, {results['failures']} failed\n"
+        f"viewer latency: p50 {viewer['p50_seconds']:.3f}s, p95 {viewer['p95_seconds']:.3f}s,"
+        f" max {viewer['max_seconds']:.3f}s\n"
+        f"health latency: p50 {health['p50_seconds'] * 1e3:.1f}ms, p95 {health['p95_seconds'] * 1e3:.1f}ms,"
+        f" max {health['max_seconds'] * 1e3:.1f}ms (event loop blocking)"
+    )
+
+
+def main():
+    """Run the load test from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=list(SCALES), default="small", help="Model size (default: small)")
+    parser.add_argument("--requests", type=int, default=32, help="Number of viewer requests (default: 32)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent viewer requests (default: 8)")
+    parser.add_argument(
+        "--pool", choices=POOL_KINDS, default="process", help="Conversion pool, or none to convert on the event loop"
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Pool workers (default: CPUs)")
+    parser.add_argument("--max-concurrency", type=int, help="Pool concurrency limit (default: workers)")
+    parser.add_argument("-o", "--output", type=Path, help="Write the results to this JSON file")
+    parser.add_argument(
+        "--model-dir", type=Path, default=DEFAULT_MODEL_DIR, help=f"Generated models directory ({DEFAULT_MODEL_DIR})"
+    )
+    args = parser.parse_args()
+
+    osm_path = get_model(args.scale, args.model_dir)
+    server = StandInServer(osm_path, args.pool, args.workers, args.max_concurrency)
+    results = {
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "scale": args.scale,
+        "pool": args.pool,
+        "workers": args.workers,
+        "max_concurrency": args.max_concurrency or args.workers,
+        "concurrency": args.concurrency,
+        **asyncio.run(run_load_test(server, args.requests, args.concurrency)),
+    }
+    print(_format_results(results), file=sys.stderr)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,22 +4,74 @@ __author__ = """Julien Marrec"""
 __email__ = 'contact@effibem.com'
 __version__ = '0.3.1'
 
+from effibemviewer.aio import (
+    ConversionPool,
+    async_model_to_gltf_html,
+    async_model_to_gltf_json,
+    async_osm_to_gltf_html,
+    async_osm_to_gltf_json,
+)
+from effibemviewer.cache import GltfCache
+from effibemviewer.chunks import split_gltf_by_story, write_chunked_gltf
+from effibemviewer.diagnostics import add_geometry_diagnostics, compute_geometry_diagnostics
+from effibemviewer.filters import ModelFilter
 from effibemviewer.gltf import (
+    compress_gltf_json,
     create_example_model,
+    create_parametric_model,
     display_model,
     generate_loader_html,
+    generate_manifest_html,
     get_css_library,
     get_js_library,
+    gltf_json_to_glb,
+    gltf_json_to_html,
+    iter_gltf_json_html,
+    model_to_glb,
     model_to_gltf_html,
     model_to_gltf_json,
+    optimize_gltf_json,
+    osm_to_gltf_json,
+    warm_up_env,
+    write_gltf_html,
 )
+from effibemviewer.notebook import NotebookViewer, show_model
+from effibemviewer.string_table import decode_string_table, encode_string_table
+from effibemviewer.timings import Timings
 
 __all__ = [
+    "ConversionPool",
+    "GltfCache",
+    "ModelFilter",
+    "NotebookViewer",
+    "Timings",
+    "add_geometry_diagnostics",
+    "async_model_to_gltf_html",
+    "async_model_to_gltf_json",
+    "async_osm_to_gltf_html",
+    "async_osm_to_gltf_json",
+    "compress_gltf_json",
+    "compute_geometry_diagnostics",
     "create_example_model",
+    "create_parametric_model",
+    "decode_string_table",
     "display_model",
+    "encode_string_table",
     "generate_loader_html",
+    "generate_manifest_html",
     "get_css_library",
     "get_js_library",
+    "gltf_json_to_glb",
+    "gltf_json_to_html",
+    "iter_gltf_json_html",
+    "model_to_glb",
     "model_to_gltf_html",
     "model_to_gltf_json",
+    "optimize_gltf_json",
+    "osm_to_gltf_json",
+    "show_model",
+    "split_gltf_by_story",
+    "warm_up_env",
+    "write_chunked_gltf",
+    "write_gltf_html",
 ]
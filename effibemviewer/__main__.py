@@ -1,14 +1,26 @@
 import argparse
+import json
+import sys
+import time
 from pathlib import Path
 
+from effibemviewer.cache import CACHE_DIR_ENV_VAR, GltfCache, get_default_cache
+from effibemviewer.filters import SURFACE_TYPES, ModelFilter
 from effibemviewer.gltf import (
+    compress_gltf_json,
     create_example_model,
     generate_loader_html,
+    generate_manifest_html,
     get_css_library,
     get_js_library,
-    model_to_gltf_html,
+    gltf_json_to_glb,
+    iter_gltf_json_html,
     model_to_gltf_json,
+    optimize_gltf_json,
+    osm_to_gltf_json,
 )
+from effibemviewer.string_table import encode_string_table
+from effibemviewer.timings import Timings, timed
 
 # Asset paths within the package
 ASSETS_DIR = Path(__file__).parent.parent / "docs" / "assets"
@@ -18,6 +30,155 @@ JS_LIB_NAME = f"{BASE_NAME}.js"
 CSS_LIB_NAME = f"{BASE_NAME}.css"
 
 
+def _add_cache_arguments(parser: argparse.ArgumentParser):
+    """Add the --cache-dir / --no-cache options to parser."""
+    cache_mode = parser.add_mutually_exclusive_group()
+    cache_mode.add_argument(
+        "--cache-dir",
+        type=Path,
+        help=(
+            "Cache GLTF conversion results in this directory, keyed by model content, OpenStudio version and options"
+            f" (default: ${CACHE_DIR_ENV_VAR} if set, otherwise no caching)"
+        ),
+    )
+    cache_mode.add_argument(
+        "--no-cache", action="store_true", help=f"Disable the conversion cache, even if ${CACHE_DIR_ENV_VAR} is set"
+    )
+
+
+def _add_viewer_arguments(parser: argparse.ArgumentParser):
+    """Add the options of the JS viewer to parser."""
+    parser.add_argument(
+        "--merged-geometry",
+        action="store_true",
+        help="Merge all surfaces into a few large geometries in the viewer (much faster rendering of large models)",
+    )
+    parser.add_argument(
+        "--hover-highlight",
+        action="store_true",
+        help="Highlight the surface under the mouse pointer in the viewer",
+    )
+    parser.add_argument(
+        "--show-stats",
+        action="store_true",
+        help="Show the rendering statistics (draw calls, triangles, frame time) and load timings in the viewer",
+    )
+    parser.add_argument(
+        "--adaptive-quality",
+        action="store_true",
+        help="Lower the resolution and hide the edges in the viewer while the camera moves",
+    )
+    parser.add_argument(
+        "--frame-budget",
+        type=float,
+        metavar="MS",
+        help="Frame time to stay within while the camera moves, by lowering the quality (implies --adaptive-quality)",
+    )
+
+
+def _add_compress_argument(parser: argparse.ArgumentParser):
+    """Add the --compress option to parser."""
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help=(
+            "Compress the model data with gzip: the HTML embeds it as compressed GLB (typically ten times smaller),"
+            " 'gltf' and 'glb' write .gltf.gz / .glb.gz files, as do the story chunks of --chunked. The viewer"
+            " decompresses it in the browser"
+        ),
+    )
+
+
+def _add_optimize_arguments(parser: argparse.ArgumentParser):
+    """Add the --optimize / --quantize options to parser."""
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="Weld duplicate vertices and drop the normals of planar surfaces (requires NumPy)",
+    )
+    parser.add_argument(
+        "--quantize",
+        action="store_true",
+        help="Also store the positions as int16 relative to each surface bounding box (implies --optimize)",
+    )
+
+
+def _add_string_table_argument(parser: argparse.ArgumentParser):
+    """Add the --string-table option to parser."""
+    parser.add_argument(
+        "--string-table",
+        action="store_true",
+        help=(
+            "Store the repeated surface metadata (construction, space type, thermal zone, story names...) once, in a"
+            " shared string table, instead of on every surface. Shrinks the model data of large models"
+        ),
+    )
+
+
+def _add_filter_arguments(parser: argparse.ArgumentParser):
+    """Add the options selecting the part of the model to convert to parser."""
+    group = parser.add_argument_group(
+        "model filters", "Convert only a part of the model. Repeat an option to select several names."
+    )
+    group.add_argument("--story", action="append", metavar="NAME", help="Only convert this building story")
+    group.add_argument("--space", action="append", metavar="NAME", help="Only convert this space")
+    group.add_argument("--thermal-zone", action="append", metavar="NAME", help="Only convert this thermal zone")
+    group.add_argument(
+        "--surface-type", action="append", choices=SURFACE_TYPES, metavar="TYPE", help="Only convert this surface type"
+    )
+    group.add_argument("--no-shading", action="store_true", help="Do not convert the shading surfaces")
+
+
+def _add_profile_arguments(parser: argparse.ArgumentParser):
+    """Add the --profile / --profile-json options to parser."""
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Report the time of each conversion stage (load, translate, render...), output sizes and surface counts",
+    )
+    parser.add_argument(
+        "--profile-json", type=Path, metavar="PATH", help="Write the --profile report to this JSON file (implies it)"
+    )
+
+
+def get_viewer_options(args: argparse.Namespace) -> dict:
+    """Get the options for the JS EffiBEMViewer constructor from the parsed arguments."""
+    viewer_options = {}
+    if args.merged_geometry:
+        viewer_options["mergedGeometry"] = True
+    if args.hover_highlight:
+        viewer_options["hoverHighlight"] = True
+    if args.show_stats:
+        viewer_options["showStats"] = True
+    if args.adaptive_quality:
+        viewer_options["adaptiveQuality"] = True
+    if args.frame_budget is not None:
+        viewer_options["frameBudget"] = args.frame_budget
+    return viewer_options
+
+
+def get_model_filter(args: argparse.Namespace) -> ModelFilter | None:
+    """Get the model filter selected by the --story / --space / --thermal-zone / --surface-type / --no-shading."""
+    if not (args.story or args.space or args.thermal_zone or args.surface_type or args.no_shading):
+        return None
+    return ModelFilter(
+        stories=args.story,
+        spaces=args.space,
+        thermal_zones=args.thermal_zone,
+        surface_types=args.surface_type,
+        include_shading=not args.no_shading,
+    )
+
+
+def get_cache(args: argparse.Namespace) -> GltfCache | None:
+    """Get the conversion cache selected by the --cache-dir / --no-cache options, if any."""
+    if args.no_cache:
+        return None
+    if args.cache_dir:
+        return GltfCache(args.cache_dir)
+    return get_default_cache()
+
+
 def get_parser() -> argparse.ArgumentParser:
     """Create and return the argument parser for the CLI."""
     parser = argparse.ArgumentParser(
@@ -39,6 +200,16 @@ def get_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "-o", "--output", type=Path, default=Path("viewer.html"), help="Output HTML file path (default: viewer.html)"
     )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=["html", "gltf", "glb"],
+        default="html",
+        help=(
+            "Output format (default: html). 'gltf' and 'glb' write the model data only (to the output path with the"
+            " matching extension), to be loaded with the JS library"
+        ),
+    )
     # --embedded and --cdn are mutually exclusive options for how to include the JS library
     lib_mode = parser.add_mutually_exclusive_group()
     lib_mode.add_argument(
@@ -61,63 +232,324 @@ def get_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Generate a loader HTML with file input instead of embedding model data",
     )
+    parser.add_argument(
+        "--chunked",
+        action="store_true",
+        help=(
+            "Split the model per building story, with a manifest for progressive loading in the viewer. With 'html',"
+            " the page loads the story chunks (GLB files written next to it) and must be served over HTTP"
+        ),
+    )
+    _add_compress_argument(parser)
+    _add_optimize_arguments(parser)
+    _add_string_table_argument(parser)
+    _add_filter_arguments(parser)
+    _add_viewer_arguments(parser)
+    _add_cache_arguments(parser)
+    _add_profile_arguments(parser)
+
+    subparsers = parser.add_subparsers(dest="command", title="commands")
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help="Convert many OpenStudio models in parallel",
+        description="Convert OpenStudio models (files, or directories of .osm files) in parallel",
+    )
+    batch_parser.add_argument("inputs", type=Path, nargs="+", help="OpenStudio model files and/or directories")
+    batch_parser.add_argument(
+        "-o", "--output-dir", type=Path, default=Path("."), help="Output directory (default: current directory)"
+    )
+    batch_parser.add_argument(
+        "-j", "--jobs", type=int, default=None, help="Number of worker processes (default: number of CPUs)"
+    )
+    batch_parser.add_argument(
+        "-f", "--format", choices=["html", "gltf", "glb"], default="html", help="Output format (default: html)"
+    )
+    batch_parser.add_argument(
+        "-g",
+        "--geometry-diagnostics",
+        action="store_true",
+        help="Include geometry diagnostics (convex, correctly oriented, etc.)",
+    )
+    batch_lib_mode = batch_parser.add_mutually_exclusive_group()
+    batch_lib_mode.add_argument(
+        "--embedded",
+        action="store_true",
+        help="Embed JS library inline in each HTML (default: generate a single shared effibemviewer.js file)",
+    )
+    batch_lib_mode.add_argument(
+        "--cdn",
+        action="store_true",
+        help="Reference JS library from CDN instead of embedding or generating local file",
+    )
+    _add_compress_argument(batch_parser)
+    _add_optimize_arguments(batch_parser)
+    _add_string_table_argument(batch_parser)
+    _add_filter_arguments(batch_parser)
+    _add_viewer_arguments(batch_parser)
+    _add_cache_arguments(batch_parser)
+    _add_profile_arguments(batch_parser)
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Serve the viewer of an OpenStudio model locally, optionally following its changes",
+        description=(
+            "Serve the viewer of an OpenStudio model on a local HTTP server. With --watch, the model is re-translated"
+            " whenever the file changes, and the open viewers are updated in place, keeping their camera"
+        ),
+    )
+    serve_parser.add_argument("model", type=Path, help="Path to the OpenStudio model file")
+    serve_parser.add_argument(
+        "--watch", action="store_true", help="Watch the model file, and push its changes to the open viewers"
+    )
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    serve_parser.add_argument("-p", "--port", type=int, default=8000, help="Port to listen on (default: 8000)")
+    serve_parser.add_argument(
+        "--debounce",
+        type=float,
+        default=0.5,
+        help="Seconds the model file must stay unchanged before it is re-translated (default: 0.5)",
+    )
+    serve_parser.add_argument(
+        "-g",
+        "--geometry-diagnostics",
+        action="store_true",
+        help="Include geometry diagnostics (convex, correctly oriented, etc.)",
+    )
+    _add_viewer_arguments(serve_parser)
+    _add_cache_arguments(serve_parser)
     return parser
 
 
-def main():
-    """Command-line interface for generating GLTF viewer HTML from an OpenStudio model."""
-    parser = get_parser()
-    args = parser.parse_args()
+def write_library_files(output_dir: Path):
+    """Write the effibemviewer.js and effibemviewer.css library files to output_dir."""
+    js_lib_path = output_dir / JS_LIB_NAME
+    js_lib_path.write_text(get_js_library())
+    css_lib_path = output_dir / CSS_LIB_NAME
+    css_lib_path.write_text(get_css_library())
+
+    print(f"Generated: {js_lib_path} and {css_lib_path}")
+
 
+def batch_main(args: argparse.Namespace) -> int:
+    """Run the `batch` subcommand, returns the process exit code."""
+    from effibemviewer.batch import batch_convert, find_models
+
+    models = find_models(args.inputs)
+    if not models:
+        print("No OpenStudio model files found", file=sys.stderr)
+        return 1
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    if args.format == "html" and not args.embedded and not args.cdn:
+        # Shared by all the generated HTML files
+        write_library_files(args.output_dir)
+
+    profile = args.profile or args.profile_json is not None
+
+    def _report(result: dict):
+        if "error" in result:
+            print(f"Failed: {result['input']}: {result['error']}", file=sys.stderr)
+        else:
+            print(f"Generated: {result['output']} ({result['seconds']:.2f}s)")
+            if args.profile:
+                stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in result["timings"]["stages"].items())
+                print(f"  {stages}", file=sys.stderr)
+
+    start = time.perf_counter()
+    results = batch_convert(
+        models,
+        output_dir=args.output_dir,
+        jobs=args.jobs,
+        output_format=args.format,
+        include_geometry_diagnostics=args.geometry_diagnostics,
+        embedded=args.embedded,
+        cdn=args.cdn,
+        viewer_options=get_viewer_options(args),
+        cache=get_cache(args),
+        on_result=_report,
+        profile=profile,
+        compress=args.compress,
+        optimize=args.optimize or args.quantize,
+        quantize=args.quantize,
+        string_table=args.string_table,
+        model_filter=get_model_filter(args),
+    )
+    elapsed = time.perf_counter() - start
+    if args.profile_json is not None:
+        args.profile_json.write_text(json.dumps(results, indent=2))
+
+    n_failed = sum(1 for r in results if "error" in r)
+    n_ok = len(results) - n_failed
+    total_mb = sum(r.get("bytes", 0) for r in results) / 1e6
+    print(
+        f"Converted {n_ok}/{len(results)} models in {elapsed:.2f}s "
+        f"({n_ok / elapsed:.2f} models/s, {total_mb:.1f} MB written), {n_failed} failed"
+    )
+    return 1 if n_failed else 0
+
+
+def serve_main(args: argparse.Namespace) -> int:
+    """Run the `serve` subcommand until interrupted, returns the process exit code."""
+    from effibemviewer.serve import ModelServer
+
+    if not args.model.is_file():
+        print(f"Model file '{args.model}' does not exist", file=sys.stderr)
+        return 1
+
+    model_server = ModelServer(
+        args.model,
+        include_geometry_diagnostics=args.geometry_diagnostics,
+        viewer_options=get_viewer_options(args),
+        cache=get_cache(args),
+        debounce=args.debounce,
+    )
+    try:
+        model_server.serve_forever(host=args.host, port=args.port, watch=args.watch)
+    except KeyboardInterrupt:
+        pass
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+def convert_main(args: argparse.Namespace, timings: Timings | None = None):
+    """Run the default command: convert the model (or generate the loader) to the output path."""
     # Determine paths (relative to output HTML)
     output_dir = args.output.parent
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    if not args.embedded and not args.cdn:
-        js_lib_path = output_dir / JS_LIB_NAME
-        js_lib_path.write_text(get_js_library())
-        css_lib_path = output_dir / CSS_LIB_NAME
-        css_lib_path.write_text(get_css_library())
-
-        print(f"Generated: {js_lib_path} and {css_lib_path}")
+    if (args.loader or args.format == "html") and not args.embedded and not args.cdn:
+        write_library_files(output_dir)
 
     if args.loader:
         # Loader mode: generate HTML with file input, no model data
-        html_content = generate_loader_html(
-            include_geometry_diagnostics=args.geometry_diagnostics,
-            embedded=args.embedded,
-            cdn=args.cdn,
-        )
-        args.output.write_text(html_content)
+        with timed(timings, "render_html"):
+            html_content = generate_loader_html(
+                include_geometry_diagnostics=args.geometry_diagnostics,
+                embedded=args.embedded,
+                cdn=args.cdn,
+                viewer_options=get_viewer_options(args),
+            )
+        with timed(timings, "write"):
+            args.output.write_text(html_content)
         print(f"Generated: {args.output}")
         return
 
     if args.model:
-        import openstudio
-
         if not args.model.is_file():
             raise ValueError(f"Error: Model file '{args.model}' does not exist.")
-        model = openstudio.model.Model.load(args.model).get()
+        gltf_data = osm_to_gltf_json(
+            args.model,
+            include_geometry_diagnostics=args.geometry_diagnostics,
+            cache=get_cache(args),
+            timings=timings,
+            model_filter=get_model_filter(args),
+        )
     else:
         print("No model file provided, using example model")
-        model = create_example_model(include_geometry_diagnostics=args.geometry_diagnostics)
-        model.save(output_dir / "example_model.osm", True)
-        gltf_data = model_to_gltf_json(model=model, include_geometry_diagnostics=args.geometry_diagnostics)
+        with timed(timings, "load"):
+            model = create_example_model(include_geometry_diagnostics=args.geometry_diagnostics)
+            model.save(output_dir / "example_model.osm", True)
+        gltf_data = model_to_gltf_json(
+            model=model,
+            include_geometry_diagnostics=args.geometry_diagnostics,
+            timings=timings,
+            model_filter=get_model_filter(args),
+        )
         indent = 2 if args.pretty else None
-        import json
+        with timed(timings, "write"):
+            (output_dir / "example_model.gltf").write_text(json.dumps(gltf_data, indent=indent))
+
+    if args.optimize or args.quantize:
+        with timed(timings, "optimize"):
+            gltf_data = optimize_gltf_json(gltf_data, quantize=args.quantize)
+    if args.string_table:
+        with timed(timings, "string_table"):
+            gltf_data = encode_string_table(gltf_data)
+
+    if args.chunked:
+        from effibemviewer.chunks import write_chunked_gltf
 
-        (output_dir / "example_model.gltf").write_text(json.dumps(gltf_data, indent=indent))
+        with timed(timings, "write"):
+            manifest_path = write_chunked_gltf(
+                gltf_data, output_dir, stem=args.output.stem, binary=args.format != "gltf", compress=args.compress
+            )
+        print(f"Generated: {manifest_path} and its story chunks")
+        if args.format != "html":
+            return
+        with timed(timings, "render_html"):
+            html_content = generate_manifest_html(
+                manifest_url=f"./{manifest_path.name}",
+                include_geometry_diagnostics=args.geometry_diagnostics,
+                embedded=args.embedded,
+                cdn=args.cdn,
+                viewer_options=get_viewer_options(args),
+            )
+        with timed(timings, "write"):
+            args.output.write_text(html_content)
+        print(f"Generated: {args.output}")
+        return
+
+    if args.format != "html":
+        output = args.output.with_suffix(f".{args.format}")
+        if args.compress:
+            output = output.with_name(f"{output.name}.gz")
+            with timed(timings, "compress"):
+                compressed = compress_gltf_json(gltf_data, binary=args.format == "glb")
+            if timings is not None:
+                timings.sizes["compressed"] = len(compressed)
+            with timed(timings, "write"):
+                output.write_bytes(compressed)
+        elif args.format == "glb":
+            with timed(timings, "glb_pack"):
+                glb = gltf_json_to_glb(gltf_data)
+            if timings is not None:
+                timings.sizes["glb"] = len(glb)
+            with timed(timings, "write"):
+                output.write_bytes(glb)
+        else:
+            with timed(timings, "json_encode"):
+                gltf_json = json.dumps(gltf_data, indent=2 if args.pretty else None)
+            with timed(timings, "write"):
+                output.write_text(gltf_json)
+        print(f"Generated: {output}")
+        return
 
-    html_content = model_to_gltf_html(
-        model=model,
+    # Stream the HTML to the file, rather than building the full (potentially huge) string in memory
+    html_chunks = iter_gltf_json_html(
+        gltf_data=gltf_data,
         pretty_json=args.pretty,
         include_geometry_diagnostics=args.geometry_diagnostics,
         embedded=args.embedded,
         cdn=args.cdn,
+        viewer_options=get_viewer_options(args),
+        timings=timings,
+        compress=args.compress,
     )
-    args.output.write_text(html_content)
+    with timed(timings, "write"), args.output.open("w", encoding="utf-8") as f:
+        f.writelines(html_chunks)
     print(f"Generated: {args.output}")
 
 
+def main():
+    """Command-line interface for generating GLTF viewer HTML from an OpenStudio model."""
+    parser = get_parser()
+    args = parser.parse_args()
+
+    if args.command == "batch":
+        sys.exit(batch_main(args))
+    if args.command == "serve":
+        sys.exit(serve_main(args))
+
+    timings = Timings() if args.profile or args.profile_json is not None else None
+    convert_main(args, timings)
+    if timings is not None:
+        if args.profile:
+            print(timings.format(), file=sys.stderr)
+        if args.profile_json is not None:
+            args.profile_json.write_text(json.dumps(timings.to_dict(), indent=2))
+
+
 if __name__ == "__main__":
     main()
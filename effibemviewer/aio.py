@@ -0,0 +1,386 @@
+"""Asynchronous conversion API, for web services: the conversions run on a pool of workers, off the event loop."""
+
+from __future__ import annotations
+
+import functools
+import os
+import threading
+from collections.abc import Callable
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from weakref import WeakKeyDictionary
+
+# asyncio and concurrent.futures are imported lazily, like openstudio: importing asyncio alone would almost double the
+# import time of the package
+if TYPE_CHECKING:
+    import asyncio
+    from concurrent.futures import Executor
+
+    import openstudio
+
+    from effibemviewer.cache import GltfCache
+    from effibemviewer.filters import ModelFilter
+
+POOL_KINDS = ("process", "thread")
+
+
+def _init_worker():
+    """Import openstudio and compile the templates once per worker, instead of on its first conversion."""
+    import openstudio  # noqa: F401
+
+    from effibemviewer.gltf import warm_up_env
+
+    warm_up_env()
+
+
+def _ready() -> bool:
+    return True
+
+
+class ConversionPool:
+    """A pool of workers running the conversions of the async API, with a limit on the number of concurrent conversions.
+
+    OpenStudio holds the GIL while it loads and translates a model: in a thread pool, the event loop only runs between
+    these native calls, and the conversions do not run in parallel. The default process pool runs them in parallel,
+    without ever blocking the event loop, at the cost of sending the models and results between processes: prefer the
+    OSM path variants (`async_osm_to_gltf_json`, `async_osm_to_gltf_html`) with it, which load the model in the worker.
+
+    Conversions beyond `max_concurrency` wait in the event loop, before reaching the pool. Cancelling a waiting or
+    queued conversion (e.g. when the client of a web request disconnects, or with `asyncio.wait_for`) removes it; a
+    conversion that is already running in a worker cannot be interrupted: it completes, and its result is discarded.
+
+    Use it as an async context manager, or call `start` and `close` at the startup and shutdown of the service.
+
+    Args:
+        kind: "process" (default) or "thread"
+        max_workers: Number of worker processes or threads (default: number of CPUs)
+        max_concurrency: Maximum number of conversions submitted to the workers at once, per event loop (default:
+            max_workers)
+
+    Raises:
+        ValueError: If the kind is unknown, or a limit is lower than 1
+    """
+
+    def __init__(self, kind: str = "process", max_workers: int | None = None, max_concurrency: int | None = None):
+        """Initialize the pool. The workers are started by `start`, or on the first conversion."""
+        if kind not in POOL_KINDS:
+            raise ValueError(f"Unknown pool kind '{kind}', expected one of {POOL_KINDS}")
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency or self.max_workers
+        if self.max_workers < 1 or self.max_concurrency < 1:
+            raise ValueError("max_workers and max_concurrency must be at least 1")
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+        # One semaphore per event loop, as an asyncio semaphore cannot be shared between loops
+        self._semaphores: WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = WeakKeyDictionary()
+
+    def __repr__(self):
+        """Return a string representation of the pool."""
+        return (
+            f"ConversionPool(kind={self.kind!r}, max_workers={self.max_workers}, "
+            f"max_concurrency={self.max_concurrency})"
+        )
+
+    @property
+    def executor(self) -> Executor:
+        """The executor of the workers, created on first use."""
+        with self._lock:
+            if self._executor is None:
+                from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+                executor_class = ProcessPoolExecutor if self.kind == "process" else ThreadPoolExecutor
+                self._executor = executor_class(max_workers=self.max_workers, initializer=_init_worker)
+            return self._executor
+
+    async def start(self):
+        """Start all the workers, and wait until they have imported openstudio and compiled the templates."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _ready) for _ in range(self.max_workers)))
+
+    async def run(self, function: Callable, /, *args: Any, **kwargs: Any) -> Any:
+        """Run `function(*args, **kwargs)` on a worker, once fewer than `max_concurrency` conversions are running.
+
+        With a process pool, the function, its arguments and its result must be picklable.
+
+        Returns:
+            The result of the function
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+
+        await semaphore.acquire()
+        try:
+            future = self.executor.submit(functools.partial(function, *args, **kwargs))
+        except BaseException:
+            semaphore.release()
+            raise
+
+        def _release(_):
+            # Only once the worker is done, even if the caller was cancelled meanwhile, so the limit always holds
+            try:
+                loop.call_soon_threadsafe(semaphore.release)
+            except RuntimeError:
+                # The event loop is closed
+                pass
+
+        future.add_done_callback(_release)
+        # Cancelling the wrapping future cancels the conversion if it has not started yet
+        return await asyncio.wrap_future(future)
+
+    def close(self, wait: bool = True):
+        """Shut the workers down, cancelling the queued conversions.
+
+        Args:
+            wait: If True, wait for the running conversions to complete
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    async def __aenter__(self) -> ConversionPool:
+        """Start the workers."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Shut the workers down, without blocking the event loop."""
+        import asyncio
+
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+
+_default_pool: ConversionPool | None = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool() -> ConversionPool:
+    """Get the pool used when no `pool` is given: a process pool with one worker per CPU, created on first use."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ConversionPool()
+        return _default_pool
+
+
+def _load_model_string(content: str) -> openstudio.model.Model:
+    """Load a model serialized with `str(model)`, in a worker process."""
+    import openstudio
+
+    optional_model = openstudio.osversion.VersionTranslator().loadModelFromString(content)
+    if not optional_model.is_initialized():
+        raise ValueError("Failed to load the model in the worker process")
+    return optional_model.get()
+
+
+def _model_string_to_gltf_json(content: str, **kwargs) -> dict:
+    from effibemviewer.gltf import model_to_gltf_json
+
+    return model_to_gltf_json(_load_model_string(content), **kwargs)
+
+
+def _model_string_to_gltf_html(content: str, **kwargs) -> str:
+    from effibemviewer.gltf import model_to_gltf_html
+
+    return model_to_gltf_html(_load_model_string(content), **kwargs)
+
+
+def _osm_to_gltf_html(osm_path: Path, cache: GltfCache | None, model_filter: ModelFilter | None, **kwargs) -> str:
+    from effibemviewer.gltf import gltf_json_to_html, osm_to_gltf_json
+
+    gltf_data = osm_to_gltf_json(
+        osm_path,
+        include_geometry_diagnostics=kwargs["include_geometry_diagnostics"],
+        cache=cache,
+        model_filter=model_filter,
+    )
+    return gltf_json_to_html(gltf_data, **kwargs)
+
+
+async def _run_model(
+    pool: ConversionPool | None, function_name: str, model: openstudio.model.Model, kwargs: dict
+) -> Any:
+    """Run a conversion function of `effibemviewer.gltf` on a model, serializing it for a process pool."""
+    import effibemviewer.gltf
+
+    pool = pool or get_default_pool()
+    if pool.kind == "thread":
+        return await pool.run(getattr(effibemviewer.gltf, function_name), model, **kwargs)
+    # OpenStudio models cannot be pickled: send the OSM text instead
+    worker_function = (
+        _model_string_to_gltf_json if function_name == "model_to_gltf_json" else _model_string_to_gltf_html
+    )
+    return await pool.run(worker_function, str(model), **kwargs)
+
+
+async def async_model_to_gltf_json(
+    model: openstudio.model.Model,
+    include_geometry_diagnostics: bool = False,
+    cache: GltfCache | None = None,
+    model_filter: ModelFilter | None = None,
+    pool: ConversionPool | None = None,
+) -> dict:
+    """Convert an OpenStudio model to GLTF JSON format (dict) on a worker, see `model_to_gltf_json`.
+
+    With a thread pool, the model must not be modified until the conversion completes. With a process pool, the model
+    is serialized on the calling thread (a fraction of the conversion time) and loaded again in the worker.
+
+    Args:
+        model: OpenStudio model to convert
+        include_geometry_diagnostics: If True, include geometry diagnostic info in the output
+        cache: Optional cache of conversion results, see `model_to_gltf_json`
+        model_filter: Optional `ModelFilter`, to convert only a part of the model
+        pool: The `ConversionPool` to run the conversion on (default: `get_default_pool()`)
+
+    Returns:
+        dict: GLTF JSON data representing the model
+
+    Raises:
+        ValueError: If geometry diagnostics are requested, but neither supported by the OpenStudio version nor
+            computable without NumPy
+    """
+    kwargs = {
+        "include_geometry_diagnostics": include_geometry_diagnostics,
+        "cache": cache,
+        "model_filter": model_filter,
+    }
+    return await _run_model(pool, "model_to_gltf_json", model, kwargs)
+
+
+async def async_osm_to_gltf_json(
+    osm_path: str | Path,
+    include_geometry_diagnostics: bool = False,
+    cache: GltfCache | None = None,
+    model_filter: ModelFilter | None = None,
+    pool: ConversionPool | None = None,
+) -> dict:
+    """Load an OpenStudio model file and convert it to GLTF JSON format (dict) on a worker, see `osm_to_gltf_json`.
+
+    Args:
+        osm_path: Path to the OpenStudio model file
+        include_geometry_diagnostics: If True, include geometry diagnostic info in the output
+        cache: Optional cache of conversion results, see `osm_to_gltf_json`
+        model_filter: Optional `ModelFilter`, to convert only a part of the model
+        pool: The `ConversionPool` to run the conversion on (default: `get_default_pool()`)
+
+    Returns:
+        dict: GLTF JSON data representing the model
+
+    Raises:
+        ValueError: If the model file cannot be loaded, or if geometry diagnostics are requested but cannot be
+            included (see `model_to_gltf_json`)
+    """
+    from effibemviewer.gltf import osm_to_gltf_json
+
+    pool = pool or get_default_pool()
+    return await pool.run(
+        osm_to_gltf_json,
+        Path(osm_path),
+        include_geometry_diagnostics=include_geometry_diagnostics,
+        cache=cache,
+        model_filter=model_filter,
+    )
+
+
+async def async_model_to_gltf_html(
+    model: openstudio.model.Model,
+    height: str = "100vh",
+    pretty_json: bool = False,
+    include_geometry_diagnostics: bool = False,
+    embedded: bool = True,
+    script_only: bool = False,
+    cdn: bool = False,
+    viewer_options: dict | None = None,
+    cache: GltfCache | None = None,
+    compress: bool = False,
+    model_filter: ModelFilter | None = None,
+    pool: ConversionPool | None = None,
+) -> str:
+    """Generate the standalone HTML page for viewing an OpenStudio model on a worker, see `model_to_gltf_html`.
+
+    The model is handled as in `async_model_to_gltf_json`.
+
+    Args:
+        model: OpenStudio model to render
+        height: CSS height value (default "100vh" for full viewport)
+        pretty_json: If True, format JSON with indentation
+        include_geometry_diagnostics: If True, include geometry diagnostic info
+        embedded: If True, inline the JS library. If False, reference external JS file.
+        script_only: If True, generate only the script fragment (for Jupyter)
+        cdn: If True, reference JS/CSS from jsDelivr CDN (overrides embedded)
+        viewer_options: Extra options for the JS `EffiBEMViewer` constructor, e.g. `{"mergedGeometry": True}`
+        cache: Optional cache of GLTF conversion results, see `model_to_gltf_json`
+        compress: If True, embed the model as gzip-compressed GLB instead of JSON, see `gltf_json_to_html`
+        model_filter: Optional `ModelFilter`, to render only a part of the model
+        pool: The `ConversionPool` to run the conversion on (default: `get_default_pool()`)
+    """
+    kwargs = {
+        "height": height,
+        "pretty_json": pretty_json,
+        "include_geometry_diagnostics": include_geometry_diagnostics,
+        "embedded": embedded,
+        "script_only": script_only,
+        "cdn": cdn,
+        "viewer_options": viewer_options,
+        "cache": cache,
+        "compress": compress,
+        "model_filter": model_filter,
+    }
+    return await _run_model(pool, "model_to_gltf_html", model, kwargs)
+
+
+async def async_osm_to_gltf_html(
+    osm_path: str | Path,
+    height: str = "100vh",
+    pretty_json: bool = False,
+    include_geometry_diagnostics: bool = False,
+    embedded: bool = True,
+    script_only: bool = False,
+    cdn: bool = False,
+    viewer_options: dict | None = None,
+    cache: GltfCache | None = None,
+    compress: bool = False,
+    model_filter: ModelFilter | None = None,
+    pool: ConversionPool | None = None,
+) -> str:
+    """Load an OpenStudio model file and generate the HTML page for viewing it on a worker.
+
+    Args:
+        osm_path: Path to the OpenStudio model file
+        height: CSS height value (default "100vh" for full viewport)
+        pretty_json: If True, format JSON with indentation
+        include_geometry_diagnostics: If True, include geometry diagnostic info
+        embedded: If True, inline the JS library. If False, reference external JS file.
+        script_only: If True, generate only the script fragment (for Jupyter)
+        cdn: If True, reference JS/CSS from jsDelivr CDN (overrides embedded)
+        viewer_options: Extra options for the JS `EffiBEMViewer` constructor, e.g. `{"mergedGeometry": True}`
+        cache: Optional cache of GLTF conversion results, see `osm_to_gltf_json`
+        compress: If True, embed the model as gzip-compressed GLB instead of JSON, see `gltf_json_to_html`
+        model_filter: Optional `ModelFilter`, to render only a part of the model
+        pool: The `ConversionPool` to run the conversion on (default: `get_default_pool()`)
+
+    Raises:
+        ValueError: If the model file cannot be loaded
+    """
+    pool = pool or get_default_pool()
+    return await pool.run(
+        _osm_to_gltf_html,
+        Path(osm_path),
+        cache,
+        model_filter,
+        height=height,
+        pretty_json=pretty_json,
+        include_geometry_diagnostics=include_geometry_diagnostics,
+        embedded=embedded,
+        script_only=script_only,
+        cdn=cdn,
+        viewer_options=viewer_options,
+        compress=compress,
+    )
@@ -0,0 +1,25 @@
+"""NumPy helpers shared by the geometry optimization pass and the geometry diagnostics."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def expand_ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Concatenate the ranges [start, start + count), without a Python loop.
+
+    For example, starts [10, 3] and counts [2, 3] give [10, 11, 3, 4, 5].
+
+    Args:
+        starts: First index of each range
+        counts: Length of each range
+
+    Returns:
+        np.ndarray: The indices of all the ranges, in order
+    """
+    import numpy as np
+
+    return np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(int(counts.sum()))
@@ -0,0 +1,293 @@
+"""Parallel batch conversion of OpenStudio models to viewer HTML, GLTF or GLB files."""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from effibemviewer.string_table import encode_string_table
+from effibemviewer.timings import Timings, timed
+
+if TYPE_CHECKING:
+    from effibemviewer.cache import GltfCache
+    from effibemviewer.filters import ModelFilter
+
+OUTPUT_FORMATS = ("html", "gltf", "glb")
+
+
+def find_models(inputs: Iterable[Path]) -> list[Path]:
+    """Expand a list of OSM files and/or directories into a sorted list of OSM files.
+
+    Args:
+        inputs: OSM file paths, or directories that will be searched (non-recursively) for `*.osm` files
+
+    Returns:
+        list[Path]: The OSM files to convert
+    """
+    models: list[Path] = []
+    for path in inputs:
+        if path.is_dir():
+            models.extend(sorted(path.glob("*.osm")))
+        else:
+            models.append(path)
+    return models
+
+
+def output_names(models: list[Path]) -> list[str]:
+    """Name the output of each model, without extension, so that no two models are written to the same file.
+
+    Each output is named after its model file. When several models share a file name, their directories are added,
+    from the first directory where their paths differ, e.g. `dirA/model.osm` and `dirB/model.osm` are written to
+    `dirA__model` and `dirB__model`.
+
+    Args:
+        models: OSM file paths to convert
+
+    Returns:
+        list[str]: The output name of each model, or an empty string for a model that is listed twice (or whose name
+            still collides)
+    """
+    by_stem: dict[str, list[int]] = {}
+    for i, osm_path in enumerate(models):
+        by_stem.setdefault(osm_path.stem, []).append(i)
+    names = [osm_path.stem for osm_path in models]
+    for stem, indices in by_stem.items():
+        if len(indices) == 1:
+            continue
+        parents = [models[i].resolve().parent for i in indices]
+        common = Path(os.path.commonpath(parents))
+        for i, parent in zip(indices, parents):
+            names[i] = "__".join([*parent.relative_to(common).parts, stem])
+    seen: set[str] = set()
+    for i, name in enumerate(names):
+        if name in seen:
+            names[i] = ""
+        seen.add(name)
+    return names
+
+
+def _init_worker():
+    """Import openstudio once per worker process, instead of once per model."""
+    import openstudio  # noqa: F401
+
+
+def convert_model_file(
+    osm_path: Path,
+    output_dir: Path,
+    output_format: str = "html",
+    include_geometry_diagnostics: bool = False,
+    embedded: bool = False,
+    cdn: bool = False,
+    viewer_options: dict | None = None,
+    cache: GltfCache | None = None,
+    profile: bool = False,
+    compress: bool = False,
+    optimize: bool = False,
+    quantize: bool = False,
+    string_table: bool = False,
+    model_filter: ModelFilter | None = None,
+    output_name: str | None = None,
+) -> dict:
+    """Load a single OSM file and write its converted output to `output_dir`.
+
+    Args:
+        osm_path: Path to the OpenStudio model file
+        output_dir: Directory where the output file is written
+        output_format: One of "html", "gltf" or "glb"
+        include_geometry_diagnostics: If True, include geometry diagnostic info
+        embedded: If True (html only), inline the JS library. If False, reference the external JS file.
+        cdn: If True (html only), reference JS/CSS from jsDelivr CDN (overrides embedded)
+        viewer_options: Extra options (html only) for the JS `EffiBEMViewer` constructor
+        cache: Optional cache of GLTF conversion results. On a cache hit, the model is not loaded at all.
+        profile: If True, add the "timings" of each conversion stage to the result, see `Timings.to_dict`
+        compress: If True, compress the model data with gzip: embedded in the HTML as compressed GLB, or written as
+            `.gltf.gz` / `.glb.gz` files, see `compress_gltf_json`
+        optimize: If True, weld duplicate vertices and drop the normals of planar surfaces, see `optimize_gltf_json`
+        quantize: If True (with optimize), also quantize the positions to int16
+        string_table: If True, store the repeated surface metadata in a shared string table, see `encode_string_table`
+        model_filter: Optional `ModelFilter`, to convert only a part of the model
+        output_name: Name of the output file, without extension (default: the name of the model file)
+
+    Returns:
+        dict: The input and output paths, the number of bytes written and the elapsed wall time in seconds
+
+    Raises:
+        ValueError: If the model file cannot be loaded
+    """
+    from effibemviewer.gltf import (
+        compress_gltf_json,
+        gltf_json_to_glb,
+        iter_gltf_json_html,
+        optimize_gltf_json,
+        osm_to_gltf_json,
+    )
+
+    start = time.perf_counter()
+    timings = Timings() if profile else None
+    gltf_data = osm_to_gltf_json(
+        osm_path,
+        include_geometry_diagnostics=include_geometry_diagnostics,
+        cache=cache,
+        timings=timings,
+        model_filter=model_filter,
+    )
+    if optimize:
+        with timed(timings, "optimize"):
+            gltf_data = optimize_gltf_json(gltf_data, quantize=quantize)
+    if string_table:
+        with timed(timings, "string_table"):
+            gltf_data = encode_string_table(gltf_data)
+
+    output_path = output_dir / f"{output_name or osm_path.stem}.{output_format}"
+    if compress and output_format != "html":
+        output_path = output_path.with_name(f"{output_path.name}.gz")
+        with timed(timings, "compress"):
+            compressed = compress_gltf_json(gltf_data, binary=output_format == "glb")
+        if timings is not None:
+            timings.sizes["compressed"] = len(compressed)
+        with timed(timings, "write"):
+            output_path.write_bytes(compressed)
+    elif output_format == "html":
+        html_chunks = iter_gltf_json_html(
+            gltf_data=gltf_data,
+            include_geometry_diagnostics=include_geometry_diagnostics,
+            embedded=embedded,
+            cdn=cdn,
+            viewer_options=viewer_options,
+            timings=timings,
+            compress=compress,
+        )
+        with timed(timings, "write"), output_path.open("w", encoding="utf-8") as f:
+            f.writelines(html_chunks)
+    elif output_format == "glb":
+        with timed(timings, "glb_pack"):
+            glb = gltf_json_to_glb(gltf_data)
+        if timings is not None:
+            timings.sizes["glb"] = len(glb)
+        with timed(timings, "write"):
+            output_path.write_bytes(glb)
+    else:
+        with timed(timings, "json_encode"):
+            gltf_json = json.dumps(gltf_data)
+        with timed(timings, "write"):
+            output_path.write_text(gltf_json)
+
+    result = {
+        "input": str(osm_path),
+        "output": str(output_path),
+        "bytes": output_path.stat().st_size,
+        "seconds": time.perf_counter() - start,
+    }
+    if timings is not None:
+        result["timings"] = timings.to_dict()
+    return result
+
+
+def batch_convert(
+    models: Iterable[Path],
+    output_dir: Path,
+    jobs: int | None = None,
+    output_format: str = "html",
+    include_geometry_diagnostics: bool = False,
+    embedded: bool = False,
+    cdn: bool = False,
+    viewer_options: dict | None = None,
+    cache: GltfCache | None = None,
+    on_result: Callable[[dict], None] | None = None,
+    profile: bool = False,
+    compress: bool = False,
+    optimize: bool = False,
+    quantize: bool = False,
+    string_table: bool = False,
+    model_filter: ModelFilter | None = None,
+) -> list[dict]:
+    """Convert many OSM files in parallel, across a pool of worker processes.
+
+    Each worker process imports openstudio only once. A failure to convert one model does not stop the batch: it is
+    reported in the results instead. Outputs are named after their model file, see `output_names` for models that share
+    one. A model listed twice is reported as a failure.
+
+    Args:
+        models: OSM file paths to convert
+        output_dir: Directory where the output files are written
+        jobs: Number of worker processes (default: number of CPUs). With 1, models are converted in this process.
+        output_format: One of "html", "gltf" or "glb"
+        include_geometry_diagnostics: If True, include geometry diagnostic info
+        embedded: If True (html only), inline the JS library. If False, reference the external JS file.
+        cdn: If True (html only), reference JS/CSS from jsDelivr CDN (overrides embedded)
+        viewer_options: Extra options (html only) for the JS `EffiBEMViewer` constructor
+        cache: Optional cache of GLTF conversion results, shared by all the workers
+        on_result: Optional callback, called with each result as soon as it is available
+        profile: If True, add the "timings" of each conversion stage to the results, see `Timings.to_dict`
+        compress: If True, compress the model data with gzip, see `convert_model_file`
+        optimize: If True, optimize the geometry buffers, see `convert_model_file`
+        quantize: If True (with optimize), also quantize the positions to int16
+        string_table: If True, store the repeated surface metadata in a shared string table, see `encode_string_table`
+        model_filter: Optional `ModelFilter`, applied to every model
+
+    Returns:
+        list[dict]: One result per model, in completion order. Successful results are described in
+            `convert_model_file`, failed ones have an "error" key instead of "output".
+
+    Raises:
+        ValueError: If the output format is unknown
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}', expected one of {OUTPUT_FORMATS}")
+    models = list(models)
+    names = output_names(models)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    jobs = jobs or os.cpu_count() or 1
+    convert = functools.partial(
+        convert_model_file,
+        output_dir=output_dir,
+        output_format=output_format,
+        include_geometry_diagnostics=include_geometry_diagnostics,
+        embedded=embedded,
+        cdn=cdn,
+        viewer_options=viewer_options,
+        cache=cache,
+        profile=profile,
+        compress=compress,
+        optimize=optimize,
+        quantize=quantize,
+        string_table=string_table,
+        model_filter=model_filter,
+    )
+
+    results = []
+
+    def _record(result: dict):
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+
+    to_convert = []
+    for osm_path, name in zip(models, names):
+        if name:
+            to_convert.append((osm_path, name))
+        else:
+            _record({"input": str(osm_path), "error": "Another model of the batch is written to the same output file"})
+
+    if jobs == 1:
+        for osm_path, name in to_convert:
+            try:
+                _record(convert(osm_path, output_name=name))
+            except Exception as e:
+                _record({"input": str(osm_path), "error": str(e)})
+        return results
+
+    with ProcessPoolExecutor(max_workers=min(jobs, max(len(to_convert), 1)), initializer=_init_worker) as executor:
+        futures = {executor.submit(convert, osm_path, output_name=name): osm_path for osm_path, name in to_convert}
+        for future in as_completed(futures):
+            try:
+                _record(future.result())
+            except Exception as e:
+                _record({"input": str(futures[future]), "error": str(e)})
+    return results
@@ -0,0 +1,144 @@
+"""Content-addressed on-disk cache for GLTF conversion results."""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from effibemviewer.filters import ModelFilter
+
+# Bump when the cached payload format changes, to invalidate existing entries
+CACHE_FORMAT_VERSION = 1
+CACHE_DIR_ENV_VAR = "EFFIBEMVIEWER_CACHE_DIR"
+DEFAULT_MAX_SIZE = 1024**3  # 1 GiB
+CACHE_SUFFIX = ".gltf.json.gz"
+
+
+@lru_cache(maxsize=1)
+def openstudio_version() -> str:
+    """Get the installed OpenStudio version, without importing openstudio when the package metadata is available."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("openstudio")
+    except PackageNotFoundError:
+        import openstudio
+
+        return openstudio.openStudioLongVersion()
+
+
+class GltfCache:
+    """A size-bounded, least-recently-used cache of GLTF JSON data, stored as gzip-compressed files.
+
+    Entries are keyed by the content hash of the model, the OpenStudio version and the conversion options, so a stale
+    entry is never returned: a changed model or a different OpenStudio simply produces a different key. Writes are
+    atomic, so several processes (e.g. batch workers) can safely share the same cache directory.
+
+    Args:
+        cache_dir: Directory where the entries are stored (created if needed)
+        max_size: Maximum total size of the entries, in bytes. The least recently used entries are evicted beyond it.
+    """
+
+    def __init__(self, cache_dir: str | Path, max_size: int = DEFAULT_MAX_SIZE):
+        """Initialize the cache in cache_dir."""
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+
+    def __repr__(self):
+        """Return a string representation of the cache."""
+        return f"GltfCache(cache_dir={str(self.cache_dir)!r}, max_size={self.max_size})"
+
+    @staticmethod
+    def make_key(
+        content: bytes, include_geometry_diagnostics: bool = False, model_filter: ModelFilter | None = None
+    ) -> str:
+        """Compute the cache key of a model.
+
+        Args:
+            content: The model content, typically the bytes of the OSM file
+            include_geometry_diagnostics: Whether geometry diagnostics are included in the conversion
+            model_filter: The `ModelFilter` applied before the conversion, if any
+
+        Returns:
+            str: The hexadecimal cache key
+        """
+        h = hashlib.sha256()
+        h.update(f"{CACHE_FORMAT_VERSION}|{openstudio_version()}|{int(include_geometry_diagnostics)}|".encode())
+        if model_filter is not None:
+            h.update(f"{model_filter.cache_key()}|".encode())
+        h.update(content)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{CACHE_SUFFIX}"
+
+    def get(self, key: str) -> dict | None:
+        """Get the GLTF JSON data stored for key, or None on a cache miss."""
+        path = self._path(key)
+        try:
+            data = json.loads(gzip.decompress(path.read_bytes()))
+        except (FileNotFoundError, OSError, ValueError):
+            # Missing, or evicted / corrupted by a concurrent process: treat as a miss
+            return None
+        # Mark as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key: str, gltf_data: dict):
+        """Store the GLTF JSON data for key, then evict the least recently used entries if over the size limit."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        payload = gzip.compress(json.dumps(gltf_data, separators=(",", ":")).encode(), compresslevel=6)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def entries(self) -> list[tuple[Path, os.stat_result]]:
+        """List the cache entries with their stat result, least recently used first."""
+        entries = []
+        for path in self.cache_dir.glob(f"*{CACHE_SUFFIX}"):
+            try:
+                entries.append((path, path.stat()))
+            except FileNotFoundError:
+                continue
+        return sorted(entries, key=lambda entry: entry[1].st_mtime)
+
+    def size(self) -> int:
+        """Get the total size of the cache entries, in bytes."""
+        return sum(stat.st_size for _, stat in self.entries())
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in max_size."""
+        entries = self.entries()
+        total = sum(stat.st_size for _, stat in entries)
+        for path, stat in entries:
+            if total <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            total -= stat.st_size
+
+    def clear(self):
+        """Remove all the cache entries."""
+        for path, _ in self.entries():
+            path.unlink(missing_ok=True)
+
+
+def get_default_cache() -> GltfCache | None:
+    """Get the cache configured by the EFFIBEMVIEWER_CACHE_DIR environment variable, if any."""
+    cache_dir = os.environ.get(CACHE_DIR_ENV_VAR)
+    return GltfCache(cache_dir) if cache_dir else None
@@ -0,0 +1,143 @@
+"""Split converted GLTF data per building story, for progressive loading in the viewer."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from effibemviewer import __version__
+from effibemviewer.gltf_buffers import NORMALIZED_MAX, decode_buffers, extract_nodes, world_matrices
+from effibemviewer.string_table import STRING_TABLE_KEY
+
+MANIFEST_VERSION = 1
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def _mesh_bounds(gltf_data: dict, mesh_index: int, matrix: list[float]) -> tuple[list[float], list[float]] | None:
+    """Get the world-space axis-aligned bounding box of a mesh, from the min/max of its POSITION accessors."""
+    lo = [float("inf")] * 3
+    hi = [float("-inf")] * 3
+    for primitive in gltf_data["meshes"][mesh_index].get("primitives", []):
+        accessor = gltf_data["accessors"][primitive["attributes"]["POSITION"]]
+        if "min" not in accessor or "max" not in accessor:
+            continue
+        scale = 1 / NORMALIZED_MAX[accessor["componentType"]] if accessor.get("normalized") else 1
+        for corner in range(8):
+            p = [(accessor["max"][a] if corner >> a & 1 else accessor["min"][a]) * scale for a in range(3)]
+            for a in range(3):
+                v = matrix[a] * p[0] + matrix[4 + a] * p[1] + matrix[8 + a] * p[2] + matrix[12 + a]
+                lo[a] = min(lo[a], v)
+                hi[a] = max(hi[a], v)
+    return (lo, hi) if lo[0] <= hi[0] else None
+
+
+def split_gltf_by_story(gltf_data: dict) -> list[dict]:
+    """Split GLTF JSON data into one self-contained GLTF per building story.
+
+    Surfaces are assigned to a story by their `buildingStoryName`. Surfaces without a story (e.g. site shading) go
+    to a last chunk, whose story is "". The input dict is not modified. Data encoded by `encode_string_table` is
+    supported: each chunk keeps the string table.
+
+    Args:
+        gltf_data: GLTF JSON data, as returned by `model_to_gltf_json`
+
+    Returns:
+        list[dict]: One `{"story", "gltf", "surfaceCount", "boundingBox"}` dict per story, from the lowest story to the
+            highest. The bounding box is `{"min": [x, y, z], "max": [x, y, z]}`, in the (Y-up) GLTF world coordinates.
+
+    Raises:
+        ValueError: If a buffer is not an embedded base64 data URI
+    """
+    buffers = decode_buffers(gltf_data)
+    matrices = world_matrices(gltf_data)
+    nodes = gltf_data.get("nodes", [])
+    scene = gltf_data["scenes"][gltf_data.get("scene", 0)]
+    strings = scene.get("extras", {}).get(STRING_TABLE_KEY, {}).get("strings", [])
+
+    stories: dict[str, set[int]] = {}
+    bounds: dict[str, tuple[list[float], list[float]]] = {}
+    for i, matrix in matrices.items():
+        node = nodes[i]
+        if "mesh" not in node:
+            continue
+        story = node.get("extras", {}).get("buildingStoryName", "")
+        if type(story) is int:
+            story = strings[story]
+        stories.setdefault(story, set()).add(i)
+        mesh_bounds = _mesh_bounds(gltf_data, node["mesh"], matrix)
+        if mesh_bounds is not None:
+            lo, hi = bounds.setdefault(story, ([float("inf")] * 3, [float("-inf")] * 3))
+            for a in range(3):
+                lo[a] = min(lo[a], mesh_bounds[0][a])
+                hi[a] = max(hi[a], mesh_bounds[1][a])
+
+    def sort_key(story: str) -> tuple[bool, float, str]:
+        return (story == "", bounds[story][0][1] if story in bounds else 0.0, story)
+
+    return [
+        {
+            "story": story,
+            "gltf": extract_nodes(gltf_data, buffers, stories[story]),
+            "surfaceCount": len(stories[story]),
+            "boundingBox": {"min": bounds[story][0], "max": bounds[story][1]} if story in bounds else None,
+        }
+        for story in sorted(stories, key=sort_key)
+    ]
+
+
+def write_chunked_gltf(
+    gltf_data: dict, output_dir: str | Path, stem: str = "model", binary: bool = True, compress: bool = False
+) -> Path:
+    """Write GLTF JSON data split per building story, with a manifest for progressive loading in the viewer.
+
+    The chunks are written as `<stem>.story-<n>.glb` (or `.gltf`, plus `.gz` if compressed), and the manifest as
+    `<stem>.manifest.json`. The
+    manifest holds the scene extras (bounding box, north axis, story names...) and, for each chunk, its story name,
+    file name, number of surfaces and bounding box. Load it with `EffiBEMViewer.loadFromManifest()`.
+
+    Args:
+        gltf_data: GLTF JSON data, as returned by `model_to_gltf_json`
+        output_dir: Directory where the chunks and the manifest are written (created if needed)
+        stem: Base name of the written files
+        binary: If True, write the chunks as binary GLB. Otherwise, as GLTF JSON.
+        compress: If True, compress the chunks with gzip, see `compress_gltf_json`
+
+    Returns:
+        Path: The path to the manifest file
+    """
+    from effibemviewer.gltf import compress_gltf_json, gltf_json_to_glb
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    suffix = "glb" if binary else "gltf"
+    if compress:
+        suffix = f"{suffix}.gz"
+
+    manifest_chunks = []
+    for n, chunk in enumerate(split_gltf_by_story(gltf_data), start=1):
+        uri = f"{stem}.story-{n:02d}.{suffix}"
+        if compress:
+            (output_dir / uri).write_bytes(compress_gltf_json(chunk["gltf"], binary=binary))
+        elif binary:
+            (output_dir / uri).write_bytes(gltf_json_to_glb(chunk["gltf"]))
+        else:
+            (output_dir / uri).write_text(json.dumps(chunk["gltf"]))
+        manifest_chunks.append(
+            {
+                "story": chunk["story"],
+                "uri": uri,
+                "surfaceCount": chunk["surfaceCount"],
+                "boundingBox": chunk["boundingBox"],
+            }
+        )
+
+    scene = gltf_data["scenes"][gltf_data.get("scene", 0)]
+    manifest = {
+        "asset": {"generator": f"EffiBEMViewer {__version__}", "version": MANIFEST_VERSION},
+        # Each chunk has its own copy of the string table, if any
+        "scene": {"extras": {k: v for k, v in scene.get("extras", {}).items() if k != STRING_TABLE_KEY}},
+        "chunks": manifest_chunks,
+    }
+    manifest_path = output_dir / f"{stem}{MANIFEST_SUFFIX}"
+    manifest_path.write_text(json.dumps(manifest))
+    return manifest_path
@@ -0,0 +1,308 @@
+"""Geometry diagnostics of the surfaces and spaces of a model, for OpenStudio versions that cannot export them.
+
+The viewer shows four diagnostics from the surface extras: `convex` (the surface polygon), `correctlyOriented` (its
+outward normal points out of its space), `spaceConvex` and `spaceEnclosed`. The OpenStudio GLTF translator only writes
+them when it has `setIncludeGeometryDiagnostics`, which no released version has as of 3.11.
+`compute_geometry_diagnostics` computes them from the model instead: the vertices of all the surfaces are read in a
+single pass, then each check is a few NumPy operations over all the surfaces (or all the pairs of items of the same
+space) at once, so it scales to models with tens of thousands of surfaces.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from typing import TYPE_CHECKING
+
+from effibemviewer.arrays import expand_ranges
+
+if TYPE_CHECKING:
+    import numpy as np
+    import openstudio
+
+# The diagnostics in the GLTF extras. Surfaces that are not part of a space volume (sub surfaces, shading, interior
+# partitions) only have a meaningful `convex`: the others are True, as with the OpenStudio translators.
+DIAGNOSTIC_KEYS = ("convex", "correctlyOriented", "spaceConvex", "spaceEnclosed")
+# Distance (m) under which two vertices are the same, a vertex is on an edge, or on the plane of a surface
+TOLERANCE = 0.01
+# Largest number of pairs of items of the same space (e.g. edges and vertices) evaluated at once, to bound the memory
+_PAIR_CHUNK = 1 << 20
+# Fraction of the way from a convex corner of a surface towards its neighbors where the orientation ray starts, so it
+# starts inside the surface
+_INTERIOR_STEP = 1e-3
+
+
+def _read_vertices(model: openstudio.model.Model) -> tuple[list[str], np.ndarray, np.ndarray, np.ndarray]:
+    """Read the handle (as in the GLTF extras), space index and vertices of all the planar surfaces, in one pass.
+
+    Only the base surfaces of a space get its index, the other surfaces get -1. The vertices are in the coordinates of
+    the space (or shading surface group) of each surface, and are returned as a single (n, 3) array.
+    """
+    import numpy as np
+
+    handles: list[str] = []
+    spaces: list[int] = []
+    counts: list[int] = []
+    coords: list[float] = []
+
+    def add(surface: openstudio.model.PlanarSurface, space: int):
+        vertices = surface.vertices()
+        handles.append(str(surface.handle()).strip("{}"))
+        spaces.append(space)
+        counts.append(len(vertices))
+        for vertex in vertices:
+            coords.extend((vertex.x(), vertex.y(), vertex.z()))
+
+    for i, space in enumerate(model.getSpaces()):
+        for surface in space.surfaces():
+            add(surface, i)
+    surfaces = model.getSurfaces()
+    if len(handles) < len(surfaces):
+        in_spaces = set(handles)
+        for surface in surfaces:
+            if str(surface.handle()).strip("{}") not in in_spaces:
+                add(surface, -1)
+    for get_objects in ("getSubSurfaces", "getShadingSurfaces", "getInteriorPartitionSurfaces"):
+        for surface in getattr(model, get_objects)():
+            add(surface, -1)
+    return (
+        handles,
+        np.array(spaces, dtype=np.int64),
+        np.array(counts, dtype=np.int64),
+        np.array(coords, dtype=np.float64).reshape(-1, 3),
+    )
+
+
+def _pairs_within_groups(
+    left_groups: np.ndarray, right_starts: np.ndarray, right_counts: np.ndarray
+) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Yield all the pairs of a left item and a right item of the same group, in chunks of about `_PAIR_CHUNK` pairs.
+
+    The right items of group g are the range [right_starts[g], right_starts[g] + right_counts[g]). The pairs of each
+    left item are contiguous and in order.
+
+    Yields:
+        tuple: The left and right indices of the pairs, and the index of the first pair of each left item
+    """
+    import numpy as np
+
+    counts = right_counts[left_groups]
+    bounds = np.concatenate(([0], np.cumsum(counts)))
+    start = 0
+    while start < len(left_groups):
+        stop = max(start + 1, int(np.searchsorted(bounds, bounds[start] + _PAIR_CHUNK, side="right")) - 1)
+        chunk_counts = counts[start:stop]
+        left = np.repeat(np.arange(start, stop), chunk_counts)
+        right = expand_ranges(right_starts[left_groups[start:stop]], chunk_counts)
+        yield left, right, bounds[start:stop] - bounds[start]
+        start = stop
+
+
+def _rows_dot(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    import numpy as np
+
+    return np.einsum("ij,ij->i", a, b)
+
+
+def compute_geometry_diagnostics(model: openstudio.model.Model) -> dict[str, dict[str, bool]]:
+    """Compute the geometry diagnostics of all the planar surfaces of a model, with NumPy.
+
+    - `convex`: each turn of the polygon goes the same way around its (Newell) normal, collinear vertices allowed
+    - `spaceEnclosed`: once the vertices of the space are welded, and its edges split at the vertices lying on them,
+      every edge is shared by exactly two surfaces
+    - `spaceConvex`: all the vertices of the space are on the same side of the plane of each of its surfaces. Unlike
+      `openstudio.model.Space.isConvex`, which checks the floor print of the space, this does not depend on its floors.
+    - `correctlyOriented`: a ray cast from inside the surface along its normal crosses the other surfaces of the space
+      an even number of times, i.e. the normal points out of the space. Like in OpenStudio, this is only reliable for
+      enclosed spaces.
+
+    The space diagnostics are those of the space of base surfaces. The other surfaces only get `convex`, and True for
+    the others. Surfaces with fewer than 3 vertices are left out.
+
+    Requires NumPy, which is an optional dependency (`pip install effibemviewer[diagnostics]`).
+
+    Args:
+        model: OpenStudio model
+
+    Returns:
+        dict: The diagnostics (see `DIAGNOSTIC_KEYS`) of each surface, by handle
+
+    Raises:
+        ImportError: If NumPy is not installed
+    """
+    try:
+        import numpy  # noqa: F401
+    except ImportError as e:
+        raise ImportError("compute_geometry_diagnostics requires NumPy: pip install effibemviewer[diagnostics]") from e
+
+    handles, surface_spaces, counts, vertices = _read_vertices(model)
+    valid, values = _diagnose(surface_spaces, counts, vertices)
+    return {handles[i]: dict(zip(DIAGNOSTIC_KEYS, row)) for i, row in zip(valid.tolist(), values.tolist())}
+
+
+def _diagnose(surface_spaces: np.ndarray, counts: np.ndarray, vertices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Compute the diagnostics of surfaces given as flat arrays, see `compute_geometry_diagnostics`.
+
+    Args:
+        surface_spaces: The space index of each surface, -1 if it is not a base surface of a space
+        counts: The number of vertices of each surface
+        vertices: The vertices of all the surfaces, one after the other, as an (n, 3) array
+
+    Returns:
+        tuple: The indices of the surfaces with at least 3 vertices, and their diagnostics as an (n, 4) boolean array,
+        in the order of `DIAGNOSTIC_KEYS`
+    """
+    import numpy as np
+
+    valid = np.flatnonzero(counts >= 3)
+    starts = (np.cumsum(counts) - counts)[valid]
+    counts = counts[valid]
+    surface_spaces = surface_spaces[valid]
+    vertices = vertices[expand_ranges(starts, counts)]
+    n_surfaces = len(valid)
+    starts = np.cumsum(counts) - counts
+    owner = np.repeat(np.arange(n_surfaces), counts)
+    # Next and previous vertex of each vertex, around its surface
+    next_vertex = np.arange(len(vertices)) + 1
+    next_vertex[starts + counts - 1] = starts
+    previous_vertex = np.arange(len(vertices)) - 1
+    previous_vertex[starts] = starts + counts - 1
+
+    # Newell normals, relative to the first vertex of each surface for precision
+    local = vertices - vertices[starts][owner]
+    normals = np.add.reduceat(np.cross(local, local[next_vertex]), starts) if n_surfaces else np.zeros((0, 3))
+    lengths = np.linalg.norm(normals, axis=1)
+    normals /= np.where(lengths > 0, lengths, 1.0)[:, None]
+
+    # Convexity: distance of each vertex to the line of the previous edge, positive on the inner side
+    edges = vertices[next_vertex] - vertices
+    edge_lengths = np.linalg.norm(edges, axis=1)
+    turns = _rows_dot(np.cross(edges[previous_vertex], edges), normals[owner])
+    turns /= np.where(edge_lengths[previous_vertex] > 0, edge_lengths[previous_vertex], 1.0)
+    convex = np.logical_and.reduceat(turns >= -TOLERANCE, starts) if n_surfaces else np.ones(0, dtype=bool)
+
+    correctly_oriented = np.ones(n_surfaces, dtype=bool)
+    space_convex = np.ones(n_surfaces, dtype=bool)
+    space_enclosed = np.ones(n_surfaces, dtype=bool)
+    faces = np.flatnonzero(surface_spaces >= 0)
+    if len(faces):
+        # The base surfaces ("faces") grouped by space, and the vertices of each space welded within the tolerance.
+        # The welded vertices come out sorted by space.
+        faces = faces[np.argsort(surface_spaces[faces], kind="stable")]
+        face_spaces = surface_spaces[faces]
+        n_spaces = int(face_spaces[-1]) + 1
+        space_face_counts = np.bincount(face_spaces, minlength=n_spaces)
+        space_face_starts = np.cumsum(space_face_counts) - space_face_counts
+        rows = expand_ranges(starts[faces], counts[faces])
+        row_spaces = surface_spaces[owner[rows]]
+        keys = np.column_stack([row_spaces, np.round(vertices[rows] / TOLERANCE)])
+        unique_keys, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        points = vertices[rows[first]]
+        point_spaces = unique_keys[:, 0].astype(np.int64)
+        space_point_counts = np.bincount(point_spaces, minlength=n_spaces)
+        space_point_starts = np.cumsum(space_point_counts) - space_point_counts
+        welded = np.full(len(vertices), -1, dtype=np.int64)
+        welded[rows] = inverse.reshape(-1)
+
+        # Edges of the faces, split at the welded vertices lying on them
+        edge_a = welded[rows]
+        edge_b = welded[next_vertex[rows]]
+        keep = edge_a != edge_b
+        edge_a, edge_b, edge_spaces = edge_a[keep], edge_b[keep], row_spaces[keep]
+        split_edges, split_t, split_points = [], [], []
+        for left, right, _ in _pairs_within_groups(edge_spaces, space_point_starts, space_point_counts):
+            a, b = edge_a[left], edge_b[left]
+            direction = points[b] - points[a]
+            offset = points[right] - points[a]
+            t = _rows_dot(offset, direction) / _rows_dot(direction, direction)
+            distance = np.linalg.norm(offset - t[:, None] * direction, axis=1)
+            on_edge = (right != a) & (right != b) & (t > 0) & (t < 1) & (distance < TOLERANCE)
+            split_edges.append(left[on_edge])
+            split_t.append(t[on_edge])
+            split_points.append(right[on_edge])
+        n_edges = len(edge_a)
+        chain_edges = np.concatenate([np.arange(n_edges), np.arange(n_edges), *split_edges])
+        chain_t = np.concatenate([np.zeros(n_edges), np.ones(n_edges), *split_t])
+        chain_points = np.concatenate([edge_a, edge_b, *split_points])
+        order = np.lexsort((chain_t, chain_edges))
+        chain_edges, chain_points = chain_edges[order], chain_points[order]
+        segment = (chain_edges[1:] == chain_edges[:-1]) & (chain_points[1:] != chain_points[:-1])
+        segment_a, segment_b = chain_points[:-1][segment], chain_points[1:][segment]
+        segment_spaces = edge_spaces[chain_edges[:-1][segment]]
+
+        # Enclosed: every (undirected) segment is used exactly twice
+        segment_keys = np.minimum(segment_a, segment_b) * len(points) + np.maximum(segment_a, segment_b)
+        _, segment_inverse, segment_counts = np.unique(segment_keys, return_inverse=True, return_counts=True)
+        open_spaces = np.zeros(n_spaces, dtype=bool)
+        open_spaces[segment_spaces[segment_counts[segment_inverse.reshape(-1)] != 2]] = True
+        space_enclosed[faces] = ~open_spaces[face_spaces]
+
+        # Convex: the vertices of the space are all on one side of the plane of each face
+        face_normals = normals[faces]
+        face_origins = vertices[starts[faces]]
+        concave_spaces = np.zeros(n_spaces, dtype=bool)
+        for left, right, left_starts in _pairs_within_groups(face_spaces, space_point_starts, space_point_counts):
+            sides = _rows_dot(points[right] - face_origins[left], face_normals[left])
+            one_side = (np.maximum.reduceat(sides, left_starts) <= TOLERANCE) | (
+                np.minimum.reduceat(sides, left_starts) >= -TOLERANCE
+            )
+            concave_spaces[face_spaces[left[left_starts][~one_side]]] = True
+        space_convex[faces] = ~concave_spaces[face_spaces]
+
+        # Orientation: the ray starts next to the first vertex of each face in its plane projection (dropping the
+        # largest normal axis), which is a convex corner, towards the middle of its neighbors
+        axes = np.argmax(np.abs(face_normals), axis=1)
+        u_axes, v_axes = (axes + 1) % 3, (axes + 2) % 3
+        row_faces = np.repeat(np.arange(len(faces)), counts[faces])
+        row_u = vertices[rows, u_axes[row_faces]]
+        row_v = vertices[rows, v_axes[row_faces]]
+        corners = rows[np.lexsort((row_v, row_u, row_faces))[np.cumsum(counts[faces]) - counts[faces]]]
+        neighbors = (vertices[previous_vertex[corners]] + vertices[next_vertex[corners]]) / 2
+        origins = vertices[corners] + _INTERIOR_STEP * (neighbors - vertices[corners])
+        crossings = np.zeros(len(faces), dtype=np.int64)
+        for left, right, _ in _pairs_within_groups(face_spaces, space_face_starts, space_face_counts):
+            denominators = _rows_dot(face_normals[right], face_normals[left])
+            safe = np.where(np.abs(denominators) > 1e-9, denominators, 1.0)
+            t = _rows_dot(face_normals[right], face_origins[right] - origins[left]) / safe
+            hit = (left != right) & (np.abs(denominators) > 1e-9) & (t > TOLERANCE)
+            left, right = left[hit], right[hit]
+            if not len(left):
+                continue
+            targets = origins[left] + t[hit, None] * face_normals[left]
+            # Crossing number of the hit point in the target face, in its plane projection
+            target_counts = counts[faces[right]]
+            pair_rows = np.repeat(np.arange(len(left)), target_counts)
+            polygon_rows = expand_ranges(starts[faces[right]], target_counts)
+            u_axis, v_axis = u_axes[right][pair_rows], v_axes[right][pair_rows]
+            u0, v0 = vertices[polygon_rows, u_axis], vertices[polygon_rows, v_axis]
+            u1, v1 = vertices[next_vertex[polygon_rows], u_axis], vertices[next_vertex[polygon_rows], v_axis]
+            u, v = targets[pair_rows, u_axis], targets[pair_rows, v_axis]
+            straddles = (v0 > v) != (v1 > v)
+            u_cross = u0 + (v - v0) * (u1 - u0) / np.where(straddles, v1 - v0, 1.0)
+            crossed = straddles & (u < u_cross)
+            pair_starts = np.cumsum(target_counts) - target_counts
+            inside = np.add.reduceat(crossed.astype(np.int64), pair_starts) % 2 == 1
+            crossings += np.bincount(left[inside], minlength=len(faces))
+        correctly_oriented[faces] = crossings % 2 == 0
+
+    return valid, np.column_stack([convex, correctly_oriented, space_convex, space_enclosed])
+
+
+def add_geometry_diagnostics(gltf_data: dict, diagnostics: dict[str, dict[str, bool]]) -> dict:
+    """Add geometry diagnostics to the extras of the surface nodes of GLTF JSON data, where the viewer reads them.
+
+    Args:
+        gltf_data: GLTF JSON data, as returned by `model_to_gltf_json`. It is not modified.
+        diagnostics: The diagnostics of each surface by handle, as returned by `compute_geometry_diagnostics`
+
+    Returns:
+        dict: The GLTF JSON data with the diagnostics of its surfaces
+    """
+    nodes = [
+        (
+            {**node, "extras": {**node["extras"], **diagnostics[handle]}}
+            if (handle := node.get("extras", {}).get("handle")) in diagnostics
+            else node
+        )
+        for node in gltf_data.get("nodes", [])
+    ]
+    return {**gltf_data, "nodes": nodes}
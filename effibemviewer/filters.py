@@ -0,0 +1,188 @@
+"""Selection of a part of a model (stories, spaces, thermal zones, surface types), to convert instead of the whole."""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import openstudio
+
+# The `surfaceType` of the surfaces in the GLTF extras
+SURFACE_TYPES = (
+    "Floor",
+    "Wall",
+    "RoofCeiling",
+    "FixedWindow",
+    "OperableWindow",
+    "Door",
+    "GlassDoor",
+    "OverheadDoor",
+    "Skylight",
+    "TubularDaylightDome",
+    "TubularDaylightDiffuser",
+    "SiteShading",
+    "BuildingShading",
+    "SpaceShading",
+    "InteriorPartitionSurface",
+)
+
+
+def _name_set(names: Iterable[str] | None) -> frozenset[str] | None:
+    if names is None:
+        return None
+    if isinstance(names, str):
+        return frozenset([names])
+    return frozenset(names)
+
+
+class ModelFilter:
+    """Select the surfaces of a model to convert, by building story, space, thermal zone and surface type.
+
+    A surface is kept if it matches every criterion that is given, and any of the names of each criterion. Surfaces
+    without a space (site and building shading) never match the story, space or thermal zone criteria.
+
+    Pass it as the `model_filter` argument of the conversion functions (`model_to_gltf_json`, `osm_to_gltf_json`,
+    `model_to_gltf_html`...). The filtered out surfaces are removed from (a copy of) the model before the GLTF
+    translation, so the translation time and the output size scale with the selection rather than the whole model. A
+    sub surface (e.g. a window) whose base surface is only filtered out by its type is still converted: the base surface
+    is translated with it, then dropped from the output.
+
+    Args:
+        stories: Names of the building stories to keep
+        spaces: Names of the spaces to keep
+        thermal_zones: Names of the thermal zones to keep
+        surface_types: Surface types to keep, as in the `surfaceType` of the GLTF extras, see `SURFACE_TYPES`
+        include_shading: If False, drop all the shading surfaces
+
+    Raises:
+        ValueError: If a surface type is unknown
+    """
+
+    def __init__(
+        self,
+        stories: Iterable[str] | None = None,
+        spaces: Iterable[str] | None = None,
+        thermal_zones: Iterable[str] | None = None,
+        surface_types: Iterable[str] | None = None,
+        include_shading: bool = True,
+    ):
+        """Initialize the filter. Criteria left to None match every surface."""
+        self.stories = _name_set(stories)
+        self.spaces = _name_set(spaces)
+        self.thermal_zones = _name_set(thermal_zones)
+        self.surface_types = _name_set(surface_types)
+        self.include_shading = include_shading
+        unknown = sorted((self.surface_types or frozenset()) - set(SURFACE_TYPES))
+        if unknown:
+            raise ValueError(f"Unknown surface types {unknown}, expected some of {list(SURFACE_TYPES)}")
+
+    def __repr__(self):
+        """Return a string representation of the filter."""
+        return f"ModelFilter({self.cache_key()})"
+
+    def cache_key(self) -> str:
+        """Get a canonical string of the filter criteria, to key cached conversion results."""
+        return json.dumps(
+            {
+                "stories": sorted(self.stories) if self.stories is not None else None,
+                "spaces": sorted(self.spaces) if self.spaces is not None else None,
+                "thermal_zones": sorted(self.thermal_zones) if self.thermal_zones is not None else None,
+                "surface_types": sorted(self.surface_types) if self.surface_types is not None else None,
+                "include_shading": self.include_shading,
+            },
+            sort_keys=True,
+        )
+
+    def _keeps_space(self, space: openstudio.model.Space) -> bool:
+        if self.spaces is not None and space.nameString() not in self.spaces:
+            return False
+        if self.stories is not None:
+            story = space.buildingStory()
+            if not story.is_initialized() or story.get().nameString() not in self.stories:
+                return False
+        if self.thermal_zones is not None:
+            zone = space.thermalZone()
+            if not zone.is_initialized() or zone.get().nameString() not in self.thermal_zones:
+                return False
+        return True
+
+    def _keeps_type(self, surface_type: str) -> bool:
+        return self.surface_types is None or surface_type in self.surface_types
+
+    def apply(self, model: openstudio.model.Model) -> set[str]:
+        """Remove the surfaces that are filtered out from the model, in place.
+
+        Args:
+            model: The OpenStudio model to filter. It is modified: pass a clone to keep the original.
+
+        Returns:
+            set[str]: The handles (as in the GLTF extras) of the base surfaces that were only kept for their sub
+                surfaces, to drop from the translated GLTF with `drop_surfaces`
+        """
+        spatial = self.stories is not None or self.spaces is not None or self.thermal_zones is not None
+        kept_spaces = {str(space.handle()) for space in model.getSpaces() if not spatial or self._keeps_space(space)}
+
+        def keeps_space_of(surface) -> bool:
+            if not spatial:
+                return True
+            space = surface.space()
+            return space.is_initialized() and str(space.get().handle()) in kept_spaces
+
+        remove = []
+        hosts = set()
+        for surface in model.getSurfaces():
+            sub_surfaces = surface.subSurfaces()
+            if not keeps_space_of(surface):
+                remove.append(surface.handle())
+                remove.extend(sub_surface.handle() for sub_surface in sub_surfaces)
+                continue
+            kept_sub_surfaces = 0
+            for sub_surface in sub_surfaces:
+                if self._keeps_type(sub_surface.subSurfaceType()):
+                    kept_sub_surfaces += 1
+                else:
+                    remove.append(sub_surface.handle())
+            if not self._keeps_type(surface.surfaceType()):
+                if kept_sub_surfaces:
+                    hosts.add(str(surface.handle()).strip("{}"))
+                else:
+                    remove.append(surface.handle())
+
+        for shading_surface in model.getShadingSurfaces():
+            group = shading_surface.shadingSurfaceGroup()
+            shading_type = f"{group.get().shadingSurfaceType()}Shading" if group.is_initialized() else ""
+            if not (self.include_shading and self._keeps_type(shading_type) and keeps_space_of(shading_surface)):
+                remove.append(shading_surface.handle())
+
+        for partition in model.getInteriorPartitionSurfaces():
+            if not (self._keeps_type("InteriorPartitionSurface") and keeps_space_of(partition)):
+                remove.append(partition.handle())
+
+        # A single bulk removal is much faster than removing the objects one by one
+        if remove:
+            model.removeObjects(remove)
+        return hosts
+
+
+def drop_surfaces(gltf_data: dict, handles: set[str]) -> dict:
+    """Remove the surface nodes with the given handles from GLTF JSON data, with the meshes and data they use.
+
+    Args:
+        gltf_data: GLTF JSON data, as returned by `model_to_gltf_json`. It is not modified.
+        handles: The handles of the surfaces to remove, as in the GLTF extras
+
+    Returns:
+        dict: The GLTF JSON data without these surfaces
+    """
+    from effibemviewer.gltf_buffers import decode_buffers, extract_nodes
+
+    nodes = gltf_data.get("nodes", [])
+    keep = {i for i, node in enumerate(nodes) if "mesh" in node and node.get("extras", {}).get("handle") not in handles}
+    data = extract_nodes(gltf_data, decode_buffers(gltf_data), keep)
+    # The chunks leave the model object metadata out, but it still describes the filtered model
+    scene_extras = gltf_data["scenes"][gltf_data.get("scene", 0)].get("extras", {})
+    if "modelObjectMetaData" in scene_extras:
+        data["scenes"][0]["extras"]["modelObjectMetaData"] = scene_extras["modelObjectMetaData"]
+    return data
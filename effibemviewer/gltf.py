@@ -1,47 +1,599 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
-
-import openstudio
-from jinja2 import Environment, PackageLoader
+import base64
+import gzip
+import json
+import struct
+from collections.abc import Iterator
+from functools import lru_cache
+from pathlib import Path
+from typing import IO, TYPE_CHECKING
 
 from effibemviewer import __version__
+from effibemviewer.timings import timed
 
+# openstudio and jinja2 are imported lazily, on first real use: loader / JS / CSS generation does not need
+# openstudio at all, and importing it is slow
 if TYPE_CHECKING:
+    import openstudio
     from IPython.display import HTML, IFrame
+    from jinja2 import Environment
 
-env = Environment(
-    loader=PackageLoader("effibemviewer", "templates"),
-    keep_trailing_newline=True,
-    trim_blocks=True,
-    lstrip_blocks=True,
-)
-env.globals["version"] = __version__
+    from effibemviewer.cache import GltfCache
+    from effibemviewer.filters import ModelFilter
+    from effibemviewer.timings import Timings
 
 CDN_BASE_URL = f"https://cdn.jsdelivr.net/gh/jmarrec/effibemviewer@v{__version__}/public/cdn"
 
+# GLB container constants, see https://registry.khronos.org/glTF/specs/2.0/glTF-2.0.html#binary-gltf-layout
+GLB_MAGIC = 0x46546C67  # "glTF"
+GLB_VERSION = 2
+GLB_CHUNK_JSON = 0x4E4F534A  # "JSON"
+GLB_CHUNK_BIN = 0x004E4942  # "BIN\0"
+
+# Target size of the chunks yielded when streaming the GLTF JSON into the HTML page
+JSON_CHUNK_SIZE = 1 << 16
+
+# Geometry optimization, see `optimize_gltf_json`
+QUANTIZATION_EXTENSION = "KHR_mesh_quantization"
+# Largest difference between the normals of a surface for it to be considered planar
+PLANAR_NORMAL_TOLERANCE = 1e-6
+_INT16_MAX = 32767
+_GLTF_ARRAY_BUFFER = 34962
+_GLTF_ELEMENT_ARRAY_BUFFER = 34963
+# Little-endian NumPy dtypes of the GLTF component types that the translator writes
+_NUMPY_COMPONENT_TYPES = {5121: "<u1", 5123: "<u2", 5125: "<u4", 5126: "<f4"}
+
+
+@lru_cache(maxsize=1)
+def get_env() -> Environment:
+    """Get the Jinja2 environment used to render the templates, created on first use and shared afterwards."""
+    from jinja2 import Environment, PackageLoader
+
+    env = Environment(
+        loader=PackageLoader("effibemviewer", "templates"),
+        keep_trailing_newline=True,
+        trim_blocks=True,
+        lstrip_blocks=True,
+    )
+    env.globals["version"] = __version__
+    return env
+
 
-def model_to_gltf_json(model: openstudio.model.Model, include_geometry_diagnostics: bool = False) -> dict:
+def warm_up_env() -> Environment:
+    """Create the shared Jinja2 environment and compile all its templates now, rather than on the first conversion.
+
+    Call it once at the startup of a long-running process (e.g. a web service), so that the first requests do not pay
+    for compiling the templates, and concurrent ones do not compile them several times.
+    """
+    env = get_env()
+    for name in env.list_templates():
+        env.get_template(name)
+    return env
+
+
+def model_to_gltf_json(
+    model: openstudio.model.Model,
+    include_geometry_diagnostics: bool = False,
+    cache: GltfCache | None = None,
+    timings: Timings | None = None,
+    model_filter: ModelFilter | None = None,
+) -> dict:
     """Convert an OpenStudio model to GLTF JSON format (dict).
 
     Args:
         model: OpenStudio model to convert
         include_geometry_diagnostics: If True, include geometry diagnostic info in the output
+        cache: Optional cache of conversion results. The model is keyed by its serialized content, so prefer
+            `osm_to_gltf_json` when the model comes from a file, which skips loading it entirely on a cache hit.
+        timings: Optional `Timings`, to record the time of each conversion stage and the size of the output
+        model_filter: Optional `ModelFilter`, to convert only a part of the model. It is applied to a copy of the model.
+
+    Returns:
+        dict: GLTF JSON data representing the model
+
+    Raises:
+        ValueError: If geometry diagnostics are requested, but neither supported by the OpenStudio version nor
+            computable without NumPy
+    """
+    key = None
+    data = None
+    if cache is not None:
+        with timed(timings, "cache_key"):
+            key = cache.make_key(str(model).encode(), include_geometry_diagnostics, model_filter)
+        with timed(timings, "cache_lookup"):
+            data = cache.get(key)
+
+    if data is None:
+        data = _translate_model(model, include_geometry_diagnostics, timings, model_filter)
+        if cache is not None and key is not None:
+            with timed(timings, "cache_store"):
+                cache.put(key, data)
+                # The translator assigns rendering colors to objects that have none, which modifies the model: store
+                # the result under the updated content too, so the next call with the same model is a hit
+                new_key = cache.make_key(str(model).encode(), include_geometry_diagnostics, model_filter)
+                if new_key != key:
+                    cache.put(new_key, data)
+
+    if timings is not None:
+        timings.count_gltf(data)
+    return data
+
+
+def osm_to_gltf_json(
+    osm_path: str | Path,
+    include_geometry_diagnostics: bool = False,
+    cache: GltfCache | None = None,
+    timings: Timings | None = None,
+    model_filter: ModelFilter | None = None,
+) -> dict:
+    """Load an OpenStudio model file and convert it to GLTF JSON format (dict).
+
+    Args:
+        osm_path: Path to the OpenStudio model file
+        include_geometry_diagnostics: If True, include geometry diagnostic info in the output
+        cache: Optional cache of conversion results, keyed by the content of the file. On a cache hit, the model is
+            not loaded at all.
+        timings: Optional `Timings`, to record the time of each conversion stage and the size of the output
+        model_filter: Optional `ModelFilter`, to convert only a part of the model
 
     Returns:
         dict: GLTF JSON data representing the model
 
     Raises:
-        ValueError: If geometry diagnostics are requested but not supported by the OpenStudio version
+        ValueError: If the model file cannot be loaded, or if geometry diagnostics are requested but cannot be
+            included (see `model_to_gltf_json`)
     """
+    import openstudio
+
+    osm_path = Path(osm_path)
+    key = None
+    data = None
+    if cache is not None:
+        with timed(timings, "read_file"):
+            content = osm_path.read_bytes()
+        with timed(timings, "cache_key"):
+            key = cache.make_key(content, include_geometry_diagnostics, model_filter)
+        with timed(timings, "cache_lookup"):
+            data = cache.get(key)
+
+    if data is None:
+        with timed(timings, "load"):
+            optional_model = openstudio.model.Model.load(osm_path)
+        if not optional_model.is_initialized():
+            raise ValueError(f"Failed to load model '{osm_path}'")
+        # The model was just loaded: filter it in place rather than a copy
+        data = _translate_model(optional_model.get(), include_geometry_diagnostics, timings, model_filter, clone=False)
+        if cache is not None and key is not None:
+            with timed(timings, "cache_store"):
+                cache.put(key, data)
+
+    if timings is not None:
+        timings.sizes["osm"] = osm_path.stat().st_size
+        timings.count_gltf(data)
+    return data
+
+
+def _translate_model(
+    model: openstudio.model.Model,
+    include_geometry_diagnostics: bool = False,
+    timings: Timings | None = None,
+    model_filter: ModelFilter | None = None,
+    clone: bool = True,
+) -> dict:
+    """Run the OpenStudio GLTF forward translator on the model.
+
+    The translator serializes its output to a JSON string, which is decoded with `json.loads`: this is as fast as
+    `modelToGLTFJSON` (which converts it to a dict through SWIG), and lets `timings` tell both stages apart.
+
+    With a `model_filter`, the filtered out surfaces are removed before the translation, from a copy of the model unless
+    `clone` is False.
+
+    When the translator cannot include the geometry diagnostics, they are computed with `compute_geometry_diagnostics`
+    (before the filter, so that the spaces of the selection are not reported open) and added to the output.
+    """
+    import openstudio
+
+    diagnostics = None
     ft = openstudio.gltf.GltfForwardTranslator()
     if include_geometry_diagnostics:
-        if not callable(getattr(openstudio.gltf.GltfForwardTranslator, "setIncludeGeometryDiagnostics", None)):
-            raise ValueError(
-                "Geometry diagnostics not supported in this version of OpenStudio. Please update to use this feature."
+        if callable(getattr(openstudio.gltf.GltfForwardTranslator, "setIncludeGeometryDiagnostics", None)):
+            ft.setIncludeGeometryDiagnostics(True)
+        else:
+            from effibemviewer.diagnostics import compute_geometry_diagnostics
+
+            with timed(timings, "diagnostics"):
+                try:
+                    diagnostics = compute_geometry_diagnostics(model)
+                except ImportError as e:
+                    raise ValueError(
+                        "Geometry diagnostics are not supported by this version of OpenStudio, and computing them"
+                        " requires NumPy: pip install effibemviewer[diagnostics]"
+                    ) from e
+
+    hosts: set[str] = set()
+    if model_filter is not None:
+        with timed(timings, "filter"):
+            if clone:
+                model = model.clone(True).to_Model()
+            hosts = model_filter.apply(model)
+
+    with timed(timings, "translate"):
+        gltf_json = ft.modelToGLTFString(model)
+    if timings is not None:
+        timings.sizes["gltf_json"] = len(gltf_json.encode())
+    with timed(timings, "json_decode"):
+        data = json.loads(gltf_json)
+    if diagnostics is not None:
+        from effibemviewer.diagnostics import add_geometry_diagnostics
+
+        with timed(timings, "diagnostics"):
+            data = add_geometry_diagnostics(data, diagnostics)
+    if hosts:
+        from effibemviewer.filters import drop_surfaces
+
+        with timed(timings, "filter"):
+            data = drop_surfaces(data, hosts)
+    return data
+
+
+def _pad4(data: bytes, pad_byte: bytes = b"\x00") -> bytes:
+    """Pad data to a multiple of 4 bytes, as required for GLB chunks."""
+    return data + pad_byte * (-len(data) % 4)
+
+
+def gltf_json_to_glb(gltf_data: dict) -> bytes:
+    """Pack GLTF JSON data (with base64 data URI buffers) into a binary GLB container.
+
+    All buffers are decoded once and concatenated into the single BIN chunk, so the vertex and index data are stored
+    as raw little-endian bytes instead of base64 text. The input dict is not modified.
+
+    Args:
+        gltf_data: GLTF JSON data, as returned by `model_to_gltf_json`
+
+    Returns:
+        bytes: The GLB binary content
+
+    Raises:
+        ValueError: If a buffer is not an embedded base64 data URI
+    """
+    data = dict(gltf_data)
+    buffer_offsets = []
+    bin_chunk = bytearray()
+    for i, buffer in enumerate(data.get("buffers", [])):
+        uri = buffer.get("uri", "")
+        if not uri.startswith("data:") or ";base64," not in uri:
+            raise ValueError(f"Buffer {i} is not an embedded base64 data URI, cannot pack it into a GLB")
+        buffer_offsets.append(len(bin_chunk))
+        bin_chunk += _pad4(base64.b64decode(uri.split(",", 1)[1]))
+
+    data["bufferViews"] = [
+        {**view, "buffer": 0, "byteOffset": view.get("byteOffset", 0) + buffer_offsets[view["buffer"]]}
+        for view in data.get("bufferViews", [])
+    ]
+    if buffer_offsets:
+        data["buffers"] = [{"byteLength": len(bin_chunk)}]
+
+    json_chunk = _pad4(json.dumps(data, separators=(",", ":")).encode(), b" ")
+    chunks = struct.pack("<II", len(json_chunk), GLB_CHUNK_JSON) + json_chunk
+    if bin_chunk:
+        chunks += struct.pack("<II", len(bin_chunk), GLB_CHUNK_BIN) + bytes(bin_chunk)
+
+    return struct.pack("<III", GLB_MAGIC, GLB_VERSION, 12 + len(chunks)) + chunks
+
+
+def model_to_glb(
+    model: openstudio.model.Model,
+    include_geometry_diagnostics: bool = False,
+    cache: GltfCache | None = None,
+    timings: Timings | None = None,
+    model_filter: ModelFilter | None = None,
+) -> bytes:
+    """Convert an OpenStudio model to binary GLB format.
+
+    GLB avoids the base64-in-JSON encoding of `model_to_gltf_json`, and can be handed directly to the viewer's
+    `loadFromArrayBuffer` / `loadFromFile` without any text decoding.
+
+    Args:
+        model: OpenStudio model to convert
+        include_geometry_diagnostics: If True, include geometry diagnostic info in the output
+        cache: Optional cache of conversion results, see `model_to_gltf_json`
+        timings: Optional `Timings`, to record the time of each conversion stage, including the GLB packing
+        model_filter: Optional `ModelFilter`, to convert only a part of the model
+
+    Returns:
+        bytes: GLB binary data representing the model
+    """
+    gltf_data = model_to_gltf_json(
+        model=model,
+        include_geometry_diagnostics=include_geometry_diagnostics,
+        cache=cache,
+        timings=timings,
+        model_filter=model_filter,
+    )
+    with timed(timings, "glb_pack"):
+        return gltf_json_to_glb(gltf_data)
+
+
+def compress_gltf_json(gltf_data: dict, binary: bool = True) -> bytes:
+    """Compress GLTF JSON data with gzip, for the compressed HTML payload or `.glb.gz` / `.gltf.gz` files.
+
+    The viewer decompresses gzip data with the browser's native `DecompressionStream`, whichever way it is loaded.
+    Compression typically shrinks the model data ten-fold or more, as its JSON and vertex data are very repetitive.
+
+    Args:
+        gltf_data: GLTF JSON data, as returned by `model_to_gltf_json`
+        binary: If True, compress the binary GLB (see `gltf_json_to_glb`), else the compact GLTF JSON text
+
+    Returns:
+        bytes: The gzip-compressed data
+    """
+    data = gltf_json_to_glb(gltf_data) if binary else json.dumps(gltf_data, separators=(",", ":")).encode()
+    # mtime=0: the same model always gives the same bytes
+    return gzip.compress(data, mtime=0)
+
+
+def optimize_gltf_json(gltf_data: dict, drop_planar_normals: bool = True, quantize: bool = False) -> dict:
+    """Shrink the geometry of GLTF JSON data: weld duplicate vertices, drop planar normals, optionally quantize.
+
+    The OpenStudio translator writes float32 positions and normals for every vertex of every surface. This pass
+    rewrites the buffers with NumPy, vectorized over all the surfaces at once:
+
+    - The vertices of a surface with the same position (and normal) are welded into one
+    - The normals of planar surfaces, which are all the same, are dropped: the viewer computes them from the triangles
+    - With `quantize`, positions are stored as normalized int16 relative to the bounding box of their mesh
+      (`KHR_mesh_quantization`), and dequantized by the transform of the surface nodes. This halves their size, with
+      a precision of 1/65534 of the largest side of each surface.
+    - The indices use the smallest integer type that fits every surface
+
+    Requires NumPy, which is an optional dependency (`pip install effibemviewer[optimize]`).
+
+    Args:
+        gltf_data: GLTF JSON data, as returned by `model_to_gltf_json`. It is not modified.
+        drop_planar_normals: If True, drop the normals of planar surfaces
+        quantize: If True, quantize the positions to int16
+
+    Returns:
+        dict: The optimized GLTF JSON data, with a single embedded buffer
+
+    Raises:
+        ValueError: If a buffer is not an embedded base64 data URI, or if the meshes are not made of indexed
+            triangles with float32 positions and normals, as written by the translator
+        ImportError: If NumPy is not installed
+    """
+    try:
+        import numpy as np
+    except ImportError as e:
+        raise ImportError("optimize_gltf_json requires NumPy: pip install effibemviewer[optimize]") from e
+    from effibemviewer.arrays import expand_ranges
+    from effibemviewer.gltf_buffers import IDENTITY, decode_buffers, mat_mul
+
+    accessors = gltf_data.get("accessors", [])
+    views = gltf_data.get("bufferViews", [])
+    meshes = gltf_data.get("meshes", [])
+    primitives = [(m, primitive) for m, mesh in enumerate(meshes) for primitive in mesh.get("primitives", [])]
+    if not primitives:
+        return gltf_data
+    for m, primitive in primitives:
+        attributes = primitive.get("attributes", {})
+        if primitive.get("mode", 4) != 4 or "indices" not in primitive or "POSITION" not in attributes:
+            raise ValueError(f"Mesh {m} is not made of indexed triangles, cannot optimize it")
+        if set(attributes) - {"POSITION", "NORMAL"}:
+            raise ValueError(f"Mesh {m} has attributes other than POSITION and NORMAL, cannot optimize it")
+    buffers = [np.frombuffer(buffer, dtype=np.uint8) for buffer in decode_buffers(gltf_data)]
+
+    def gather(accessor_indices: list[int], components: int):
+        """Read the elements of the given accessors, concatenated, as float64 rows."""
+        counts = np.array([accessors[i]["count"] for i in accessor_indices], dtype=np.int64)
+        row_starts = np.cumsum(counts) - counts
+        out = np.empty((int(counts.sum()), components))
+        groups: dict[tuple[int, int], list[int]] = {}
+        for n, i in enumerate(accessor_indices):
+            accessor = accessors[i]
+            if "bufferView" not in accessor or "sparse" in accessor or accessor.get("normalized"):
+                raise ValueError(f"Accessor {i} is sparse or normalized, cannot optimize it")
+            if accessor["componentType"] not in _NUMPY_COMPONENT_TYPES:
+                raise ValueError(f"Accessor {i} has an unsupported component type {accessor['componentType']}")
+            groups.setdefault((views[accessor["bufferView"]]["buffer"], accessor["componentType"]), []).append(n)
+        # One vectorized read of the bytes of all the accessors with the same buffer and component type
+        for (buffer_index, component_type), members in groups.items():
+            dtype = np.dtype(_NUMPY_COMPONENT_TYPES[component_type])
+            element_size = dtype.itemsize * components
+            member_accessors = [accessors[accessor_indices[n]] for n in members]
+            member_views = [views[accessor["bufferView"]] for accessor in member_accessors]
+            starts = np.array(
+                [view.get("byteOffset", 0) + a.get("byteOffset", 0) for a, view in zip(member_accessors, member_views)]
             )
-        ft.setIncludeGeometryDiagnostics(True)
-    return ft.modelToGLTFJSON(model)
+            strides = np.array([view.get("byteStride", element_size) for view in member_views])
+            member_counts = counts[members]
+            element = expand_ranges(np.zeros_like(member_counts), member_counts)
+            byte_offsets = np.repeat(starts, member_counts) + element * np.repeat(strides, member_counts)
+            raw = buffers[buffer_index][byte_offsets[:, None] + np.arange(element_size)]
+            out[np.repeat(row_starts[members], member_counts) + element] = raw.view(dtype)
+        return out, counts
+
+    n_primitives = len(primitives)
+    primitive_mesh = np.array([m for m, _ in primitives])
+    positions, vertex_counts = gather([primitive["attributes"]["POSITION"] for _, primitive in primitives], 3)
+    vertex_starts = np.cumsum(vertex_counts) - vertex_counts
+    indices, index_counts = gather([primitive["indices"] for _, primitive in primitives], 1)
+    indices = indices[:, 0].astype(np.int64)
+    if np.any(indices >= np.repeat(vertex_counts, index_counts)):
+        raise ValueError("Some indices are out of the range of their vertices, cannot optimize them")
+
+    # Normals, and whether each primitive keeps them: only when they differ across the primitive
+    has_normals = np.array(["NORMAL" in primitive["attributes"] for _, primitive in primitives])
+    normals = np.zeros_like(positions)
+    if has_normals.any():
+        normal_rows = expand_ranges(vertex_starts[has_normals], vertex_counts[has_normals])
+        normals[normal_rows] = gather(
+            [primitive["attributes"]["NORMAL"] for _, primitive in primitives if "NORMAL" in primitive["attributes"]],
+            3,
+        )[0]
+    keep_normals = has_normals.copy()
+    nonempty = vertex_counts > 0
+    if drop_planar_normals and nonempty.any():
+        spread = np.zeros(n_primitives)
+        spread[nonempty] = (
+            np.maximum.reduceat(normals, vertex_starts[nonempty])
+            - np.minimum.reduceat(normals, vertex_starts[nonempty])
+        ).max(axis=1)
+        keep_normals &= spread > PLANAR_NORMAL_TOLERANCE
+
+    # Weld: identical (primitive, position, kept normal) rows. The unique rows come out sorted by primitive.
+    vertex_primitive = np.repeat(np.arange(n_primitives), vertex_counts)
+    keys = np.column_stack([vertex_primitive, positions, normals * keep_normals[vertex_primitive, None]])
+    unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    new_primitive = unique_keys[:, 0].astype(np.int64)
+    new_counts = np.bincount(new_primitive, minlength=n_primitives)
+    new_starts = np.cumsum(new_counts) - new_counts
+    new_positions = unique_keys[:, 1:4]
+    new_normals = unique_keys[:, 4:7]
+    global_indices = inverse[indices + np.repeat(vertex_starts, index_counts)]
+    new_indices = global_indices - np.repeat(new_starts, index_counts)
+
+    # Quantize the positions relative to the (cubic) bounding box of each mesh
+    if quantize:
+        vertex_mesh = primitive_mesh[new_primitive]
+        lo = np.full((len(meshes), 3), np.inf)
+        hi = np.full((len(meshes), 3), -np.inf)
+        np.minimum.at(lo, vertex_mesh, new_positions)
+        np.maximum.at(hi, vertex_mesh, new_positions)
+        empty = ~np.isfinite(lo[:, 0])
+        lo[empty] = hi[empty] = 0.0
+        centers = (lo + hi) / 2
+        half_sizes = (hi - lo).max(axis=1) / 2
+        half_sizes[half_sizes == 0] = 1.0
+        quantized = np.rint((new_positions - centers[vertex_mesh]) / half_sizes[vertex_mesh, None] * _INT16_MAX)
+        new_positions = np.clip(quantized, -_INT16_MAX, _INT16_MAX)
+
+    # Pack the binary buffer: indices, positions, then the kept normals, each 4-byte aligned
+    index_dtype = np.dtype("<u1" if new_counts.max() <= 0x100 else "<u2" if new_counts.max() <= 0x10000 else "<u4")
+    index_component_type = {1: 5121, 2: 5123, 4: 5125}[index_dtype.itemsize]
+    if quantize:
+        # int16 VEC3, padded to 8 bytes: vertex attributes must be 4-byte aligned
+        position_data = np.zeros((len(new_positions), 4), dtype="<i2")
+        position_data[:, :3] = new_positions
+        position_component_type, position_stride = 5122, 8
+    else:
+        position_data = new_positions.astype("<f4")
+        position_component_type, position_stride = 5126, 12
+    normal_data = new_normals[keep_normals[new_primitive]].astype("<f4")
+    normal_counts = new_counts * keep_normals
+    normal_starts = np.cumsum(normal_counts) - normal_counts
+
+    binary = bytearray()
+    new_views: list[dict] = []
+    view_indices: dict[str, int] = {}
+    for name, data, stride, target in (
+        ("indices", new_indices.astype(index_dtype), None, _GLTF_ELEMENT_ARRAY_BUFFER),
+        ("positions", position_data, position_stride, _GLTF_ARRAY_BUFFER),
+        ("normals", normal_data, 12, _GLTF_ARRAY_BUFFER),
+    ):
+        if data.nbytes == 0:
+            continue
+        view_indices[name] = len(new_views)
+        view = {"buffer": 0, "byteLength": data.nbytes, "byteOffset": len(binary), "target": target}
+        if stride is not None:
+            view["byteStride"] = stride
+        new_views.append(view)
+        binary += data.tobytes()
+        binary += b"\x00" * (-len(binary) % 4)
+
+    # Accessor bounds, per primitive
+    position_min = np.zeros((n_primitives, 3))
+    position_max = np.zeros((n_primitives, 3))
+    index_min = np.zeros(n_primitives, dtype=np.int64)
+    index_max = np.zeros(n_primitives, dtype=np.int64)
+    if new_counts.any():
+        position_min[new_counts > 0] = np.minimum.reduceat(new_positions, new_starts[new_counts > 0])
+        position_max[new_counts > 0] = np.maximum.reduceat(new_positions, new_starts[new_counts > 0])
+    if index_counts.any():
+        index_starts = np.cumsum(index_counts) - index_counts
+        index_min[index_counts > 0] = np.minimum.reduceat(new_indices, index_starts[index_counts > 0])
+        index_max[index_counts > 0] = np.maximum.reduceat(new_indices, index_starts[index_counts > 0])
+    position_bounds: tuple[list, list]
+    if quantize:
+        position_bounds = (position_min.astype(int).tolist(), position_max.astype(int).tolist())
+    else:
+        # Shortest representation of the float32 values
+        position_bounds = (
+            [[float(str(value)) for value in row] for row in position_min.astype("<f4")],
+            [[float(str(value)) for value in row] for row in position_max.astype("<f4")],
+        )
+
+    new_accessors: list[dict] = []
+    new_meshes = [{**mesh, "primitives": []} for mesh in meshes]
+    index_offset = 0
+    for p, (m, primitive) in enumerate(primitives):
+        attributes = {"POSITION": len(new_accessors)}
+        position_accessor = {
+            "bufferView": view_indices["positions"],
+            "byteOffset": int(new_starts[p]) * position_stride,
+            "componentType": position_component_type,
+            "count": int(new_counts[p]),
+            "type": "VEC3",
+            "min": position_bounds[0][p],
+            "max": position_bounds[1][p],
+        }
+        if quantize:
+            position_accessor["normalized"] = True
+        new_accessors.append(position_accessor)
+        if keep_normals[p]:
+            attributes["NORMAL"] = len(new_accessors)
+            new_accessors.append(
+                {
+                    "bufferView": view_indices["normals"],
+                    "byteOffset": int(normal_starts[p]) * 12,
+                    "componentType": 5126,
+                    "count": int(new_counts[p]),
+                    "type": "VEC3",
+                }
+            )
+        new_accessors.append(
+            {
+                "bufferView": view_indices["indices"],
+                "byteOffset": index_offset * index_dtype.itemsize,
+                "componentType": index_component_type,
+                "count": int(index_counts[p]),
+                "type": "SCALAR",
+                "min": [int(index_min[p])],
+                "max": [int(index_max[p])],
+            }
+        )
+        index_offset += int(index_counts[p])
+        new_meshes[m]["primitives"].append({**primitive, "attributes": attributes, "indices": len(new_accessors) - 1})
+
+    optimized = {
+        **gltf_data,
+        "meshes": new_meshes,
+        "accessors": new_accessors,
+        "bufferViews": new_views,
+        "buffers": [
+            {
+                "byteLength": len(binary),
+                "uri": "data:application/octet-stream;base64," + base64.b64encode(bytes(binary)).decode(),
+            }
+        ],
+    }
+    if quantize:
+        # Dequantize in the node transforms: world = matrix x translate(center) x scale(half size)
+        nodes = []
+        for i, node in enumerate(gltf_data.get("nodes", [])):
+            if "mesh" in node:
+                if any(key in node for key in ("translation", "rotation", "scale")):
+                    raise ValueError(f"Node {i} has a TRS transform, cannot quantize its mesh")
+                m = node["mesh"]
+                h = float(half_sizes[m])
+                cx, cy, cz = (float(c) for c in centers[m])
+                dequantize = [h, 0.0, 0.0, 0.0, 0.0, h, 0.0, 0.0, 0.0, 0.0, h, 0.0, cx, cy, cz, 1.0]
+                node = {**node, "matrix": mat_mul(node.get("matrix", IDENTITY), dequantize)}
+            nodes.append(node)
+        optimized["nodes"] = nodes
+        for key in ("extensionsUsed", "extensionsRequired"):
+            optimized[key] = [*gltf_data.get(key, []), QUANTIZATION_EXTENSION]
+    return optimized
 
 
 def get_js_library() -> str:
@@ -50,7 +602,7 @@ def get_js_library() -> str:
     Returns:
         str: The JavaScript library content (uses bare specifiers, requires importmap)
     """
-    template = env.get_template("effibemviewer.js.j2")
+    template = get_env().get_template("effibemviewer.js.j2")
     return template.render()
 
 
@@ -60,7 +612,7 @@ def get_css_library(height: str = "100vh") -> str:
     Returns:
         str: The CSS library content
     """
-    template = env.get_template("effibemviewer.css.j2")
+    template = get_env().get_template("effibemviewer.css.j2")
     return template.render(height=height)
 
 
@@ -73,6 +625,11 @@ def model_to_gltf_html(
     loader_mode: bool = False,
     script_only: bool = False,
     cdn: bool = False,
+    viewer_options: dict | None = None,
+    cache: GltfCache | None = None,
+    timings: Timings | None = None,
+    compress: bool = False,
+    model_filter: ModelFilter | None = None,
 ) -> str:
     """Generate a full standalone HTML page for viewing an OpenStudio model.
 
@@ -85,22 +642,239 @@ def model_to_gltf_html(
         loader_mode: If True, generate file-input loader instead of embedding model data
         script_only: If True, generate only the script fragment (for Jupyter)
         cdn: If True, reference JS/CSS from jsDelivr CDN (overrides embedded)
+        viewer_options: Extra options for the JS `EffiBEMViewer` constructor, e.g. `{"mergedGeometry": True}`
+        cache: Optional cache of GLTF conversion results, see `model_to_gltf_json`
+        timings: Optional `Timings`, to record the time of each conversion stage and the size of the output
+        compress: If True, embed the model as gzip-compressed GLB instead of JSON, see `gltf_json_to_html`
+        model_filter: Optional `ModelFilter`, to render only a part of the model, see `model_to_gltf_json`
     """
-    data = model_to_gltf_json(model=model, include_geometry_diagnostics=include_geometry_diagnostics)
+    data = model_to_gltf_json(
+        model=model,
+        include_geometry_diagnostics=include_geometry_diagnostics,
+        cache=cache,
+        timings=timings,
+        model_filter=model_filter,
+    )
 
-    template = env.get_template("effibemviewer.html.j2")
-    indent = 2 if pretty_json else None
+    return gltf_json_to_html(
+        gltf_data=data,
+        height=height,
+        pretty_json=pretty_json,
+        include_geometry_diagnostics=include_geometry_diagnostics,
+        embedded=embedded,
+        loader_mode=loader_mode,
+        script_only=script_only,
+        cdn=cdn,
+        viewer_options=viewer_options,
+        timings=timings,
+        compress=compress,
+    )
 
-    return template.render(
+
+def gltf_json_to_html(
+    gltf_data: dict,
+    height: str = "100vh",
+    pretty_json: bool = False,
+    include_geometry_diagnostics: bool = False,
+    embedded: bool = True,
+    loader_mode: bool = False,
+    script_only: bool = False,
+    cdn: bool = False,
+    viewer_options: dict | None = None,
+    timings: Timings | None = None,
+    compress: bool = False,
+) -> str:
+    """Generate a full standalone HTML page for viewing already converted GLTF JSON data.
+
+    Args:
+        gltf_data: GLTF JSON data, as returned by `model_to_gltf_json` or `osm_to_gltf_json`
+        height: CSS height value (default "100vh" for full viewport)
+        pretty_json: If True, format JSON with indentation
+        include_geometry_diagnostics: If True, include geometry diagnostic info
+        embedded: If True, inline the JS library. If False, reference external JS file.
+        loader_mode: If True, generate file-input loader instead of embedding model data
+        script_only: If True, generate only the script fragment (for Jupyter)
+        cdn: If True, reference JS/CSS from jsDelivr CDN (overrides embedded)
+        viewer_options: Extra options for the JS `EffiBEMViewer` constructor, e.g. `{"mergedGeometry": True}`
+        timings: Optional `Timings`, to record the rendering time and the size of the page
+        compress: If True, embed the model as gzip-compressed GLB (base64 encoded once) instead of JSON, which is
+            typically ten times smaller. The viewer decompresses it with the browser's `DecompressionStream`.
+            `pretty_json` is then ignored.
+    """
+    return "".join(
+        iter_gltf_json_html(
+            gltf_data=gltf_data,
+            height=height,
+            pretty_json=pretty_json,
+            include_geometry_diagnostics=include_geometry_diagnostics,
+            embedded=embedded,
+            loader_mode=loader_mode,
+            script_only=script_only,
+            cdn=cdn,
+            viewer_options=viewer_options,
+            timings=timings,
+            compress=compress,
+        )
+    )
+
+
+def _iter_compact_json(data: dict, encoder: json.JSONEncoder) -> Iterator[str]:
+    """Serialize data to the same JSON as `encoder.encode(data)`, one top-level array item at a time.
+
+    Each item is encoded with the (C accelerated) one-shot encoder, which is several times faster than the pure-Python
+    `JSONEncoder.iterencode`, while still never holding the full JSON string in memory.
+    """
+    yield "{"
+    for i, key in enumerate(sorted(data)):
+        yield f"{', ' if i else ''}{encoder.encode(key)}: "
+        value = data[key]
+        if isinstance(value, list):
+            yield "["
+            for j, item in enumerate(value):
+                yield f"{', ' if j else ''}{encoder.encode(item)}"
+            yield "]"
+        else:
+            yield encoder.encode(value)
+    yield "}"
+
+
+def iter_json_chunks(data: dict, indent: int | None = None) -> Iterator[str]:
+    """Serialize data to JSON incrementally, in chunks of about JSON_CHUNK_SIZE characters.
+
+    The output is identical to Jinja's `tojson` filter: keys are sorted, and the characters that are unsafe in an HTML
+    <script> are escaped.
+
+    Args:
+        data: The data to serialize
+        indent: Optional indentation, as in `json.dumps`
+
+    Returns:
+        Iterator[str]: The chunks of the JSON text
+    """
+    encoder = json.JSONEncoder(sort_keys=True, indent=indent)
+    tokens = _iter_compact_json(data, encoder) if indent is None else encoder.iterencode(data)
+    buffer: list[str] = []
+    buffer_size = 0
+    for chunk in tokens:
+        chunk = chunk.replace("<", "\\u003c").replace(">", "\\u003e").replace("&", "\\u0026").replace("'", "\\u0027")
+        buffer.append(chunk)
+        buffer_size += len(chunk)
+        if buffer_size >= JSON_CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer.clear()
+            buffer_size = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def iter_gltf_json_html(
+    gltf_data: dict,
+    height: str = "100vh",
+    pretty_json: bool = False,
+    include_geometry_diagnostics: bool = False,
+    embedded: bool = True,
+    loader_mode: bool = False,
+    script_only: bool = False,
+    cdn: bool = False,
+    viewer_options: dict | None = None,
+    timings: Timings | None = None,
+    compress: bool = False,
+) -> Iterator[str]:
+    """Generate the HTML page for viewing already converted GLTF JSON data, chunk by chunk.
+
+    The GLTF JSON is encoded incrementally, so the full HTML string is never held in memory. See `gltf_json_to_html`
+    for the arguments.
+
+    Returns:
+        Iterator[str]: The chunks of the HTML page
+    """
+    with timed(timings, "render_html"):
+        template = get_env().get_template("effibemviewer.html.j2")
+    compressed_gltf = None
+    json_chunks: Iterator[str] | None = None
+    if compress:
+        with timed(timings, "compress"):
+            compressed_gltf = base64.b64encode(compress_gltf_json(gltf_data)).decode()
+        if timings is not None:
+            timings.sizes["compressed"] = len(compressed_gltf)
+    else:
+        json_chunks = iter_json_chunks(gltf_data, indent=2 if pretty_json else None)
+        if timings is not None:
+            json_chunks = timings.iter_stage(json_chunks, "json_encode")
+
+    html_chunks = template.generate(
         height=height,
-        gltf_data=data,
-        indent=indent,
+        gltf_json_chunks=json_chunks,
+        compressed_gltf=compressed_gltf,
         include_geometry_diagnostics=include_geometry_diagnostics,
         embedded=embedded,
         loader_mode=loader_mode,
         script_only=script_only,
         cdn_base_url=CDN_BASE_URL if cdn else None,
+        viewer_options=viewer_options,
     )
+    if timings is not None:
+        return timings.iter_stage(html_chunks, "render_html", size_name="html")
+    return html_chunks
+
+
+def write_gltf_html(
+    model: openstudio.model.Model,
+    fp: IO[str] | str | Path,
+    height: str = "100vh",
+    pretty_json: bool = False,
+    include_geometry_diagnostics: bool = False,
+    embedded: bool = True,
+    cdn: bool = False,
+    viewer_options: dict | None = None,
+    cache: GltfCache | None = None,
+    timings: Timings | None = None,
+    compress: bool = False,
+    model_filter: ModelFilter | None = None,
+):
+    """Write the standalone HTML page for viewing an OpenStudio model, streaming it to a file.
+
+    Unlike `model_to_gltf_html`, neither the GLTF JSON string nor the full HTML string are ever built in memory: the
+    output is written in chunks, so peak memory stays close to the size of the GLTF data itself.
+
+    Args:
+        model: OpenStudio model to render
+        fp: A text file object, or the path of the output HTML file
+        height: CSS height value (default "100vh" for full viewport)
+        pretty_json: If True, format JSON with indentation
+        include_geometry_diagnostics: If True, include geometry diagnostic info
+        embedded: If True, inline the JS library. If False, reference external JS file.
+        cdn: If True, reference JS/CSS from jsDelivr CDN (overrides embedded)
+        viewer_options: Extra options for the JS `EffiBEMViewer` constructor, e.g. `{"mergedGeometry": True}`
+        cache: Optional cache of GLTF conversion results, see `model_to_gltf_json`
+        timings: Optional `Timings`, to record the time of each conversion stage and the size of the output
+        compress: If True, embed the model as gzip-compressed GLB instead of JSON, see `gltf_json_to_html`
+        model_filter: Optional `ModelFilter`, to render only a part of the model, see `model_to_gltf_json`
+    """
+    data = model_to_gltf_json(
+        model=model,
+        include_geometry_diagnostics=include_geometry_diagnostics,
+        cache=cache,
+        timings=timings,
+        model_filter=model_filter,
+    )
+    chunks = iter_gltf_json_html(
+        gltf_data=data,
+        height=height,
+        pretty_json=pretty_json,
+        include_geometry_diagnostics=include_geometry_diagnostics,
+        embedded=embedded,
+        cdn=cdn,
+        viewer_options=viewer_options,
+        timings=timings,
+        compress=compress,
+    )
+    with timed(timings, "write"):
+        if isinstance(fp, (str, Path)):
+            with open(fp, "w", encoding="utf-8") as f:
+                f.writelines(chunks)
+        else:
+            fp.writelines(chunks)
 
 
 def display_model(
@@ -109,6 +883,8 @@ def display_model(
     use_iframe: bool = False,
     include_geometry_diagnostics: bool = False,
     cdn: bool = False,
+    viewer_options: dict | None = None,
+    model_filter: ModelFilter | None = None,
 ) -> HTML | IFrame:
     """Display an OpenStudio model in a Jupyter notebook.
 
@@ -118,6 +894,8 @@ def display_model(
         use_iframe: If True, use IFrame for nbclassic compatibility
         include_geometry_diagnostics: If True, include geometry diagnostic info
         cdn: If True, load JS/CSS from CDN (better caching on re-runs)
+        viewer_options: Extra options for the JS `EffiBEMViewer` constructor, e.g. `{"mergedGeometry": True}`
+        model_filter: Optional `ModelFilter`, to display only a part of the model, see `model_to_gltf_json`
 
     Returns:
         IPython display object (HTML or IFrame)
@@ -131,6 +909,8 @@ def display_model(
         loader_mode=False,
         script_only=True,
         cdn=cdn,
+        viewer_options=viewer_options,
+        model_filter=model_filter,
     )
     if not use_iframe:
         from IPython.display import HTML
@@ -169,6 +949,7 @@ def generate_loader_html(
     include_geometry_diagnostics: bool = False,
     embedded: bool = True,
     cdn: bool = False,
+    viewer_options: dict | None = None,
     script_only: bool = False,
 ) -> str:
     """Generate a standalone HTML page with a file input for loading GLTF files.
@@ -178,21 +959,58 @@ def generate_loader_html(
         include_geometry_diagnostics: If True, enable geometry diagnostic display
         embedded: If True, inline the JS library. If False, reference external JS file.
         cdn: If True, reference JS/CSS from jsDelivr CDN (overrides embedded)
+        viewer_options: Extra options for the JS `EffiBEMViewer` constructor, e.g. `{"mergedGeometry": True}`
         script_only: If True, generate only the script fragment (used in gh-pages only)
     Returns:
         str: Full HTML page with file input for loading GLTF files
     """
-    template = env.get_template("effibemviewer.html.j2")
+    template = get_env().get_template("effibemviewer.html.j2")
 
     html = template.render(
         height=height,
-        gltf_data=None,
-        indent=None,
+        gltf_json_chunks=None,
         include_geometry_diagnostics=include_geometry_diagnostics,
         embedded=embedded,
         loader_mode=True,
         script_only=script_only,
         cdn_base_url=CDN_BASE_URL if cdn else None,
+        viewer_options=viewer_options,
+    )
+    return html
+
+
+def generate_manifest_html(
+    manifest_url: str,
+    height: str = "100vh",
+    include_geometry_diagnostics: bool = False,
+    embedded: bool = True,
+    cdn: bool = False,
+    viewer_options: dict | None = None,
+) -> str:
+    """Generate a standalone HTML page that progressively loads a model split per story (see `write_chunked_gltf`).
+
+    Args:
+        manifest_url: URL of the manifest file, relative to the page
+        height: CSS height value (default "100vh" for full viewport)
+        include_geometry_diagnostics: If True, enable geometry diagnostic display
+        embedded: If True, inline the JS library. If False, reference external JS file.
+        cdn: If True, reference JS/CSS from jsDelivr CDN (overrides embedded)
+        viewer_options: Extra options for the JS `EffiBEMViewer` constructor, e.g. `{"chunkLoading": "onDemand"}`
+    Returns:
+        str: Full HTML page loading the manifest
+    """
+    template = get_env().get_template("effibemviewer.html.j2")
+
+    html = template.render(
+        height=height,
+        gltf_json_chunks=None,
+        manifest_url=manifest_url,
+        include_geometry_diagnostics=include_geometry_diagnostics,
+        embedded=embedded,
+        loader_mode=False,
+        script_only=False,
+        cdn_base_url=CDN_BASE_URL if cdn else None,
+        viewer_options=viewer_options,
     )
     return html
 
@@ -206,6 +1024,8 @@ def create_example_model(include_geometry_diagnostics: bool = False) -> openstud
     Returns:
         model (openstudio.model.Model): Example model
     """
+    import openstudio
+
     model = openstudio.model.exampleModel()
     space = model.getSpaceByName("Space 1").get()
     # Move space type assignment from Building to Space, so I can have one without it
@@ -234,3 +1054,123 @@ def create_example_model(include_geometry_diagnostics: bool = False) -> openstud
         surface.setVertices(openstudio.reverse(surface.vertices()))
 
     return model
+
+
+def create_parametric_model(
+    num_stories: int = 1,
+    spaces_per_story: int = 1,
+    windows_per_wall: int = 0,
+    shading: bool = False,
+    space_size: float = 10.0,
+    story_height: float = 3.0,
+) -> openstudio.model.Model:
+    """Create a synthetic OpenStudio model of arbitrary size, e.g. for benchmarks.
+
+    The model starts from the example model (constructions, space type, schedules...) with its geometry replaced by
+    a grid of box-shaped spaces: `spaces_per_story` spaces per story, laid out as close to a square as possible, on
+    `num_stories` stories. Each space has its own thermal zone, and adjacent surfaces are matched.
+
+    Args:
+        num_stories: Number of building stories
+        spaces_per_story: Number of spaces on each story
+        windows_per_wall: Number of windows on each exterior wall
+        shading: If True, add an overhang above each window
+        space_size: Width and depth of each space, in meters
+        story_height: Floor to floor height, in meters
+
+    Returns:
+        model (openstudio.model.Model): The synthetic model
+    """
+    import math
+
+    import openstudio
+
+    if num_stories < 1 or spaces_per_story < 1 or windows_per_wall < 0:
+        raise ValueError("num_stories and spaces_per_story must be at least 1, and windows_per_wall at least 0")
+
+    model = openstudio.model.exampleModel()
+    space_type = model.getBuilding().spaceType().get()
+    # Query each type after the previous removals, which also remove the children (e.g. space shading groups)
+    for get_objects in ("getSpaces", "getShadingSurfaceGroups", "getThermalZones", "getBuildingStorys"):
+        for obj in getattr(model, get_objects)():
+            obj.remove()
+
+    columns = math.ceil(math.sqrt(spaces_per_story))
+    spaces = []
+    for story_index in range(num_stories):
+        z = story_index * story_height
+        story = openstudio.model.BuildingStory(model)
+        story.setName(f"Story {story_index + 1}")
+        story.setNominalZCoordinate(z)
+        story.setNominalFloortoFloorHeight(story_height)
+        for space_index in range(spaces_per_story):
+            x0 = (space_index % columns) * space_size
+            y0 = (space_index // columns) * space_size
+            x1 = x0 + space_size
+            y1 = y0 + space_size
+            # Clockwise seen from above, so the floor faces down
+            floor_print = openstudio.Point3dVector(
+                [
+                    openstudio.Point3d(x1, y1, 0),
+                    openstudio.Point3d(x1, y0, 0),
+                    openstudio.Point3d(x0, y0, 0),
+                    openstudio.Point3d(x0, y1, 0),
+                ]
+            )
+            space = openstudio.model.Space.fromFloorPrint(floor_print, story_height, model).get()
+            space.setName(f"Story {story_index + 1} Space {space_index + 1}")
+            space.setZOrigin(z)
+            space.setBuildingStory(story)
+            space.setSpaceType(space_type)
+            zone = openstudio.model.ThermalZone(model)
+            zone.setName(f"Story {story_index + 1} Zone {space_index + 1}")
+            space.setThermalZone(zone)
+            spaces.append(space)
+
+    # Match the coincident surfaces of adjacent spaces. In a grid of boxes they coincide exactly, so they can be paired
+    # by centroid, instead of openstudio.model.matchSurfaces which intersects every pair of spaces
+    by_centroid: dict[tuple[float, float, float], openstudio.model.Surface] = {}
+    for space in spaces:
+        to_building = space.transformation()
+        for surface in space.surfaces():
+            c = to_building * openstudio.getCentroid(surface.vertices()).get()
+            key = (round(c.x(), 3), round(c.y(), 3), round(c.z(), 3))
+            other = by_centroid.pop(key, None)
+            if other is None:
+                by_centroid[key] = surface
+            else:
+                surface.setAdjacentSurface(other)
+
+    if windows_per_wall:
+        for surface in model.getSurfaces():
+            if surface.surfaceType() != "Wall" or surface.outsideBoundaryCondition() != "Outdoors":
+                continue
+            # Lay the windows out in the plane of the wall, then bring them back to the space coordinates
+            to_face = openstudio.Transformation.alignFace(surface.vertices())
+            face_vertices = to_face.inverse() * surface.vertices()
+            xmin = min(v.x() for v in face_vertices)
+            xmax = max(v.x() for v in face_vertices)
+            ymin = min(v.y() for v in face_vertices)
+            ymax = max(v.y() for v in face_vertices)
+            width = (xmax - xmin) / windows_per_wall
+            bottom = ymin + 0.3 * (ymax - ymin)
+            top = ymin + 0.8 * (ymax - ymin)
+            for window_index in range(windows_per_wall):
+                left = xmin + (window_index + 0.15) * width
+                right = xmin + (window_index + 0.85) * width
+                window_vertices = openstudio.Point3dVector(
+                    [
+                        openstudio.Point3d(left, top, 0),
+                        openstudio.Point3d(left, bottom, 0),
+                        openstudio.Point3d(right, bottom, 0),
+                        openstudio.Point3d(right, top, 0),
+                    ]
+                )
+                window = openstudio.model.SubSurface(to_face * window_vertices, model)
+                window.setName(f"{surface.nameString()} Window {window_index + 1}")
+                window.setSurface(surface)
+                window.setSubSurfaceType("FixedWindow")
+                if shading:
+                    window.addOverhang(0.5, 0.05)
+
+    return model
@@ -0,0 +1,145 @@
+"""Helpers to read the buffers, accessors and node matrices of GLTF JSON data with embedded buffers."""
+
+from __future__ import annotations
+
+import base64
+
+COMPONENT_SIZES = {5120: 1, 5121: 1, 5122: 2, 5123: 2, 5125: 4, 5126: 4}
+# Divisor of the normalized integer component types (e.g. positions quantized by `optimize_gltf_json`)
+NORMALIZED_MAX = {5120: 127, 5121: 255, 5122: 32767, 5123: 65535}
+TYPE_COMPONENTS = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+IDENTITY = [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+
+
+def decode_buffers(gltf_data: dict) -> list[bytes]:
+    """Decode the embedded base64 data URI buffers of GLTF JSON data.
+
+    Raises:
+        ValueError: If a buffer is not an embedded base64 data URI
+    """
+    buffers = []
+    for i, buffer in enumerate(gltf_data.get("buffers", [])):
+        uri = buffer.get("uri", "")
+        if not uri.startswith("data:") or ";base64," not in uri:
+            raise ValueError(f"Buffer {i} is not an embedded base64 data URI")
+        buffers.append(base64.b64decode(uri.split(",", 1)[1]))
+    return buffers
+
+
+def accessor_bytes(gltf_data: dict, buffers: list[bytes], accessor_index: int) -> bytes:
+    """Get the bytes of an accessor, from its first element to the end of its last one (including the strides)."""
+    accessor = gltf_data["accessors"][accessor_index]
+    view = gltf_data["bufferViews"][accessor["bufferView"]]
+    element_size = COMPONENT_SIZES[accessor["componentType"]] * TYPE_COMPONENTS[accessor["type"]]
+    stride = view.get("byteStride", element_size)
+    start = view.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+    end = start + ((accessor["count"] - 1) * stride + element_size if accessor["count"] else 0)
+    return buffers[view["buffer"]][start:end]
+
+
+def mat_mul(a: list[float], b: list[float]) -> list[float]:
+    """Multiply two 4x4 column-major matrices."""
+    return [sum(a[k * 4 + r] * b[c * 4 + k] for k in range(4)) for c in range(4) for r in range(4)]
+
+
+def world_matrices(gltf_data: dict) -> dict[int, list[float]]:
+    """Compute the world matrix of every node of the default scene."""
+    nodes = gltf_data.get("nodes", [])
+    matrices = {}
+    stack = [(i, IDENTITY) for i in gltf_data["scenes"][gltf_data.get("scene", 0)].get("nodes", [])]
+    while stack:
+        i, parent = stack.pop()
+        matrices[i] = mat_mul(parent, nodes[i].get("matrix", IDENTITY))
+        stack.extend((child, matrices[i]) for child in nodes[i].get("children", []))
+    return matrices
+
+
+def extract_nodes(gltf_data: dict, buffers: list[bytes], keep_node: set[int]) -> dict:
+    """Build a self-contained GLTF holding only the given mesh nodes, their ancestors, and the data they use.
+
+    The model object metadata of the scene extras is left out, since it describes the whole model.
+    """
+    nodes = gltf_data.get("nodes", [])
+    scene = gltf_data["scenes"][gltf_data.get("scene", 0)]
+
+    # Keep the wanted nodes and their ancestors, in depth-first order
+    new_nodes: list[dict] = []
+    new_meshes: list[dict] = []
+    mesh_map: dict[int, int] = {}
+
+    def visit(i: int) -> int | None:
+        node = nodes[i]
+        children = [c for c in (visit(child) for child in node.get("children", [])) if c is not None]
+        has_mesh = "mesh" in node and i in keep_node
+        if not has_mesh and not children:
+            return None
+        new_node = {k: v for k, v in node.items() if k not in ("children", "mesh")}
+        if children:
+            new_node["children"] = children
+        if has_mesh:
+            if node["mesh"] not in mesh_map:
+                mesh_map[node["mesh"]] = len(new_meshes)
+                new_meshes.append(gltf_data["meshes"][node["mesh"]])
+            new_node["mesh"] = mesh_map[node["mesh"]]
+        new_nodes.append(new_node)
+        return len(new_nodes) - 1
+
+    roots = [r for r in (visit(i) for i in scene.get("nodes", [])) if r is not None]
+
+    # Copy the bytes of the used accessors, grouped by their original buffer view (which keeps its stride and target)
+    accessor_map: dict[int, int] = {}
+    new_accessors: list[dict] = []
+    view_data: dict[int, bytearray] = {}
+
+    def remap_accessor(i: int) -> int:
+        if i in accessor_map:
+            return accessor_map[i]
+        accessor = dict(gltf_data["accessors"][i])
+        data = view_data.setdefault(accessor["bufferView"], bytearray())
+        data += b"\x00" * (-len(data) % 4)
+        accessor["byteOffset"] = len(data)
+        data += accessor_bytes(gltf_data, buffers, i)
+        accessor_map[i] = len(new_accessors)
+        new_accessors.append(accessor)
+        return accessor_map[i]
+
+    for mesh_index, mesh in enumerate(new_meshes):
+        primitives = []
+        for primitive in mesh.get("primitives", []):
+            primitive = dict(primitive)
+            primitive["attributes"] = {name: remap_accessor(a) for name, a in primitive["attributes"].items()}
+            if "indices" in primitive:
+                primitive["indices"] = remap_accessor(primitive["indices"])
+            primitives.append(primitive)
+        new_meshes[mesh_index] = {**mesh, "primitives": primitives}
+
+    view_map = {}
+    new_views: list[dict] = []
+    buffer_data = bytearray()
+    for old_view, data in view_data.items():
+        buffer_data += b"\x00" * (-len(buffer_data) % 4)
+        view = {k: v for k, v in gltf_data["bufferViews"][old_view].items() if k not in ("byteOffset", "byteLength")}
+        view.update(buffer=0, byteOffset=len(buffer_data), byteLength=len(data))
+        view_map[old_view] = len(new_views)
+        new_views.append(view)
+        buffer_data += data
+    for accessor in new_accessors:
+        accessor["bufferView"] = view_map[accessor["bufferView"]]
+
+    extras = {k: v for k, v in scene.get("extras", {}).items() if k != "modelObjectMetaData"}
+    chunk = {k: v for k, v in gltf_data.items() if k not in ("scene", "scenes", "nodes", "meshes", "accessors")}
+    chunk.update(
+        scene=0,
+        scenes=[{"nodes": roots, "extras": extras}],
+        nodes=new_nodes,
+        meshes=new_meshes,
+        accessors=new_accessors,
+        bufferViews=new_views,
+        buffers=[
+            {
+                "byteLength": len(buffer_data),
+                "uri": "data:application/octet-stream;base64," + base64.b64encode(bytes(buffer_data)).decode(),
+            }
+        ],
+    )
+    return chunk
@@ -0,0 +1,147 @@
+"""Persistent model viewers in Jupyter notebooks, updated in place as the model changes."""
+
+from __future__ import annotations
+
+import json
+import uuid
+from typing import TYPE_CHECKING
+
+from effibemviewer.gltf import CDN_BASE_URL, get_env, iter_json_chunks, model_to_gltf_json
+from effibemviewer.updates import make_update, surface_digests
+
+if TYPE_CHECKING:
+    import openstudio
+
+    from effibemviewer.cache import GltfCache
+
+# Whether the embedded JS library was already injected in the notebook by this kernel session. The page may have lost it
+# since (browser reload, cleared output): the viewers then load it from the CDN when they can, see `show_model`
+_library_injected = False
+
+
+class NotebookViewer:
+    """A model viewer displayed in a Jupyter notebook, that can be updated in place as the model changes.
+
+    Create it with `show_model`. On `update`, only the surfaces that were added, changed or removed since the last
+    update are sent to the existing viewer, which keeps its camera and filters.
+
+    Args:
+        viewer_id: The id of the viewer container in the notebook page
+        gltf_data: The GLTF JSON data currently displayed
+        include_geometry_diagnostics: Whether geometry diagnostics are included in the conversion
+    """
+
+    def __init__(self, viewer_id: str, gltf_data: dict, include_geometry_diagnostics: bool = False):
+        """Initialize the handle of the viewer displaying gltf_data."""
+        self.viewer_id = viewer_id
+        self.include_geometry_diagnostics = include_geometry_diagnostics
+        self._digests = surface_digests(gltf_data)
+
+    def __repr__(self):
+        """Return a string representation of the viewer."""
+        return f"NotebookViewer(viewer_id={self.viewer_id!r}, surfaces={len(self._digests)})"
+
+    def update_gltf_json(self, gltf_data: dict) -> dict[str, int]:
+        """Update the viewer with already converted GLTF JSON data, sending only the surfaces that changed.
+
+        Args:
+            gltf_data: GLTF JSON data, as returned by `model_to_gltf_json`
+
+        Returns:
+            dict: The number of surfaces "added", "changed" and "removed"
+        """
+        from IPython.display import HTML, display
+
+        digests = surface_digests(gltf_data)
+        update, counts = make_update(self._digests, digests, gltf_data)
+        self._digests = digests
+        if update is not None:
+            update_json = "".join(iter_json_chunks(update))
+            display(
+                HTML(
+                    '<script type="module">\n'
+                    f"window.effibemViewers?.[{json.dumps(self.viewer_id)}]?.then("
+                    f"viewer => viewer.applyUpdate({update_json}));\n"
+                    "</script>"
+                )
+            )
+        return counts
+
+    def update(self, model: openstudio.model.Model, cache: GltfCache | None = None) -> dict[str, int]:
+        """Update the viewer with a (modified) OpenStudio model, sending only the surfaces that changed.
+
+        Surfaces are matched by handle, so a surface whose vertices, construction, space... changed is replaced.
+
+        Args:
+            model: OpenStudio model to render
+            cache: Optional cache of GLTF conversion results, see `model_to_gltf_json`
+
+        Returns:
+            dict: The number of surfaces "added", "changed" and "removed"
+        """
+        gltf_data = model_to_gltf_json(
+            model=model, include_geometry_diagnostics=self.include_geometry_diagnostics, cache=cache
+        )
+        return self.update_gltf_json(gltf_data)
+
+
+def show_model(
+    model: openstudio.model.Model,
+    height: str = "500px",
+    include_geometry_diagnostics: bool = False,
+    cdn: bool = False,
+    viewer_options: dict | None = None,
+    include_library: bool | None = None,
+    cache: GltfCache | None = None,
+) -> NotebookViewer:
+    """Display an OpenStudio model in a Jupyter notebook, and return a handle to update it in place.
+
+    Unlike `display_model`, the JS library is only embedded in the first viewer of the kernel session, and
+    `NotebookViewer.update` only sends the surfaces that changed, so the notebook does not grow by the full model (and
+    library) on every change. The other viewers check in the browser that the page still has the library. If it was
+    lost since (e.g. after a browser reload, or once the output holding it was cleared), they load it from the CDN when
+    the page still has the three.js import map, and otherwise show an error asking to pass `include_library=True`,
+    since the import map cannot be added once modules are loaded.
+
+    Args:
+        model: OpenStudio model to render
+        height: CSS height value (default "500px")
+        include_geometry_diagnostics: If True, include geometry diagnostic info
+        cdn: If True, load JS/CSS from CDN (every viewer then references it)
+        viewer_options: Extra options for the JS `EffiBEMViewer` constructor, e.g. `{"mergedGeometry": True}`
+        include_library: Whether to embed the JS library. By default, only the first time in the kernel session: pass
+            True to embed it again, e.g. to work offline once the notebook output holding it was cleared.
+        cache: Optional cache of GLTF conversion results, see `model_to_gltf_json`
+
+    Returns:
+        NotebookViewer: The handle of the displayed viewer
+    """
+    global _library_injected
+    from IPython.display import HTML, display
+
+    gltf_data = model_to_gltf_json(model=model, include_geometry_diagnostics=include_geometry_diagnostics, cache=cache)
+    if include_library is None:
+        include_library = cdn or not _library_injected
+    viewer = NotebookViewer(
+        f"effibemviewer-{uuid.uuid4().hex[:12]}", gltf_data, include_geometry_diagnostics=include_geometry_diagnostics
+    )
+
+    template = get_env().get_template("effibemviewer.html.j2")
+    fragment = template.render(
+        height=height,
+        gltf_json_chunks=iter_json_chunks(gltf_data),
+        include_geometry_diagnostics=include_geometry_diagnostics,
+        embedded=True,
+        loader_mode=False,
+        script_only=True,
+        cdn_base_url=CDN_BASE_URL if cdn else None,
+        viewer_options=viewer_options,
+        container_id=viewer.viewer_id,
+        include_library=include_library,
+        library_fallback_url=None if include_library else CDN_BASE_URL,
+        register_viewer=True,
+    )
+    display(HTML(fragment))
+    if include_library and not cdn:
+        _library_injected = True
+    return viewer
@@ -0,0 +1,264 @@
+"""Local HTTP server for the viewer of a model file, pushing the model changes to the open viewers as it is edited."""
+
+from __future__ import annotations
+
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import TYPE_CHECKING
+from urllib.parse import parse_qs, urlsplit
+
+from effibemviewer import __version__
+from effibemviewer.updates import make_update, surface_digests
+
+if TYPE_CHECKING:
+    from effibemviewer.cache import GltfCache
+
+# Number of past model versions an open viewer can still be updated from, without a full page reload
+MAX_VERSIONS = 16
+# Interval between keep-alive comments on the event streams, which also detect closed connections
+KEEPALIVE_INTERVAL = 15.0
+
+
+class ModelServer:
+    """Serve the viewer of an OpenStudio model file over HTTP, re-translating the model when the file changes.
+
+    The page loads the model as a binary GLB. When watching, the file is polled and re-translated in the background
+    once it stops changing for `debounce` seconds; the open pages are notified over Server-Sent Events, and fetch then
+    apply only the surfaces that changed, keeping their camera and filters.
+
+    Args:
+        osm_path: Path to the OpenStudio model file
+        include_geometry_diagnostics: If True, include geometry diagnostic info
+        viewer_options: Extra options for the JS `EffiBEMViewer` constructor
+        cache: Optional cache of GLTF conversion results, see `model_to_gltf_json`
+        debounce: Time (in seconds) the file must stay unchanged before it is re-translated
+    """
+
+    def __init__(
+        self,
+        osm_path: str | Path,
+        include_geometry_diagnostics: bool = False,
+        viewer_options: dict | None = None,
+        cache: GltfCache | None = None,
+        debounce: float = 0.5,
+    ):
+        """Initialize the server of osm_path. The model is translated by `translate`."""
+        self.osm_path = Path(osm_path)
+        self.include_geometry_diagnostics = include_geometry_diagnostics
+        self.viewer_options = viewer_options
+        self.cache = cache
+        self.debounce = debounce
+
+        self.version = 0
+        self.glb = b""
+        self.error: str | None = None
+        self._gltf_data: dict = {}
+        # Surface digests of the last versions, to diff them against the current one
+        self._digests: OrderedDict[int, dict[str, tuple[int, str]]] = OrderedDict()
+        self._changed = threading.Condition()
+        self._stopped = threading.Event()
+
+    def translate(self) -> bool:
+        """Translate the model file and publish it as a new version, notifying the open viewers.
+
+        Returns:
+            bool: Whether the translation succeeded. On failure, the previous version is kept.
+        """
+        from effibemviewer.gltf import gltf_json_to_glb, osm_to_gltf_json
+
+        start = time.perf_counter()
+        try:
+            gltf_data = osm_to_gltf_json(
+                self.osm_path, include_geometry_diagnostics=self.include_geometry_diagnostics, cache=self.cache
+            )
+            digests = surface_digests(gltf_data)
+            glb = gltf_json_to_glb(gltf_data)
+        except Exception as e:
+            print(f"Failed: {self.osm_path}: {e}", file=sys.stderr)
+            with self._changed:
+                self.error = str(e)
+                self._changed.notify_all()
+            return False
+
+        with self._changed:
+            self.version += 1
+            self.glb = glb
+            self.error = None
+            self._gltf_data = gltf_data
+            self._digests[self.version] = digests
+            while len(self._digests) > MAX_VERSIONS:
+                self._digests.popitem(last=False)
+            self._changed.notify_all()
+        print(f"Translated: {self.osm_path} (version {self.version}, {time.perf_counter() - start:.2f}s)")
+        return True
+
+    def get_update(self, since: int) -> dict:
+        """Get the update from version `since` to the current version, for the JS `applyUpdate()`.
+
+        Returns:
+            dict: The current "version", and the "update" to apply, or None if `since` is too old to diff from
+        """
+        with self._changed:
+            version = self.version
+            gltf_data = self._gltf_data
+            current = self._digests.get(version, {})
+            previous = self._digests.get(since)
+        if previous is None:
+            return {"version": version, "update": None}
+        update, _ = make_update(previous, current, gltf_data)
+        return {"version": version, "update": update or {"remove": [], "gltf": None}}
+
+    def wait_for_change(self, version: int | None, error: str | None, timeout: float) -> tuple[int, str | None]:
+        """Wait until the version or the error differ from the given ones (or timeout), and return the current ones."""
+        with self._changed:
+            self._changed.wait_for(
+                lambda: self.version != version or self.error != error or self._stopped.is_set(), timeout
+            )
+            return self.version, self.error
+
+    def _file_state(self) -> tuple[int, int] | None:
+        try:
+            stat = self.osm_path.stat()
+        except FileNotFoundError:
+            # Some editors save by replacing the file
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def watch(self, poll_interval: float = 0.25):
+        """Poll the model file until `stop` is called, and re-translate it after it changes.
+
+        Rapid successive saves are debounced: the file is only translated once it stayed unchanged for `debounce`
+        seconds.
+        """
+        last_state = self._file_state()
+        while not self._stopped.wait(poll_interval):
+            state = self._file_state()
+            if state == last_state:
+                continue
+            while not self._stopped.wait(self.debounce):
+                new_state = self._file_state()
+                if new_state == state:
+                    break
+                state = new_state
+            last_state = state
+            if state is not None and not self._stopped.is_set():
+                self.translate()
+
+    def stop(self):
+        """Stop watching, and close the event streams."""
+        self._stopped.set()
+        with self._changed:
+            self._changed.notify_all()
+
+    def page_html(self) -> str:
+        """Generate the viewer page, which loads the current model version and follows its changes."""
+        from effibemviewer.gltf import get_env
+
+        template = get_env().get_template("effibemviewer.html.j2")
+        return template.render(
+            height="100vh",
+            gltf_json_chunks=None,
+            model_url="./model.glb",
+            model_version=self.version,
+            events_url="./events",
+            update_url="./update.json",
+            include_geometry_diagnostics=self.include_geometry_diagnostics,
+            embedded=False,
+            loader_mode=False,
+            script_only=False,
+            cdn_base_url=None,
+            viewer_options=self.viewer_options,
+        )
+
+    def make_http_server(self, host: str = "127.0.0.1", port: int = 8000) -> ThreadingHTTPServer:
+        """Create the HTTP server (not started yet) for this model."""
+        handler = type("_BoundModelRequestHandler", (_ModelRequestHandler,), {"model_server": self})
+        return ThreadingHTTPServer((host, port), handler)
+
+    def serve_forever(self, host: str = "127.0.0.1", port: int = 8000, watch: bool = False):
+        """Translate the model, then serve it until interrupted, watching the file for changes if `watch`.
+
+        Raises:
+            ValueError: If the model cannot be translated at startup
+        """
+        if not self.translate():
+            raise ValueError(f"Could not translate '{self.osm_path}': {self.error}")
+        httpd = self.make_http_server(host, port)
+        if watch:
+            threading.Thread(target=self.watch, name="effibemviewer-watch", daemon=True).start()
+        print(f"Serving {self.osm_path} at http://{host}:{httpd.server_address[1]}/ (press Ctrl+C to stop)")
+        try:
+            httpd.serve_forever()
+        finally:
+            self.stop()
+            httpd.server_close()
+
+
+class _ModelRequestHandler(BaseHTTPRequestHandler):
+    server_version = f"EffiBEMViewer/{__version__}"
+    model_server: ModelServer
+
+    def log_message(self, format: str, *args) -> None:
+        # The event streams and model fetches are not worth logging
+        pass
+
+    def _send(self, content_type: str, body: bytes, status: int = 200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        from effibemviewer.gltf import get_css_library, get_js_library
+
+        url = urlsplit(self.path)
+        if url.path in ("/", "/index.html"):
+            self._send("text/html; charset=utf-8", self.model_server.page_html().encode())
+        elif url.path == "/effibemviewer.js":
+            self._send("text/javascript; charset=utf-8", get_js_library().encode())
+        elif url.path == "/effibemviewer.css":
+            self._send("text/css; charset=utf-8", get_css_library().encode())
+        elif url.path == "/model.glb":
+            self._send("model/gltf-binary", self.model_server.glb)
+        elif url.path == "/update.json":
+            try:
+                since = int(parse_qs(url.query).get("since", ["0"])[0])
+            except ValueError:
+                self.send_error(400, "Invalid 'since' version")
+                return
+            self._send("application/json", json.dumps(self.model_server.get_update(since)).encode())
+        elif url.path == "/events":
+            self._stream_events()
+        else:
+            self.send_error(404)
+
+    def _stream_events(self) -> None:
+        """Stream the model versions (and translation errors) as Server-Sent Events, until the client disconnects."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+
+        model_server = self.model_server
+        version: int | None = None
+        error: str | None = None
+        while not model_server._stopped.is_set():
+            new_version, new_error = model_server.wait_for_change(version, error, KEEPALIVE_INTERVAL)
+            message = ""
+            if new_version != version:
+                message += f"event: version\ndata: {new_version}\n\n"
+            if new_error and new_error != error:
+                message += f"event: failed\ndata: {json.dumps(new_error)}\n\n"
+            version, error = new_version, new_error
+            try:
+                self.wfile.write((message or ": keep-alive\n\n").encode())
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return
@@ -0,0 +1,89 @@
+"""Shared string table for the metadata of the surfaces, which repeats the same few names across the whole model."""
+
+from __future__ import annotations
+
+# Key of the string table in the scene extras
+STRING_TABLE_KEY = "stringTable"
+# Surface extras that are unique to each surface: moving them to the table would only make it longer
+UNIQUE_EXTRAS = ("handle", "name")
+
+
+def encode_string_table(gltf_data: dict) -> dict:
+    """Move the string metadata of the surfaces (construction, space type, thermal zone, story names...) to a table.
+
+    Every surface node repeats strings such as its `constructionName`, `spaceTypeName`, `thermalZoneName`,
+    `buildingStoryName` or `outsideBoundaryCondition` in its extras, which make up a large share of the JSON of large
+    models. Each distinct string is stored once, in `scene.extras.stringTable`, and the surface extras hold its index
+    in the table instead. The `handle` and `name` of the surfaces, which are unique, are kept as is.
+
+    The viewer resolves the indices when loading the model, and colors the surfaces by table index rather than by
+    hashing their strings. Apply it as the last step before writing the data: the indices depend on the whole model,
+    so `surface_digests` would see every surface as changed between two encoded versions.
+
+    Args:
+        gltf_data: GLTF JSON data, as returned by `model_to_gltf_json`. It is not modified.
+
+    Returns:
+        dict: The encoded GLTF JSON data. The scene extras `stringTable` holds the encoded extras "keys", and the
+            "strings" the indices refer to. Data that is already encoded (or has no string metadata) is returned as is.
+    """
+    scene_index = gltf_data.get("scene", 0)
+    scenes = list(gltf_data.get("scenes", []))
+    if not scenes or STRING_TABLE_KEY in scenes[scene_index].get("extras", {}):
+        return gltf_data
+
+    indices: dict[str, int] = {}
+    # Ordered set of the encoded keys
+    keys: dict[str, None] = {}
+    nodes = []
+    for node in gltf_data.get("nodes", []):
+        extras = node.get("extras")
+        if "mesh" in node and extras:
+            extras = dict(extras)
+            for key, value in extras.items():
+                if isinstance(value, str) and key not in UNIQUE_EXTRAS:
+                    extras[key] = indices.setdefault(value, len(indices))
+                    keys[key] = None
+            node = {**node, "extras": extras}
+        nodes.append(node)
+    if not indices:
+        return gltf_data
+
+    scene = scenes[scene_index]
+    scenes[scene_index] = {
+        **scene,
+        "extras": {**scene.get("extras", {}), STRING_TABLE_KEY: {"keys": list(keys), "strings": list(indices)}},
+    }
+    return {**gltf_data, "nodes": nodes, "scenes": scenes}
+
+
+def decode_string_table(gltf_data: dict) -> dict:
+    """Restore the surface metadata strings of GLTF JSON data encoded by `encode_string_table`.
+
+    Args:
+        gltf_data: Encoded GLTF JSON data. It is not modified.
+
+    Returns:
+        dict: The GLTF JSON data without the string table. Data that is not encoded is returned as is.
+    """
+    scene_index = gltf_data.get("scene", 0)
+    scenes = list(gltf_data.get("scenes", []))
+    if not scenes or STRING_TABLE_KEY not in scenes[scene_index].get("extras", {}):
+        return gltf_data
+
+    scene_extras = dict(scenes[scene_index]["extras"])
+    table = scene_extras.pop(STRING_TABLE_KEY)
+    keys = set(table["keys"])
+    strings = table["strings"]
+    nodes = []
+    for node in gltf_data.get("nodes", []):
+        extras = node.get("extras")
+        if "mesh" in node and extras:
+            extras = {
+                key: strings[value] if key in keys and type(value) is int else value for key, value in extras.items()
+            }
+            node = {**node, "extras": extras}
+        nodes.append(node)
+
+    scenes[scene_index] = {**scenes[scene_index], "extras": scene_extras}
+    return {**gltf_data, "nodes": nodes, "scenes": scenes}
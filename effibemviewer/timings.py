@@ -0,0 +1,128 @@
+"""Optional timing instrumentation of the conversion pipeline, to find out where the time goes on large models."""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager
+
+
+class Timings:
+    """The wall time of each stage of a conversion, and the sizes and counts of what the stages produced.
+
+    Pass an instance as the `timings` argument of the conversion functions (`model_to_gltf_json`, `osm_to_gltf_json`,
+    `model_to_gltf_html`...) to record them. The stages are, in pipeline order:
+
+    - "read_file", "cache_key", "cache_lookup", "cache_store": conversion cache, when one is used
+    - "load": `openstudio.model.Model.load`
+    - "diagnostics": `compute_geometry_diagnostics`, when geometry diagnostics are requested from an OpenStudio version
+      that cannot include them
+    - "filter": the `ModelFilter` (copy of the model and removal of the filtered out surfaces), when one is used
+    - "translate": the OpenStudio `GltfForwardTranslator`, up to its serialized GLTF JSON
+    - "json_decode": conversion of the translator output to a Python dict
+    - "optimize": `optimize_gltf_json`, when requested
+    - "string_table": `encode_string_table`, when requested
+    - "json_encode": serialization of the GLTF JSON, into the HTML page or the GLTF file
+    - "compress": compression of the model data embedded in the HTML page, or of the `.gz` file
+    - "render_html": Jinja rendering of the page template (excluding "json_encode")
+    - "glb_pack": packing of the binary GLB
+    - "write": writing the output file (excluding the rendering)
+
+    Stage times are exclusive: the time of a stage nested in another one (e.g. "json_encode" within "render_html") is
+    only counted in the inner stage, so they add up to the total. An instance can be reused across calls, to accumulate
+    the times of several conversions.
+    """
+
+    def __init__(self) -> None:
+        """Initialize empty timings."""
+        self.stages: dict[str, float] = {}
+        self.sizes: dict[str, int] = {}
+        self.counts: dict[str, int] = {}
+        # Time spent in the nested stages, for each stage currently running
+        self._nested: list[float] = []
+
+    def __repr__(self):
+        """Return a string representation of the timings."""
+        return f"Timings(total_seconds={self.total_seconds:.3f}, stages={list(self.stages)})"
+
+    @property
+    def total_seconds(self) -> float:
+        """The total time of all the stages, in seconds."""
+        return sum(self.stages.values())
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Record the time spent in the `with` block as stage `name`."""
+        self._nested.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._nested.pop()
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed - nested
+            if self._nested:
+                self._nested[-1] += elapsed
+
+    def iter_stage(self, chunks: Iterable[str], name: str, size_name: str | None = None) -> Iterator[str]:
+        """Record the time spent producing the chunks of a (lazy) iterable of text as stage `name`.
+
+        Args:
+            chunks: The text chunks, typically a generator
+            name: The stage name
+            size_name: If given, also record the total size of the chunks (in UTF-8 bytes) as this size
+        """
+        iterator = iter(chunks)
+        while True:
+            with self.stage(name):
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    return
+            if size_name is not None:
+                self.sizes[size_name] = self.sizes.get(size_name, 0) + len(chunk.encode())
+            yield chunk
+
+    def count_gltf(self, gltf_data: dict):
+        """Record the counts of surfaces (nodes with a mesh), meshes, materials... and the binary size of GLTF data."""
+        nodes = gltf_data.get("nodes", [])
+        self.counts["nodes"] = len(nodes)
+        self.counts["surfaces"] = sum(1 for node in nodes if "mesh" in node)
+        self.counts["meshes"] = len(gltf_data.get("meshes", []))
+        self.counts["materials"] = len(gltf_data.get("materials", []))
+        self.counts["accessors"] = len(gltf_data.get("accessors", []))
+        self.sizes["gltf_buffers"] = sum(buffer.get("byteLength", 0) for buffer in gltf_data.get("buffers", []))
+
+    def to_dict(self) -> dict:
+        """Get the timings as plain (JSON serializable) data, e.g. to log them.
+
+        Returns:
+            dict: The "total_seconds", and the "stages" (in seconds), "sizes" (in bytes) and "counts" by name
+        """
+        return {
+            "total_seconds": self.total_seconds,
+            "stages": dict(self.stages),
+            "sizes": dict(self.sizes),
+            "counts": dict(self.counts),
+        }
+
+    def format(self) -> str:
+        """Format the timings as a human readable report."""
+        total = self.total_seconds
+        lines = [f"{'Stage':<14} {'Seconds':>9} {'Share':>7}"]
+        for name, seconds in self.stages.items():
+            lines.append(f"{name:<14} {seconds:9.3f} {seconds / total if total else 0:7.1%}")
+        lines.append(f"{'Total':<14} {total:9.3f}")
+        if self.sizes:
+            lines.append("Sizes: " + ", ".join(f"{name} {size / 1e6:.2f} MB" for name, size in self.sizes.items()))
+        if self.counts:
+            lines.append("Counts: " + ", ".join(f"{count} {name}" for name, count in self.counts.items()))
+        return "\n".join(lines)
+
+
+def timed(timings: Timings | None, name: str) -> ContextManager:
+    """Get the context manager recording stage `name` in timings, or a no-op one if timings is None."""
+    if timings is None:
+        return nullcontext()
+    return timings.stage(name)
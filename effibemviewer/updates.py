@@ -0,0 +1,76 @@
+"""Diff converted GLTF data, to send only the changed surfaces to a viewer that is already displaying a model."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+
+from effibemviewer.gltf_buffers import accessor_bytes, decode_buffers, extract_nodes, world_matrices
+
+
+def _surface_key(node: dict) -> str:
+    """Get the key identifying a surface node across conversions: its model object handle, or else its name."""
+    extras = node.get("extras", {})
+    return extras.get("handle") or extras.get("name") or node.get("name", "")
+
+
+def surface_digests(gltf_data: dict) -> dict[str, tuple[int, str]]:
+    """Map the key of every surface to its node index and a digest of everything the viewer shows of it.
+
+    Surfaces are keyed by their model object handle (or else their name). The digest covers the world matrix, the
+    extras (which drive the colors and the info panel) and the vertex data.
+
+    Args:
+        gltf_data: GLTF JSON data, as returned by `model_to_gltf_json`
+
+    Returns:
+        dict: The `(node index, digest)` of each surface, by key
+    """
+    buffers = decode_buffers(gltf_data)
+    nodes = gltf_data.get("nodes", [])
+    digests = {}
+    for i, matrix in world_matrices(gltf_data).items():
+        node = nodes[i]
+        if "mesh" not in node:
+            continue
+        h = hashlib.sha1(json.dumps([matrix, node.get("extras", {})], sort_keys=True).encode())
+        for primitive in gltf_data["meshes"][node["mesh"]].get("primitives", []):
+            accessors = [primitive["attributes"][name] for name in sorted(primitive["attributes"])]
+            if "indices" in primitive:
+                accessors.append(primitive["indices"])
+            for accessor in accessors:
+                h.update(accessor_bytes(gltf_data, buffers, accessor))
+        digests[_surface_key(node)] = (i, h.hexdigest())
+    return digests
+
+
+def make_update(
+    previous: dict[str, tuple[int, str]], current: dict[str, tuple[int, str]], gltf_data: dict
+) -> tuple[dict | None, dict[str, int]]:
+    """Build the update that turns a viewer displaying the `previous` surfaces into one displaying `gltf_data`.
+
+    The update is applied by the JS `EffiBEMViewer.applyUpdate()`. It holds the keys of the surfaces to remove, and a
+    self-contained GLTF with only the added and changed surfaces. The added surfaces are removed first too, so that
+    applying an update to a viewer that already has them does not duplicate them.
+
+    Args:
+        previous: The surface digests of the displayed data, see `surface_digests`
+        current: The surface digests of gltf_data
+        gltf_data: The new GLTF JSON data
+
+    Returns:
+        tuple: The update (None if nothing changed), and the number of surfaces "added", "changed" and "removed"
+    """
+    added = [key for key in current if key not in previous]
+    changed = [key for key in current if key in previous and current[key][1] != previous[key][1]]
+    removed = [key for key in previous if key not in current]
+
+    counts = {"added": len(added), "changed": len(changed), "removed": len(removed)}
+    if not (added or changed or removed):
+        return None, counts
+    new_nodes = {current[key][0] for key in added + changed}
+    update = {
+        "remove": added + changed + removed,
+        "gltf": extract_nodes(gltf_data, decode_buffers(gltf_data), new_nodes) if new_nodes else None,
+    }
+    return update, counts
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""Tests for `effibemviewer` async conversion API."""
+
+import asyncio
+import threading
+
+import pytest
+
+from effibemviewer import (
+    ConversionPool,
+    ModelFilter,
+    async_model_to_gltf_html,
+    async_model_to_gltf_json,
+    async_osm_to_gltf_html,
+    async_osm_to_gltf_json,
+    create_example_model,
+    model_to_gltf_json,
+    warm_up_env,
+)
+from effibemviewer.gltf import get_env
+
+
+@pytest.fixture(scope="module")
+def example_model():
+    """Create an example OpenStudio model for testing."""
+    return create_example_model()
+
+
+@pytest.fixture(scope="module")
+def osm_path(tmp_path_factory, example_model):
+    """Save the example model to an OSM file."""
+    path = tmp_path_factory.mktemp("models") / "example_model.osm"
+    example_model.save(str(path), True)
+    return path
+
+
+def test_async_thread_pool(example_model):
+    """Test that the async conversions on a thread pool match the synchronous ones."""
+    model_filter = ModelFilter(stories=["Second Story"])
+
+    async def convert():
+        async with ConversionPool("thread", max_workers=2) as pool:
+            return await asyncio.gather(
+                async_model_to_gltf_json(example_model, pool=pool),
+                async_model_to_gltf_json(example_model, model_filter=model_filter, pool=pool),
+                async_model_to_gltf_html(example_model, pool=pool),
+            )
+
+    gltf_data, filtered, html = asyncio.run(convert())
+    assert gltf_data == model_to_gltf_json(example_model)
+    # The model object metadata of the filtered copies may be ordered differently
+    assert filtered["nodes"] == model_to_gltf_json(example_model, model_filter=model_filter)["nodes"]
+    assert html.startswith("<!DOCTYPE html>")
+
+
+def test_async_process_pool(example_model, osm_path):
+    """Test that models and model files are converted in worker processes."""
+
+    async def convert():
+        async with ConversionPool("process", max_workers=1) as pool:
+            return await asyncio.gather(
+                async_model_to_gltf_json(example_model, pool=pool),
+                async_osm_to_gltf_json(osm_path, pool=pool),
+                async_osm_to_gltf_html(osm_path, compress=True, pool=pool),
+            )
+
+    from_model, from_file, html = asyncio.run(convert())
+    expected = model_to_gltf_json(example_model)
+    # The model object metadata of the models loaded in the worker may be ordered differently
+    for gltf_data in (from_model, from_file):
+        assert gltf_data["nodes"] == expected["nodes"]
+        assert gltf_data["buffers"] == expected["buffers"]
+    assert "gzip-compressed GLB" in html
+
+
+def test_pool_concurrency_limit_and_cancellation():
+    """Test that at most max_concurrency calls run at once, and that a waiting call can be cancelled."""
+    release = threading.Event()
+    started = []
+
+    def work(i):
+        started.append(i)
+        release.wait(10)
+        return i
+
+    async def run():
+        pool = ConversionPool("thread", max_workers=4, max_concurrency=1)
+        try:
+            first = asyncio.ensure_future(pool.run(work, 1))
+            second = asyncio.ensure_future(pool.run(work, 2))
+            third = asyncio.ensure_future(pool.run(work, 3))
+            await asyncio.sleep(0.1)
+            assert started == [1]
+            second.cancel()
+            release.set()
+            assert await first == 1
+            assert await third == 3
+            with pytest.raises(asyncio.CancelledError):
+                await second
+        finally:
+            pool.close()
+
+    asyncio.run(run())
+    assert started == [1, 3]
+
+
+def test_pool_errors():
+    """Test that invalid pool settings are rejected, and that conversion errors are raised to the caller."""
+    with pytest.raises(ValueError, match="Unknown pool kind"):
+        ConversionPool("fiber")
+    with pytest.raises(ValueError, match="at least 1"):
+        ConversionPool(max_workers=-1)
+
+    async def convert():
+        async with ConversionPool("thread", max_workers=1) as pool:
+            await async_osm_to_gltf_json("missing.osm", pool=pool)
+
+    with pytest.raises(ValueError, match="Failed to load model"):
+        asyncio.run(convert())
+
+
+def test_warm_up_env():
+    """Test that warming up compiles all the templates of the shared environment."""
+    env = warm_up_env()
+    assert env is get_env()
+    assert len(env.cache) == len(env.list_templates())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""Tests for `effibemviewer` cache."""
+
+import os
+import subprocess
+import sys
+
+import openstudio
+import pytest
+
+from effibemviewer import GltfCache, create_example_model, model_to_gltf_json, osm_to_gltf_json
+
+
+@pytest.fixture
+def osm_path(tmp_path):
+    """Save an example OpenStudio model to a file for testing."""
+    path = tmp_path / "model.osm"
+    create_example_model().save(path, True)
+    return path
+
+
+def test_cache_roundtrip(tmp_path):
+    """Test that stored GLTF data is returned as-is, and that a missing key is a miss."""
+    cache = GltfCache(tmp_path / "cache")
+    data = {"asset": {"version": "2.0"}, "nodes": [{"name": "Surface 1"}]}
+    key = cache.make_key(b"model content")
+    assert cache.get(key) is None
+    cache.put(key, data)
+    assert cache.get(key) == data
+    assert cache.size() > 0
+
+
+def test_cache_key_depends_on_content_and_options():
+    """Test that the key changes with the model content and the geometry diagnostics flag."""
+    key = GltfCache.make_key(b"model content")
+    assert key == GltfCache.make_key(b"model content")
+    assert key != GltfCache.make_key(b"other model content")
+    assert key != GltfCache.make_key(b"model content", include_geometry_diagnostics=True)
+
+
+def test_cache_lru_eviction(tmp_path):
+    """Test that the least recently used entries are evicted once over max_size."""
+    cache = GltfCache(tmp_path / "cache", max_size=10**9)
+    keys = [cache.make_key(f"model {i}".encode()) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, {"nodes": [{"name": f"Surface {i}" * 100}]})
+        # Make sure the entries have distinct, increasing mtimes
+        os.utime(cache._path(key), (i, i))
+    entry_size = cache.entries()[0][1].st_size
+
+    # Use the oldest one, so the second one becomes the least recently used
+    assert cache.get(keys[0]) is not None
+    cache.max_size = 2 * entry_size + entry_size // 2
+    cache.evict()
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is not None
+
+
+def test_osm_to_gltf_json_cache_hit_skips_model_loading(osm_path, tmp_path, monkeypatch):
+    """Test that a cache hit returns the same data without loading the model."""
+    cache = GltfCache(tmp_path / "cache")
+    data = osm_to_gltf_json(osm_path, cache=cache)
+    assert len(cache.entries()) == 1
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("Model should not be loaded on a cache hit")
+
+    monkeypatch.setattr(openstudio.model.Model, "load", _fail)
+    assert osm_to_gltf_json(osm_path, cache=cache) == data
+
+
+def test_model_to_gltf_json_with_cache(tmp_path, monkeypatch):
+    """Test that model_to_gltf_json stores and reuses results when given a cache."""
+    cache = GltfCache(tmp_path / "cache")
+    model = create_example_model()
+    data = model_to_gltf_json(model, cache=cache)
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("Model should not be translated on a cache hit")
+
+    monkeypatch.setattr("effibemviewer.gltf._translate_model", _fail)
+    assert model_to_gltf_json(model, cache=cache) == data
+
+
+def test_cli_cache_dir(osm_path, tmp_path):
+    """Test that --cache-dir populates the cache, and --no-cache bypasses it."""
+    cache_dir = tmp_path / "cache"
+    output_file = tmp_path / "viewer.html"
+    base_cmd = [sys.executable, "-m", "effibemviewer", "-m", str(osm_path), "-o", str(output_file), "--embedded"]
+
+    result = subprocess.run([*base_cmd, "--no-cache"], capture_output=True, text=True)
+    assert result.returncode == 0
+    assert not cache_dir.exists()
+
+    # The translator assigns random colors to objects without a rendering color, so only a cache hit
+    # reproduces the exact same output
+    outputs = []
+    for _ in range(2):
+        result = subprocess.run([*base_cmd, "--cache-dir", str(cache_dir)], capture_output=True, text=True)
+        assert result.returncode == 0
+        assert len(list(cache_dir.glob("*.gltf.json.gz"))) == 1
+        outputs.append(output_file.read_text())
+    assert outputs[0] == outputs[1]
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""Tests for `effibemviewer` chunks."""
+
+import base64
+import gzip
+import json
+
+import pytest
+
+from effibemviewer import create_example_model, model_to_gltf_json, split_gltf_by_story, write_chunked_gltf
+from effibemviewer.gltf import generate_manifest_html
+
+
+@pytest.fixture(scope="module")
+def gltf_data():
+    """Convert an example OpenStudio model to GLTF JSON for testing."""
+    return model_to_gltf_json(create_example_model())
+
+
+def _surfaces(gltf_data):
+    """Map the surface names of a GLTF to the bytes of their positions and indices."""
+    buffer = base64.b64decode(gltf_data["buffers"][0]["uri"].split(",", 1)[1])
+
+    def read(accessor_index):
+        accessor = gltf_data["accessors"][accessor_index]
+        view = gltf_data["bufferViews"][accessor["bufferView"]]
+        start = view.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+        end = start + accessor["count"] * (12 if accessor["type"] == "VEC3" else 1)
+        return buffer[start:end]
+
+    surfaces = {}
+    for node in gltf_data["nodes"]:
+        if "mesh" in node:
+            (primitive,) = gltf_data["meshes"][node["mesh"]]["primitives"]
+            surfaces[node["name"]] = (read(primitive["attributes"]["POSITION"]), read(primitive["indices"]))
+    return surfaces
+
+
+def test_split_gltf_by_story(gltf_data):
+    """Test that every surface ends up in the chunk of its story, with the same geometry."""
+    chunks = split_gltf_by_story(gltf_data)
+    surfaces = _surfaces(gltf_data)
+    assert sum(chunk["surfaceCount"] for chunk in chunks) == len(surfaces)
+
+    chunk_surfaces = {}
+    for chunk in chunks:
+        nodes = [node for node in chunk["gltf"]["nodes"] if "mesh" in node]
+        assert len(nodes) == chunk["surfaceCount"]
+        assert {node["extras"].get("buildingStoryName", "") for node in nodes} == {chunk["story"]}
+        assert "modelObjectMetaData" not in chunk["gltf"]["scenes"][0]["extras"]
+        chunk_surfaces.update(_surfaces(chunk["gltf"]))
+    assert chunk_surfaces == surfaces
+
+    # Lowest story first, no story last
+    stories = [chunk["story"] for chunk in chunks]
+    assert stories[-1] == "" or "" not in stories
+    lows = [chunk["boundingBox"]["min"][1] for chunk in chunks if chunk["story"]]
+    assert lows == sorted(lows)
+
+
+def test_split_gltf_by_story_rejects_external_buffers(gltf_data):
+    """Test that only embedded buffers can be split."""
+    data = {**gltf_data, "buffers": [{"byteLength": 1, "uri": "model.bin"}]}
+    with pytest.raises(ValueError, match="not an embedded base64 data URI"):
+        split_gltf_by_story(data)
+
+
+@pytest.mark.parametrize("binary", [True, False])
+def test_write_chunked_gltf(gltf_data, tmp_path, binary):
+    """Test that the manifest lists the chunk files that were written, with the scene extras."""
+    manifest_path = write_chunked_gltf(gltf_data, tmp_path, stem="building", binary=binary)
+    assert manifest_path == tmp_path / "building.manifest.json"
+    manifest = json.loads(manifest_path.read_text())
+    assert manifest["scene"]["extras"] == gltf_data["scenes"][0]["extras"]
+    assert manifest["chunks"]
+    for chunk in manifest["chunks"]:
+        path = tmp_path / chunk["uri"]
+        assert path.suffix == (".glb" if binary else ".gltf")
+        content = path.read_bytes()
+        assert content[:4] == b"glTF" if binary else json.loads(content)["asset"]
+
+
+def test_write_chunked_gltf_compressed(gltf_data, tmp_path):
+    """Test that compressed chunks are gzip-compressed GLB files, listed with their .glb.gz name."""
+    manifest_path = write_chunked_gltf(gltf_data, tmp_path, stem="building", compress=True)
+    manifest = json.loads(manifest_path.read_text())
+    assert manifest["chunks"]
+    for chunk in manifest["chunks"]:
+        assert chunk["uri"].endswith(".glb.gz")
+        assert gzip.decompress((tmp_path / chunk["uri"]).read_bytes())[:4] == b"glTF"
+
+
+def test_generate_manifest_html():
+    """Test that the manifest page loads the manifest instead of embedding data."""
+    html = generate_manifest_html("./building.manifest.json", viewer_options={"chunkLoading": "onDemand"})
+    assert 'viewer.loadFromManifest("./building.manifest.json");' in html
+    assert '...{"chunkLoading": "onDemand"}' in html
+    assert "loadFromManifest(url) {" in html
@@ -1,9 +1,15 @@
 #!/usr/bin/env python
 """Tests for `effibemviewer` CLI."""
 
+import gzip
+import json
 import subprocess
 import sys
 
+import pytest
+
+from effibemviewer import decode_string_table
+
 
 def test_cli_cdn_flag_produces_cdn_urls(tmp_path):
     """Test that --cdn flag produces HTML with CDN URLs."""
@@ -46,3 +52,195 @@ def test_cli_cdn_does_not_generate_local_files(tmp_path):
     # Should not generate local JS/CSS files when using CDN
     assert not (tmp_path / "effibemviewer.js").exists()
     assert not (tmp_path / "effibemviewer.css").exists()
+
+
+def test_cli_glb_format(tmp_path):
+    """Test that --format glb writes a binary GLB file and no JS/CSS library."""
+    output_file = tmp_path / "model.html"
+    result = subprocess.run(
+        [sys.executable, "-m", "effibemviewer", "--format", "glb", "-o", str(output_file)],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0
+    glb_file = tmp_path / "model.glb"
+    assert glb_file.exists()
+    assert not output_file.exists()
+    assert glb_file.read_bytes()[:4] == b"glTF"
+    assert not (tmp_path / "effibemviewer.js").exists()
+
+
+def test_cli_batch_keeps_going_past_failures(tmp_path):
+    """Test that the batch subcommand converts a directory in parallel and reports per-file failures."""
+    from effibemviewer import create_example_model
+
+    models_dir = tmp_path / "models"
+    models_dir.mkdir()
+    model = create_example_model()
+    model.save(models_dir / "variant_1.osm", True)
+    model.save(models_dir / "variant_2.osm", True)
+    (models_dir / "broken.osm").write_text("Not an OpenStudio model")
+
+    output_dir = tmp_path / "out"
+    result = subprocess.run(
+        [sys.executable, "-m", "effibemviewer", "batch", str(models_dir), "-o", str(output_dir), "--jobs", "2"],
+        capture_output=True,
+        text=True,
+    )
+    # One failure means a non-zero exit code, but the other models are still converted
+    assert result.returncode == 1
+    assert (output_dir / "variant_1.html").exists()
+    assert (output_dir / "variant_2.html").exists()
+    assert not (output_dir / "broken.html").exists()
+    # Shared assets are written once
+    assert (output_dir / "effibemviewer.js").exists()
+    assert (output_dir / "effibemviewer.css").exists()
+    assert "Failed: " in result.stderr
+    assert "Converted 2/3 models" in result.stdout
+
+
+def test_cli_batch_names_models_with_the_same_file_name(tmp_path):
+    """Test that the batch subcommand prefixes the outputs of models that share a file name with their directory."""
+    from effibemviewer import create_example_model
+
+    model = create_example_model()
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        model.save(tmp_path / name / "model.osm", True)
+
+    output_dir = tmp_path / "out"
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "effibemviewer",
+            "batch",
+            str(tmp_path / "a"),
+            str(tmp_path / "b"),
+            str(tmp_path / "a" / "model.osm"),
+            "-o",
+            str(output_dir),
+            "--jobs",
+            "1",
+        ],
+        capture_output=True,
+        text=True,
+    )
+    # The model listed twice is a failure, the others are converted
+    assert result.returncode == 1
+    assert (output_dir / "a__model.html").exists()
+    assert (output_dir / "b__model.html").exists()
+    assert not (output_dir / "model.html").exists()
+    assert "Converted 2/3 models" in result.stdout
+
+
+def test_cli_chunked_html(tmp_path):
+    """Test that --chunked writes the story chunks, the manifest and a page loading the manifest."""
+    output_file = tmp_path / "model.html"
+    result = subprocess.run(
+        [sys.executable, "-m", "effibemviewer", "--chunked", "-o", str(output_file)],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0
+    assert (tmp_path / "model.manifest.json").exists()
+    assert list(tmp_path.glob("model.story-*.glb"))
+    assert 'loadFromManifest("./model.manifest.json")' in output_file.read_text()
+
+
+def test_cli_chunked_compress(tmp_path):
+    """Test that --compress with --chunked writes gzip-compressed story chunks."""
+    output_file = tmp_path / "model.html"
+    result = subprocess.run(
+        [sys.executable, "-m", "effibemviewer", "--chunked", "--compress", "-o", str(output_file)],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0
+    assert not list(tmp_path.glob("model.story-*.glb"))
+    chunks = list(tmp_path.glob("model.story-*.glb.gz"))
+    assert chunks
+    assert gzip.decompress(chunks[0].read_bytes())[:4] == b"glTF"
+
+
+def test_cli_profile_json(tmp_path):
+    """Test that --profile reports the conversion stages, and --profile-json writes them."""
+    output_file = tmp_path / "model.html"
+    profile_file = tmp_path / "profile.json"
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "effibemviewer",
+            "-o",
+            str(output_file),
+            "--profile",
+            "--profile-json",
+            str(profile_file),
+        ],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0
+    assert "translate" in result.stderr
+    profile = json.loads(profile_file.read_text())
+    assert profile["sizes"]["html"] == output_file.stat().st_size
+    assert profile["total_seconds"] > 0
+
+
+def test_cli_compressed_glb(tmp_path):
+    """Test that --compress with --format glb writes a gzip-compressed .glb.gz file."""
+    output_file = tmp_path / "model.html"
+    result = subprocess.run(
+        [sys.executable, "-m", "effibemviewer", "--format", "glb", "--compress", "-o", str(output_file)],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0
+    assert gzip.decompress((tmp_path / "model.glb.gz").read_bytes())[:4] == b"glTF"
+    assert not (tmp_path / "model.glb").exists()
+
+
+def test_cli_string_table(tmp_path):
+    """Test that --string-table writes the surface metadata as indices into the scene string table."""
+    output_file = tmp_path / "model.html"
+    result = subprocess.run(
+        [sys.executable, "-m", "effibemviewer", "--format", "gltf", "--string-table", "-o", str(output_file)],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0
+    gltf_data = json.loads((tmp_path / "model.gltf").read_text())
+    assert "stringTable" in gltf_data["scenes"][0]["extras"]
+    assert isinstance(next(node for node in gltf_data["nodes"] if "mesh" in node)["extras"]["surfaceType"], int)
+    # The example model GLTF is written without the string table
+    assert decode_string_table(gltf_data) == json.loads((tmp_path / "example_model.gltf").read_text())
+
+
+def test_cli_quantize(tmp_path):
+    """Test that --quantize writes int16 positions with the KHR_mesh_quantization extension."""
+    pytest.importorskip("numpy")
+    output_file = tmp_path / "model.html"
+    result = subprocess.run(
+        [sys.executable, "-m", "effibemviewer", "--format", "gltf", "--quantize", "-o", str(output_file)],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0
+    gltf_data = json.loads((tmp_path / "model.gltf").read_text())
+    assert gltf_data["extensionsRequired"] == ["KHR_mesh_quantization"]
+    assert {accessor["componentType"] for accessor in gltf_data["accessors"] if accessor["type"] == "VEC3"} == {5122}
+
+
+def test_cli_filter(tmp_path):
+    """Test that --story only converts the surfaces of that story."""
+    output_file = tmp_path / "model.html"
+    result = subprocess.run(
+        [sys.executable, "-m", "effibemviewer", "--format", "gltf", "--story", "Second Story", "-o", str(output_file)],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0
+    gltf_data = json.loads((tmp_path / "model.gltf").read_text())
+    stories = {node["extras"]["buildingStoryName"] for node in gltf_data["nodes"] if "mesh" in node}
+    assert stories == {"Second Story"}
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""Tests for `effibemviewer` geometry diagnostics computed with NumPy."""
+
+import openstudio
+import pytest
+
+from effibemviewer import ModelFilter, Timings, create_example_model, create_parametric_model, model_to_gltf_json
+from effibemviewer.diagnostics import DIAGNOSTIC_KEYS, add_geometry_diagnostics, compute_geometry_diagnostics
+
+pytest.importorskip("numpy")
+
+
+def _openstudio_diagnostics(model) -> dict:
+    """The diagnostics computed by OpenStudio, one surface and one space at a time.
+
+    OpenStudio's convexity of an open space depends on the order of its surfaces, which varies from run to run, so it
+    is None for the surfaces of open spaces.
+    """
+    expected = {
+        str(surface.handle()).strip("{}"): dict(zip(DIAGNOSTIC_KEYS, (surface.isConvex(), True, True, True)))
+        for surface in model.getPlanarSurfaces()
+    }
+    for space in model.getSpaces():
+        incorrect = {str(s.handle()).strip("{}") for s in space.findSurfacesWithIncorrectOrientation()}
+        space_enclosed = space.isEnclosedVolume()
+        space_convex = space.isConvex() if space_enclosed else None
+        for surface in space.surfaces():
+            handle = str(surface.handle()).strip("{}")
+            expected[handle].update(
+                correctlyOriented=handle not in incorrect, spaceConvex=space_convex, spaceEnclosed=space_enclosed
+            )
+    return expected
+
+
+def _space_from_floor_print(model, points):
+    floor_print = [openstudio.Point3d(x, y, 0) for x, y in points]
+    return openstudio.model.Space.fromFloorPrint(floor_print, 3.0, model).get()
+
+
+def test_diagnostics_match_openstudio():
+    """Test that the diagnostics match OpenStudio's, on valid and broken geometry."""
+    model = create_example_model()
+    flipped = model.getSurfaceByName("Surface 2").get()
+    flipped.setVertices(list(reversed(flipped.vertices())))
+    # Space 3 without its roof (OpenStudio reports spaces without floors as non-convex)
+    model.getSurfaceByName("Surface 18").get().remove()
+    # An L-shaped space: non-convex floor, roof and space
+    _space_from_floor_print(model, [(0, 10), (5, 10), (5, 5), (10, 5), (10, 0), (0, 0)])
+
+    diagnostics = compute_geometry_diagnostics(model)
+    expected = _openstudio_diagnostics(model)
+    assert diagnostics.keys() == expected.keys()
+    for handle, values in expected.items():
+        assert diagnostics[handle] == {
+            key: diagnostics[handle][key] if value is None else value for key, value in values.items()
+        }
+    assert not diagnostics[str(flipped.handle()).strip("{}")]["correctlyOriented"]
+    assert {tuple(values.values()) for values in diagnostics.values()} >= {
+        (True, True, True, False),
+        (False, True, False, True),
+    }
+
+
+def test_diagnostics_split_edges():
+    """Test that a space is enclosed when a wall is split in two along the edge of a single floor."""
+    model = openstudio.model.Model()
+    space = _space_from_floor_print(model, [(0, 10), (10, 10), (10, 0), (0, 0)])
+    wall = next(s for s in space.surfaces() if s.surfaceType() == "Wall" and max(v.y() for v in s.vertices()) < 1e-6)
+    wall.remove()
+    for x0, x1 in ((0, 5), (5, 10)):
+        corners = [(x1, 3), (x0, 3), (x0, 0), (x1, 0)]
+        openstudio.model.Surface([openstudio.Point3d(x, 0, z) for x, z in corners], model).setSpace(space)
+
+    diagnostics = compute_geometry_diagnostics(model)
+    assert len(diagnostics) == 7
+    assert all(values == dict.fromkeys(DIAGNOSTIC_KEYS, True) for values in diagnostics.values())
+
+
+def test_diagnostics_in_gltf():
+    """Test that the diagnostics are added to the surface extras, computed from the unfiltered model."""
+    model = create_parametric_model(num_stories=1, spaces_per_story=2, windows_per_wall=1)
+    timings = Timings()
+    gltf_data = model_to_gltf_json(model, include_geometry_diagnostics=True, timings=timings)
+    surfaces = [node["extras"] for node in gltf_data["nodes"] if "mesh" in node]
+    assert surfaces
+    assert all(extras[key] is True for extras in surfaces for key in DIAGNOSTIC_KEYS)
+    if not callable(getattr(openstudio.gltf.GltfForwardTranslator, "setIncludeGeometryDiagnostics", None)):
+        assert "diagnostics" in timings.stages
+
+    # The spaces of the walls are still enclosed without their floors and roofs
+    walls = model_to_gltf_json(
+        model, include_geometry_diagnostics=True, model_filter=ModelFilter(surface_types=["Wall"])
+    )
+    wall_extras = [node["extras"] for node in walls["nodes"] if "mesh" in node]
+    assert {extras["surfaceType"] for extras in wall_extras} == {"Wall"}
+    assert all(extras["spaceEnclosed"] for extras in wall_extras)
+
+    data = {"nodes": [{"mesh": 0, "extras": {"handle": "a"}}, {"mesh": 1, "extras": {"handle": "b"}}]}
+    assert add_geometry_diagnostics(data, {"a": {"convex": False}})["nodes"][0]["extras"] == {
+        "handle": "a",
+        "convex": False,
+    }
+    assert data["nodes"][0]["extras"] == {"handle": "a"}
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""Tests for `effibemviewer` model filters."""
+
+from collections import Counter
+
+import pytest
+
+from effibemviewer import (
+    GltfCache,
+    ModelFilter,
+    Timings,
+    create_example_model,
+    create_parametric_model,
+    model_to_gltf_json,
+)
+
+
+def _surface_extras(gltf_data: dict) -> list[dict]:
+    return [node["extras"] for node in gltf_data["nodes"] if "mesh" in node]
+
+
+@pytest.fixture(scope="module")
+def example_model():
+    """Create an example OpenStudio model for testing."""
+    return create_example_model()
+
+
+@pytest.fixture(scope="module")
+def parametric_model():
+    """Create a parametric OpenStudio model, with windows and shading, for testing."""
+    return create_parametric_model(num_stories=1, spaces_per_story=2, windows_per_wall=1, shading=True)
+
+
+def test_filter_story(example_model):
+    """Test that only the surfaces of the selected story are converted, and that the model is left unmodified."""
+    n_surfaces = len(example_model.getSurfaces())
+    full = _surface_extras(model_to_gltf_json(example_model))
+    timings = Timings()
+    filtered = _surface_extras(
+        model_to_gltf_json(example_model, timings=timings, model_filter=ModelFilter(stories=["Second Story"]))
+    )
+
+    assert len(example_model.getSurfaces()) == n_surfaces
+    assert "filter" in timings.stages
+    assert filtered
+    assert {extras["buildingStoryName"] for extras in filtered} == {"Second Story"}
+    assert len(filtered) == sum(1 for extras in full if extras.get("buildingStoryName") == "Second Story")
+
+
+def test_filter_space_and_thermal_zone(example_model):
+    """Test that the criteria are combined: a surface must match all of them."""
+    spaces = _surface_extras(model_to_gltf_json(example_model, model_filter=ModelFilter(spaces="Space Level 2")))
+    assert {extras["spaceName"] for extras in spaces} == {"Space Level 2"}
+
+    zone = ModelFilter(thermal_zones=["Thermal Zone 1"], stories=["Building Story 1"])
+    zones = _surface_extras(model_to_gltf_json(example_model, model_filter=zone))
+    assert zones
+    assert {extras["thermalZoneName"] for extras in zones} == {"Thermal Zone 1"}
+    assert {extras["buildingStoryName"] for extras in zones} == {"Building Story 1"}
+
+
+def test_filter_surface_types(parametric_model):
+    """Test that sub surfaces are kept without their base surfaces, and that shading can be dropped."""
+    full = Counter(extras["surfaceType"] for extras in _surface_extras(model_to_gltf_json(parametric_model)))
+    assert full["FixedWindow"] and full["SpaceShading"]
+
+    windows = model_to_gltf_json(parametric_model, model_filter=ModelFilter(surface_types=["FixedWindow"]))
+    assert Counter(extras["surfaceType"] for extras in _surface_extras(windows)) == {"FixedWindow": full["FixedWindow"]}
+    assert "modelObjectMetaData" in windows["scenes"][0]["extras"]
+
+    no_shading = model_to_gltf_json(parametric_model, model_filter=ModelFilter(include_shading=False))
+    assert Counter(extras["surfaceType"] for extras in _surface_extras(no_shading)) == {
+        surface_type: count for surface_type, count in full.items() if not surface_type.endswith("Shading")
+    }
+
+
+def test_filter_errors_and_cache_key():
+    """Test that unknown surface types are rejected, and that the filter is part of the cache key."""
+    with pytest.raises(ValueError, match="Unknown surface types"):
+        ModelFilter(surface_types=["Window"])
+
+    assert ModelFilter(stories=["A", "B"]).cache_key() == ModelFilter(stories=["B", "A"]).cache_key()
+    keys = {
+        GltfCache.make_key(b"model"),
+        GltfCache.make_key(b"model", model_filter=ModelFilter(stories=["A"])),
+        GltfCache.make_key(b"model", model_filter=ModelFilter(spaces=["A"])),
+    }
+    assert len(keys) == 3
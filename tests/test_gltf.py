@@ -1,11 +1,38 @@
 #!/usr/bin/env python
 """Tests for `effibemviewer` gltf."""
 
+import base64
+import gzip
+import importlib.util
+import io
+import json
+import re
+import struct
+
 import openstudio
 import pytest
 
-from effibemviewer import create_example_model
-from effibemviewer.gltf import generate_loader_html, get_js_library, model_to_gltf_html
+from effibemviewer import (
+    GltfCache,
+    ModelFilter,
+    Timings,
+    create_example_model,
+    create_parametric_model,
+    split_gltf_by_story,
+)
+from effibemviewer.gltf import (
+    QUANTIZATION_EXTENSION,
+    compress_gltf_json,
+    generate_loader_html,
+    get_js_library,
+    gltf_json_to_glb,
+    gltf_json_to_html,
+    model_to_glb,
+    model_to_gltf_html,
+    model_to_gltf_json,
+    optimize_gltf_json,
+    write_gltf_html,
+)
 
 
 @pytest.fixture
@@ -19,6 +46,232 @@ def test_create_example_model(model):
     assert isinstance(model, openstudio.model.Model)
 
 
+def test_create_parametric_model():
+    """Test the size of a synthetic model, and that its adjacent surfaces are matched."""
+    model = create_parametric_model(num_stories=2, spaces_per_story=4, windows_per_wall=2, shading=True)
+    assert len(model.getBuildingStorys()) == 2
+    assert len(model.getSpaces()) == 8
+    assert len(model.getThermalZones()) == 8
+    # 2x2 spaces per story: 2 exterior walls per space, and 2 (resp. 1) matched walls (resp. floor or roof)
+    boundary_conditions = [surface.outsideBoundaryCondition() for surface in model.getSurfaces()]
+    assert boundary_conditions.count("Outdoors") == 8 * 2 + 4
+    assert boundary_conditions.count("Ground") == 4
+    assert boundary_conditions.count("Surface") == 8 * 3
+    assert len(model.getSubSurfaces()) == 8 * 2 * 2
+    assert len(model.getShadingSurfaces()) == len(model.getSubSurfaces())
+
+    gltf_data = model_to_gltf_json(model)
+    assert len([node for node in gltf_data["nodes"] if "mesh" in node]) == 48 + 32 + 32
+
+
+def test_create_parametric_model_invalid():
+    """Test that a synthetic model needs at least one space."""
+    with pytest.raises(ValueError, match="spaces_per_story"):
+        create_parametric_model(spaces_per_story=0)
+
+
+class TestGLB:
+    """Tests for the binary GLB output."""
+
+    def test_glb_header_and_chunks(self, model):
+        """Test that the GLB has a valid header, a JSON chunk and a BIN chunk."""
+        glb = model_to_glb(model)
+        magic, version, length = struct.unpack_from("<III", glb, 0)
+        assert magic == 0x46546C67
+        assert version == 2
+        assert length == len(glb)
+
+        json_length, json_type = struct.unpack_from("<II", glb, 12)
+        assert json_type == 0x4E4F534A
+        assert json_length % 4 == 0
+        bin_offset = 20 + json_length
+        data = json.loads(glb[20:bin_offset])
+
+        bin_length, bin_type = struct.unpack_from("<II", glb, bin_offset)
+        assert bin_type == 0x004E4942
+        assert bin_offset + 8 + bin_length == len(glb)
+        assert data["buffers"] == [{"byteLength": bin_length}]
+
+    def test_glb_binary_matches_gltf_buffers(self, model):
+        """Test that the BIN chunk holds the raw bytes of the GLTF base64 buffer, with no data URI left."""
+        gltf_data = model_to_gltf_json(model)
+        glb = model_to_glb(model)
+        (json_length,) = struct.unpack_from("<I", glb, 12)
+        bin_offset = 20 + json_length
+        data = json.loads(glb[20:bin_offset])
+        assert "uri" not in json.dumps(data["buffers"])
+        assert data["nodes"] == gltf_data["nodes"]
+
+        raw = base64.b64decode(gltf_data["buffers"][0]["uri"].split(",", 1)[1])
+        bin_start = bin_offset + 8
+        bin_end = bin_start + len(raw)
+        assert glb[bin_start:bin_end] == raw
+
+    def test_glb_options(self, model, tmp_path):
+        """Test that the cache, timings and filter options are forwarded to the GLTF conversion."""
+        model_filter = ModelFilter(stories=["Second Story"])
+        cache = GltfCache(tmp_path / "cache")
+        timings = Timings()
+        glb = model_to_glb(model, cache=cache, timings=timings, model_filter=model_filter)
+        (json_length,) = struct.unpack_from("<I", glb, 12)
+        bin_offset = 20 + json_length
+        nodes = json.loads(glb[20:bin_offset])["nodes"]
+        stories = {node["extras"]["buildingStoryName"] for node in nodes if "mesh" in node}
+        assert stories == {"Second Story"}
+        assert {"filter", "cache_store", "glb_pack"} <= set(timings.stages)
+
+        timings = Timings()
+        assert model_to_glb(model, cache=cache, timings=timings, model_filter=model_filter) == glb
+        assert "filter" not in timings.stages
+
+
+class TestCompressedPayload:
+    """Tests for the gzip-compressed model data."""
+
+    def test_compress_gltf_json(self, model):
+        """Test that the compressed data decompresses to the GLB, or to the GLTF JSON."""
+        gltf_data = model_to_gltf_json(model)
+        assert gzip.decompress(compress_gltf_json(gltf_data)) == gltf_json_to_glb(gltf_data)
+        assert json.loads(gzip.decompress(compress_gltf_json(gltf_data, binary=False))) == gltf_data
+        # Deterministic output
+        assert compress_gltf_json(gltf_data) == compress_gltf_json(gltf_data)
+
+    def test_compressed_html_payload(self, model):
+        """Test that the compressed page embeds the base64 gzip GLB, loaded as an ArrayBuffer, and is much smaller."""
+        gltf_data = model_to_gltf_json(model)
+        html = gltf_json_to_html(gltf_data, embedded=False)
+        compressed_html = gltf_json_to_html(gltf_data, embedded=False, compress=True)
+        assert len(compressed_html) * 4 < len(html)
+
+        match = re.search(r'atob\("([A-Za-z0-9+/=]+)"\)', compressed_html)
+        assert match
+        assert gzip.decompress(base64.b64decode(match.group(1))) == gltf_json_to_glb(gltf_data)
+        assert "viewer.loadFromArrayBuffer(gltfData);" in compressed_html
+        assert "viewer.loadFromJSON(gltfData);" not in compressed_html
+
+    def test_viewer_decompresses_gzip(self):
+        """Test that the JS library decompresses gzip data with DecompressionStream."""
+        js = get_js_library()
+        assert "new DecompressionStream('gzip')" in js
+        assert "this._decompress(data)" in js
+
+
+def _surface_triangles(gltf_data):
+    """Get the world-space triangles (an array of shape (n, 3, 3)) and the normals, if any, of each surface node."""
+    np = pytest.importorskip("numpy")
+    from effibemviewer.gltf_buffers import accessor_bytes, decode_buffers, world_matrices
+
+    buffers = decode_buffers(gltf_data)
+
+    def read(accessor_index):
+        accessor = gltf_data["accessors"][accessor_index]
+        dtype = {5121: "<u1", 5122: "<i2", 5123: "<u2", 5125: "<u4", 5126: "<f4"}[accessor["componentType"]]
+        components = {"SCALAR": 1, "VEC3": 3}[accessor["type"]]
+        view = gltf_data["bufferViews"][accessor["bufferView"]]
+        stride = view.get("byteStride", np.dtype(dtype).itemsize * components)
+        data = accessor_bytes(gltf_data, buffers, accessor_index) + b"\x00" * stride
+        values = np.ndarray((accessor["count"], components), dtype, data, strides=(stride, np.dtype(dtype).itemsize))
+        return values / 32767 if accessor.get("normalized") else values.astype(float)
+
+    surfaces = {}
+    for i, matrix in world_matrices(gltf_data).items():
+        node = gltf_data["nodes"][i]
+        if "mesh" not in node:
+            continue
+        (primitive,) = gltf_data["meshes"][node["mesh"]]["primitives"]
+        positions = read(primitive["attributes"]["POSITION"])
+        world = positions @ np.array(matrix).reshape(4, 4)[:3, :3] + np.array(matrix[12:15])
+        indices = read(primitive["indices"])[:, 0].astype(int)
+        normals = read(primitive["attributes"]["NORMAL"]) if "NORMAL" in primitive["attributes"] else None
+        surfaces[node["name"]] = (world[indices].reshape(-1, 3, 3), positions[indices].reshape(-1, 3, 3), normals)
+    return surfaces
+
+
+class TestOptimize:
+    """Tests for the vertex welding / normal dropping / quantization pass."""
+
+    @pytest.mark.parametrize("quantize", [False, True])
+    def test_optimize_keeps_the_geometry(self, model, quantize):
+        """Test that every surface keeps the same triangles, in the same order, and that the buffers shrink."""
+        np = pytest.importorskip("numpy")
+        gltf_data = model_to_gltf_json(model)
+        original = json.loads(json.dumps(gltf_data))
+        optimized = optimize_gltf_json(gltf_data, quantize=quantize)
+        assert gltf_data == original
+
+        surfaces = _surface_triangles(gltf_data)
+        optimized_surfaces = _surface_triangles(optimized)
+        assert optimized_surfaces.keys() == surfaces.keys()
+        for name, (triangles, _, _) in surfaces.items():
+            assert np.allclose(optimized_surfaces[name][0], triangles, atol=1e-3 if quantize else 1e-6)
+        assert optimized["buffers"][0]["byteLength"] < gltf_data["buffers"][0]["byteLength"] * (
+            0.4 if quantize else 0.6
+        )
+        assert (QUANTIZATION_EXTENSION in optimized.get("extensionsRequired", [])) == quantize
+        # The optimized data still goes through the GLB packing and story splitting
+        assert gltf_json_to_glb(optimized)[:4] == b"glTF"
+        for chunk, optimized_chunk in zip(split_gltf_by_story(gltf_data), split_gltf_by_story(optimized)):
+            assert optimized_chunk["story"] == chunk["story"]
+            for bound in ("min", "max"):
+                assert np.allclose(optimized_chunk["boundingBox"][bound], chunk["boundingBox"][bound], atol=1e-3)
+
+    def test_planar_normals_follow_the_winding(self, model):
+        """Test that the dropped normals are the ones the viewer computes from the triangles winding."""
+        np = pytest.importorskip("numpy")
+        gltf_data = model_to_gltf_json(model)
+        optimized = optimize_gltf_json(gltf_data)
+        assert not any("NORMAL" in mesh["primitives"][0]["attributes"] for mesh in optimized["meshes"])
+        assert (
+            "NORMAL"
+            in optimize_gltf_json(gltf_data, drop_planar_normals=False)["meshes"][0]["primitives"][0]["attributes"]
+        )
+
+        for _, local_triangles, normals in _surface_triangles(gltf_data).values():
+            cross = np.cross(
+                local_triangles[:, 1] - local_triangles[:, 0], local_triangles[:, 2] - local_triangles[:, 0]
+            )
+            lengths = np.linalg.norm(cross, axis=1)
+            computed = cross[lengths > 1e-9] / lengths[lengths > 1e-9, None]
+            assert np.allclose(computed, normals[0], atol=1e-4)
+
+    def test_optimize_rejects_unsupported_geometry(self, model):
+        """Test that non-triangle primitives are rejected."""
+        pytest.importorskip("numpy")
+        gltf_data = model_to_gltf_json(model)
+        gltf_data["meshes"][0]["primitives"][0]["mode"] = 1
+        with pytest.raises(ValueError, match="indexed triangles"):
+            optimize_gltf_json(gltf_data)
+
+
+class TestStreamingHTML:
+    """Tests for the streaming HTML writer."""
+
+    @pytest.mark.parametrize("pretty_json", [False, True])
+    def test_write_gltf_html_matches_model_to_gltf_html(self, model, pretty_json):
+        """Test that streaming to a file object produces the same HTML as model_to_gltf_html."""
+        html = model_to_gltf_html(model, pretty_json=pretty_json)
+        buffer = io.StringIO()
+        write_gltf_html(model, buffer, pretty_json=pretty_json)
+        assert buffer.getvalue() == html
+
+    def test_write_gltf_html_to_path(self, model, tmp_path):
+        """Test that write_gltf_html accepts an output path."""
+        html = model_to_gltf_html(model, embedded=False)
+        output_file = tmp_path / "viewer.html"
+        write_gltf_html(model, output_file, embedded=False)
+        assert output_file.read_text() == html
+
+    def test_streamed_json_is_html_safe(self, model):
+        """Test that characters that could close the <script> tag are escaped, like the tojson filter does."""
+        space = model.getSpaceByName("Space 1").get()
+        space.setName("</script><b>Space & 'Co'")
+        buffer = io.StringIO()
+        write_gltf_html(model, buffer)
+        html = buffer.getvalue()
+        assert "</script><b>Space" not in html
+        assert "\\u003c/script\\u003e\\u003cb\\u003eSpace \\u0026 \\u0027Co\\u0027" in html
+
+
 class TestJSAPI:
     """Tests for the JavaScript API exposed by the viewer."""
 
@@ -44,6 +297,41 @@ class TestJSAPI:
         assert "loadFromJSON(gltfData)" in html
         assert "loadFromFile(url)" in html
 
+    def test_load_from_array_buffer_exposed(self, model):
+        """Test that binary loading is exposed and GLTF data is not re-stringified before parsing."""
+        html = model_to_gltf_html(model)
+        assert "loadFromArrayBuffer(buffer)" in html
+        assert "response.arrayBuffer()" in html
+        assert "readAsArrayBuffer(file)" in html
+        assert "JSON.stringify(gltfData)" not in html
+
+    def test_set_filter_exposed(self, model):
+        """Test that filters can be driven programmatically, and controls go through setFilter."""
+        html = model_to_gltf_html(model)
+        assert "setFilter(name, value)" in html
+        assert "getFilters()" in html
+        assert "this.setFilter(name, control.type === 'checkbox' ? control.checked : control.value)" in html
+
+    def test_worker_offload_and_progress(self, model):
+        """Test that GLTF preparation and edge extraction can run in a Web Worker, with progress reporting."""
+        html = model_to_gltf_html(model)
+        assert "function prepareGLTF(data, onProgress)" in html
+        assert "self.onmessage = gltfWorkerOnMessage;" in html
+        assert "new Worker(" in html
+        assert "useWorker: options.useWorker ?? true" in html
+        assert "new CustomEvent('loadprogress'" in html
+        assert "new THREE.EdgesGeometry(obj.geometry)" in html  # Fallback only
+
+        loader_html = generate_loader_html()
+        assert "addEventListener('loadprogress'" in loader_html
+
+    def test_shared_material_pool(self, model):
+        """Test that surface materials come from a pool shared by color, and render modes swap precomputed tables."""
+        html = model_to_gltf_html(model)
+        assert "_getMaterial(color, side)" in html
+        assert "_getRenderModeTable(renderMode)" in html
+        assert "material.color.setHex" not in html
+
     def test_diagnostics_toggle_via_css_class(self, model):
         """Test that diagnostics are toggled via CSS class, not Jinja conditionals."""
         # With diagnostics disabled
@@ -51,11 +339,11 @@ class TestJSAPI:
         assert "diagnostics-section" in html_no_diag  # HTML always present
         assert "includeGeometryDiagnostics: false" in html_no_diag
 
-        # With diagnostics enabled (skip if not supported by OpenStudio version)
+        # With diagnostics enabled (computed with NumPy if not supported by the OpenStudio version)
         has_diag_support = callable(
             getattr(openstudio.gltf.GltfForwardTranslator, "setIncludeGeometryDiagnostics", None)
         )
-        if has_diag_support:
+        if has_diag_support or importlib.util.find_spec("numpy") is not None:
             html_with_diag = model_to_gltf_html(model, include_geometry_diagnostics=True)
             assert "diagnostics-section" in html_with_diag
             assert "includeGeometryDiagnostics: true" in html_with_diag
@@ -74,6 +362,55 @@ class TestJSAPI:
         assert "window.runFromFileObject" in html
         assert "FileReader" in html
 
+    def test_merged_geometry_option(self, model):
+        """Test that viewer_options are passed to the EffiBEMViewer constructor, and merged mode is available."""
+        html = model_to_gltf_html(model)
+        assert "class MergedSurfaces" in html
+        assert "mergedGeometry" in html
+        assert "includeGeometryDiagnostics: false };" in html
+
+        html = model_to_gltf_html(model, viewer_options={"mergedGeometry": True})
+        assert 'includeGeometryDiagnostics: false, ...{"mergedGeometry": true} };' in html
+
+        loader_html = generate_loader_html(viewer_options={"mergedGeometry": True})
+        assert '...{"mergedGeometry": true}' in loader_html
+
+    def test_picking_uses_spatial_index(self, model):
+        """Test that picking goes through the BVH instead of raycasting every mesh, and hover mode is available."""
+        html = model_to_gltf_html(model, viewer_options={"hoverHighlight": True})
+        assert "class SurfaceBVH" in html
+        assert "bvh.raycast(" in html
+        assert "intersectObjects" not in html
+        assert "hoverHighlight: options.hoverHighlight" in html
+        assert 'includeGeometryDiagnostics: false, ...{"hoverHighlight": true} };' in html
+
+    def test_stats_api_and_overlay(self, model):
+        """Test that getStats() is exposed, and the stats overlay can be enabled with the showStats option."""
+        html = model_to_gltf_html(model, viewer_options={"showStats": True})
+        assert "getStats() {" in html
+        assert "this.renderer.info" in html
+        assert "showStats: options.showStats" in html
+        assert ".effibem-viewer .stats-overlay" in html
+        assert 'includeGeometryDiagnostics: false, ...{"showStats": true} };' in html
+
+    def test_shared_renderer_option(self, model):
+        """Test that viewers can share a single WebGL renderer, drawn while visible, and be disposed."""
+        html = model_to_gltf_html(model, viewer_options={"sharedRenderer": True})
+        assert "class SharedRenderer" in html
+        assert "new IntersectionObserver(" in html
+        assert "dispose() {" in html
+        assert "sharedRenderer: options.sharedRenderer" in html
+        assert 'includeGeometryDiagnostics: false, ...{"sharedRenderer": true} };' in html
+
+    def test_adaptive_quality_option(self, model):
+        """Test that the quality can be lowered while the camera moves, optionally within a frame budget."""
+        html = model_to_gltf_html(model, viewer_options={"frameBudget": 16})
+        assert "EffiBEMViewer.QUALITY_LEVELS = [" in html
+        assert "addEventListener('start', () => this._onInteractionStart())" in html
+        assert "_adaptQuality(frameTime) {" in html
+        assert "adaptiveQuality: options.adaptiveQuality || options.frameBudget != null" in html
+        assert 'includeGeometryDiagnostics: false, ...{"frameBudget": 16} };' in html
+
 
 class TestEmbeddedVsExternal:
     """Tests for embedded vs external JS library modes."""
@@ -115,7 +452,7 @@ class TestLoaderMode:
         """Test that loader mode includes file input element."""
         html = generate_loader_html()
         assert '<input type="file" id="fileInput"' in html
-        assert 'accept=".gltf,.json"' in html
+        assert 'accept=".gltf,.glb,.json,.gz"' in html
 
     def test_loader_has_file_listener(self):
         """Test that loader mode includes file input event listener."""
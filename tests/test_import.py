@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""Import-time regression tests for `effibemviewer`: openstudio must only be imported when actually needed."""
+
+import subprocess
+import sys
+
+
+def _run(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+
+
+def test_import_does_not_pull_openstudio_nor_jinja():
+    """Test that `import effibemviewer` imports neither openstudio nor jinja2."""
+    result = _run(
+        "import sys; import effibemviewer, effibemviewer.gltf, effibemviewer.__main__;"
+        "assert 'openstudio' not in sys.modules, 'openstudio imported';"
+        "assert 'jinja2' not in sys.modules, 'jinja2 imported'"
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def test_library_and_loader_generation_do_not_pull_openstudio():
+    """Test that JS/CSS library and loader HTML generation work without importing openstudio."""
+    result = _run(
+        "import sys; import effibemviewer;"
+        "effibemviewer.get_js_library(); effibemviewer.get_css_library(); effibemviewer.generate_loader_html();"
+        "assert 'openstudio' not in sys.modules, 'openstudio imported'"
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def test_cli_loader_does_not_pull_openstudio(tmp_path):
+    """Test that `python -m effibemviewer --loader` does not import openstudio."""
+    output_file = tmp_path / "loader.html"
+    result = _run(
+        "import runpy, sys;"
+        f"sys.argv = ['effibemviewer', '--loader', '-o', {str(output_file)!r}];"
+        "runpy.run_module('effibemviewer', run_name='__main__');"
+        "assert 'openstudio' not in sys.modules, 'openstudio imported'"
+    )
+    assert result.returncode == 0, result.stderr
+    assert output_file.exists()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""Tests for `effibemviewer` notebook."""
+
+import json
+import re
+
+import openstudio
+import pytest
+
+from effibemviewer import create_example_model
+from effibemviewer import notebook as notebook_module
+from effibemviewer import show_model
+from effibemviewer.gltf import CDN_BASE_URL
+
+ipython_display = pytest.importorskip("IPython.display")
+
+
+@pytest.fixture
+def displayed(monkeypatch):
+    """Capture the HTML displayed in the notebook, as if in a new kernel session."""
+    outputs = []
+    monkeypatch.setattr(ipython_display, "display", lambda obj: outputs.append(obj.data))
+    monkeypatch.setattr(notebook_module, "_library_injected", False)
+    return outputs
+
+
+def _handle(model_object):
+    """Get the handle of a model object, as exported in the GLTF extras."""
+    return str(model_object.handle()).strip("{}")
+
+
+def _sent_update(html):
+    """Extract the update sent to applyUpdate() from a displayed update script."""
+    return json.loads(re.search(r"applyUpdate\((.*)\)\);", html).group(1))
+
+
+def test_show_model_injects_library_once(displayed):
+    """Test that only the first viewer embeds the JS library, and that each viewer registers under its own id."""
+    model = create_example_model()
+    first = show_model(model)
+    second = show_model(model)
+    assert first.viewer_id != second.viewer_id
+    assert len(displayed) == 2
+    assert "class EffiBEMViewer" in displayed[0]
+    assert "class EffiBEMViewer" not in displayed[1]
+    assert '<script type="importmap">' not in displayed[1]
+    for viewer, html in zip([first, second], displayed):
+        assert f'<div id="{viewer.viewer_id}"' in html
+        assert f'(window.effibemViewers ??= {{}})["{viewer.viewer_id}"]' in html
+    # Without the library in the page, the second viewer loads it from the CDN
+    assert "<script type=\"module\" data-effibemviewer-library>" in displayed[0]
+    assert CDN_BASE_URL not in displayed[0]
+    assert f'library.src = "{CDN_BASE_URL}/effibemviewer.js";' in displayed[1]
+    # An import map cannot be added once modules are loaded: without one, the viewer asks to embed the library again
+    assert "importMap" not in displayed[1]
+    assert "show_model(..., include_library=True)" in displayed[1]
+
+    show_model(model, include_library=True)
+    assert "class EffiBEMViewer" in displayed[2]
+
+
+def test_update_sends_only_changed_surfaces(displayed):
+    """Test that an update removes and re-adds the modified surfaces only, and that an unchanged model sends nothing."""
+    model = create_example_model()
+    viewer = show_model(model)
+    assert viewer.update(model) == {"added": 0, "changed": 0, "removed": 0}
+    assert len(displayed) == 1
+
+    # Outdoor surfaces without sub surfaces: changing them does not affect any other surface
+    surfaces = sorted(
+        (s for s in model.getSurfaces() if s.outsideBoundaryCondition() == "Outdoors" and not s.subSurfaces()),
+        key=lambda s: s.nameString(),
+    )
+    moved = surfaces[0]
+    moved.setVertices([v + openstudio.Vector3d(0, 0, 1) for v in moved.vertices()])
+    removed_handle = _handle(surfaces[1])
+    surfaces[1].remove()
+
+    assert viewer.update(model) == {"added": 0, "changed": 1, "removed": 1}
+    update = _sent_update(displayed[-1])
+    assert f'window.effibemViewers?.["{viewer.viewer_id}"]' in displayed[-1]
+    assert sorted(update["remove"]) == sorted([_handle(moved), removed_handle])
+    sent = [node for node in update["gltf"]["nodes"] if "mesh" in node]
+    assert [node["extras"]["handle"] for node in sent] == [_handle(moved)]
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""Tests for `effibemviewer` serve."""
+
+import json
+import threading
+import time
+import urllib.request
+
+import openstudio
+import pytest
+
+from effibemviewer import create_example_model
+from effibemviewer.serve import ModelServer
+
+
+@pytest.fixture
+def osm_path(tmp_path):
+    """Save an example OpenStudio model to a file for testing."""
+    path = tmp_path / "model.osm"
+    create_example_model().save(path, True)
+    return path
+
+
+@pytest.fixture
+def served(osm_path):
+    """Run a ModelServer for the example model on a free local port, return the server and its base URL."""
+    model_server = ModelServer(osm_path, debounce=0.05)
+    assert model_server.translate()
+    httpd = model_server.make_http_server(port=0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield model_server, f"http://127.0.0.1:{httpd.server_address[1]}"
+    model_server.stop()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _get(url):
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return response.read()
+
+
+def _move_first_surface(osm_path):
+    """Move a surface of the model file up by 1 m, and return its handle as exported in the GLTF extras."""
+    model = openstudio.model.Model.load(osm_path).get()
+    surface = sorted(model.getSurfaces(), key=lambda s: s.nameString())[0]
+    surface.setVertices([v + openstudio.Vector3d(0, 0, 1) for v in surface.vertices()])
+    model.save(osm_path, True)
+    return str(surface.handle()).strip("{}")
+
+
+def test_serves_page_library_and_model(served):
+    """Test that the page loads the GLB model and follows the events, and that its resources are served."""
+    model_server, base_url = served
+    page = _get(base_url + "/").decode()
+    assert 'viewer.loadFromFile("./model.glb");' in page
+    assert 'new EventSource("./events")' in page
+    assert "class EffiBEMViewer" in _get(base_url + "/effibemviewer.js").decode()
+    assert _get(base_url + "/model.glb")[:4] == b"glTF"
+
+    assert json.loads(_get(base_url + "/update.json?since=1")) == {"version": 1, "update": {"remove": [], "gltf": None}}
+    # Too old (or unknown) versions cannot be diffed
+    assert json.loads(_get(base_url + "/update.json?since=0")) == {"version": 1, "update": None}
+
+
+def test_update_after_translation(served, osm_path):
+    """Test that a re-translated model is published as a new version, with only the changed surface in the update."""
+    model_server, base_url = served
+    handle = _move_first_surface(osm_path)
+    assert model_server.translate()
+
+    result = json.loads(_get(base_url + "/update.json?since=1"))
+    assert result["version"] == 2
+    assert result["update"]["remove"] == [handle]
+    assert [node["extras"]["handle"] for node in result["update"]["gltf"]["nodes"] if "mesh" in node] == [handle]
+
+
+def test_events_stream_versions(served):
+    """Test that the event stream sends the current version, then each new one."""
+    model_server, base_url = served
+    with urllib.request.urlopen(base_url + "/events", timeout=10) as response:
+        assert response.readline() == b"event: version\n"
+        assert response.readline() == b"data: 1\n"
+        response.readline()
+        assert model_server.translate()
+        assert response.readline() == b"event: version\n"
+        assert response.readline() == b"data: 2\n"
+
+
+def test_watch_debounces_changes(osm_path):
+    """Test that the watcher re-translates the model once after a burst of changes."""
+    model_server = ModelServer(osm_path, debounce=0.3)
+    assert model_server.translate()
+    watcher = threading.Thread(target=model_server.watch, kwargs={"poll_interval": 0.02}, daemon=True)
+    watcher.start()
+    try:
+        for _ in range(3):
+            _move_first_surface(osm_path)
+            time.sleep(0.05)
+        deadline = time.monotonic() + 20
+        while model_server.version < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.5)
+        assert model_server.version == 2
+    finally:
+        model_server.stop()
+        watcher.join(timeout=10)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""Tests for `effibemviewer` string table."""
+
+import copy
+import json
+
+import pytest
+
+from effibemviewer import (
+    create_example_model,
+    decode_string_table,
+    encode_string_table,
+    model_to_gltf_json,
+    split_gltf_by_story,
+)
+
+
+@pytest.fixture(scope="module")
+def gltf_data():
+    """Convert an example OpenStudio model to GLTF JSON for testing."""
+    return model_to_gltf_json(create_example_model())
+
+
+def test_encode_string_table(gltf_data):
+    """Test that the repeated surface strings are replaced by table indices, and restored by decoding."""
+    original = copy.deepcopy(gltf_data)
+    encoded = encode_string_table(gltf_data)
+    assert gltf_data == original
+
+    table = encoded["scenes"][0]["extras"]["stringTable"]
+    assert "constructionName" in table["keys"]
+    assert "buildingStoryName" in table["keys"]
+    assert "handle" not in table["keys"] and "name" not in table["keys"]
+    assert len(table["strings"]) == len(set(table["strings"]))
+
+    for node, encoded_node in zip(gltf_data["nodes"], encoded["nodes"]):
+        if "mesh" not in node:
+            assert encoded_node == node
+            continue
+        extras = encoded_node["extras"]
+        assert extras["handle"] == node["extras"]["handle"]
+        assert table["strings"][extras["constructionName"]] == node["extras"]["constructionName"]
+    assert len(json.dumps(encoded)) < len(json.dumps(gltf_data))
+
+    assert decode_string_table(encoded) == gltf_data
+    # Encoding twice, or decoding plain data, is a no-op
+    assert encode_string_table(encoded) is encoded
+    assert decode_string_table(gltf_data) is gltf_data
+
+
+def test_split_encoded_gltf_by_story(gltf_data):
+    """Test that encoded data is split by story name, and that each chunk keeps the string table."""
+    chunks = split_gltf_by_story(encode_string_table(gltf_data))
+    assert [chunk["story"] for chunk in chunks] == [chunk["story"] for chunk in split_gltf_by_story(gltf_data)]
+    for chunk in chunks:
+        decoded = decode_string_table(chunk["gltf"])
+        stories = {node["extras"].get("buildingStoryName", "") for node in decoded["nodes"] if "mesh" in node}
+        assert stories == {chunk["story"]}
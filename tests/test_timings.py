@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""Tests for `effibemviewer` timings."""
+
+import time
+
+from effibemviewer import Timings, create_example_model
+from effibemviewer.batch import convert_model_file
+from effibemviewer.gltf import model_to_gltf_html
+
+
+def test_nested_stages_are_exclusive():
+    """Test that the time of a nested stage is not counted in the outer one, so the stages add up to the total."""
+    timings = Timings()
+    with timings.stage("outer"):
+        time.sleep(0.01)
+        with timings.stage("inner"):
+            time.sleep(0.05)
+    assert timings.stages["inner"] >= 0.05
+    assert 0.01 <= timings.stages["outer"] < 0.05
+    assert timings.total_seconds == timings.stages["outer"] + timings.stages["inner"]
+
+
+def test_model_to_gltf_html_timings():
+    """Test that the HTML conversion records its stages, sizes and counts."""
+    timings = Timings()
+    html = model_to_gltf_html(create_example_model(), timings=timings)
+
+    assert list(timings.stages) == ["translate", "json_decode", "render_html", "json_encode"]
+    assert timings.sizes["html"] == len(html.encode())
+    assert timings.counts["surfaces"] > 0
+    assert set(timings.to_dict()) == {"total_seconds", "stages", "sizes", "counts"}
+    assert "translate" in timings.format()
+
+
+def test_convert_model_file_profile(tmp_path):
+    """Test that batch conversion results include the timings when profiling."""
+    osm_path = tmp_path / "model.osm"
+    create_example_model().save(osm_path, True)
+
+    result = convert_model_file(osm_path, tmp_path, output_format="glb", profile=True)
+    assert list(result["timings"]["stages"]) == ["load", "translate", "json_decode", "glb_pack", "write"]
+    assert result["timings"]["sizes"]["glb"] == result["bytes"]
+    assert "timings" not in convert_model_file(osm_path, tmp_path, output_format="glb")
+
+    compressed = convert_model_file(osm_path, tmp_path, output_format="gltf", profile=True, compress=True)
+    assert compressed["output"].endswith(".gltf.gz")
+    assert compressed["timings"]["sizes"]["compressed"] == compressed["bytes"]